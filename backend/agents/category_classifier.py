@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from agents.tools import vector_store
+
+load_dotenv()
+
+# "local" classifies with embedding centroids, "llm" always asks the model
+CLASSIFIER_MODE = os.environ.get("REFINER_CLASSIFIER_MODE", "local").lower()
+# Below this gap between the best and second best category the LLM decides
+MIN_MARGIN = float(os.environ.get("REFINER_CLASSIFIER_MIN_MARGIN", "0.03"))
+SEED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "category_seed.json")
+CENTROIDS_PATH = os.environ.get("REFINER_CLASSIFIER_CENTROIDS_PATH", "./category_centroids.json")
+
+CATEGORIES = ["clarity", "precision", "creative"]
+
+def _embed_with_shared_model(texts: List[str]) -> List[List[float]]:
+    return vector_store.get_embeddings().embed_documents(texts)
+
+def load_examples(path: str = SEED_PATH) -> Dict[str, List[str]]:
+    """Reading labelled prompts, a JSON object of category to example prompts"""
+    with open(path) as examples_file:
+        examples = json.load(examples_file)
+    return {category: examples.get(category, []) for category in CATEGORIES}
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+class CategoryClassifier:
+    """Nearest-centroid classifier over sentence embeddings"""
+
+    def __init__(self, embed: Callable[[List[str]], List[List[float]]] = _embed_with_shared_model, min_margin: float = MIN_MARGIN):
+        self.embed = embed
+        self.min_margin = min_margin
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self.counters = {"local": 0, "fallback": 0}
+
+    def train(self, examples: Dict[str, List[str]]) -> None:
+        """Averaging the normalised embeddings of each category's examples"""
+        centroids = []
+        for category in CATEGORIES:
+            if not examples.get(category):
+                raise ValueError(f"No training examples for category '{category}'")
+            vectors = _normalize(np.asarray(self.embed(examples[category]), dtype=np.float32))
+            centroids.append(vectors.mean(axis=0))
+        self._centroids = _normalize(np.vstack(centroids))
+
+    def save(self, path: str = CENTROIDS_PATH) -> None:
+        with open(path, "w") as centroids_file:
+            json.dump({"categories": CATEGORIES, "centroids": self._centroids.tolist()}, centroids_file)
+
+    def load(self, path: str = CENTROIDS_PATH) -> bool:
+        """Loading trained centroids, returns False when none were saved yet"""
+        if not os.path.exists(path):
+            return False
+        with open(path) as centroids_file:
+            data = json.load(centroids_file)
+        if data.get("categories") != CATEGORIES:
+            return False
+        self._centroids = np.asarray(data["centroids"], dtype=np.float32)
+        return True
+
+    def _ensure_trained(self) -> None:
+        if self._centroids is None:
+            with self._lock:
+                # Falling back to the bundled seed set when no retrained centroids exist
+                if self._centroids is None and not self.load():
+                    self.train(load_examples())
+
+    def scores(self, prompt: str) -> Dict[str, float]:
+        """Cosine similarity of the prompt to every category centroid"""
+        self._ensure_trained()
+        vector = _normalize(np.asarray(self.embed([prompt])[0], dtype=np.float32))
+        similarities = self._centroids @ vector
+        return {category: float(score) for category, score in zip(CATEGORIES, similarities)}
+
+    def predict(self, prompt: str) -> Tuple[Optional[str], float]:
+        """Returning the category and its margin, or None when the margin is too small to trust"""
+        ranked = sorted(self.scores(prompt).items(), key=lambda item: item[1], reverse=True)
+        margin = ranked[0][1] - ranked[1][1]
+        with self._lock:
+            if margin < self.min_margin:
+                self.counters["fallback"] += 1
+                return None, margin
+            self.counters["local"] += 1
+        return ranked[0][0], margin
+
+    async def apredict(self, prompt: str) -> Tuple[Optional[str], float]:
+        # Embedding is CPU bound, so it runs off the event loop
+        return await asyncio.to_thread(self.predict, prompt)
+
+classifier = CategoryClassifier()
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Train or try the refiner category classifier")
+    parser.add_argument("--train", action="store_true", help="Recompute centroids and save them")
+    parser.add_argument("--examples", default=SEED_PATH, help="Labelled examples JSON (category -> prompts)")
+    parser.add_argument("--output", default=CENTROIDS_PATH, help="Where to write the centroids")
+    parser.add_argument("prompt", nargs="?", help="Prompt to classify")
+    args = parser.parse_args(argv)
+
+    if args.train:
+        examples = load_examples(args.examples)
+        classifier.train(examples)
+        classifier.save(args.output)
+        print(f"Saved centroids for {sum(len(v) for v in examples.values())} examples to {args.output}")
+
+    if args.prompt:
+        print(json.dumps({"scores": classifier.scores(args.prompt), "prediction": classifier.predict(args.prompt)[0]}))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
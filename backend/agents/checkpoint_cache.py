@@ -0,0 +1,391 @@
+import os
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+from dotenv import load_dotenv
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    copy_checkpoint,
+    get_checkpoint_metadata,
+)
+
+load_dotenv()
+
+# In-process cache of each active thread's latest checkpoint, writes reach Postgres in the background
+CACHE_ENABLED = os.environ.get("CHECKPOINT_CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_THREADS = int(os.environ.get("CHECKPOINT_CACHE_MAX_THREADS", "500"))
+# Threads not touched for this long are dropped from memory
+CACHE_IDLE_SECONDS = float(os.environ.get("CHECKPOINT_CACHE_IDLE_SECONDS", "900"))
+# Durability window, the longest a checkpoint stays in memory only
+FLUSH_INTERVAL_MS = float(os.environ.get("CHECKPOINT_CACHE_FLUSH_MS", "250"))
+# Flushing early once this many writes are waiting
+FLUSH_MAX_PENDING = int(os.environ.get("CHECKPOINT_CACHE_FLUSH_MAX_PENDING", "200"))
+# Postgres LISTEN/NOTIFY channel telling other workers which threads changed
+NOTIFY_CHANNEL = "checkpoint_threads"
+
+WORKER_ID = uuid.uuid4().hex
+
+class _ThreadEntry:
+    """Latest checkpoint of one thread and the task writes against it"""
+
+    def __init__(self):
+        self.latest: Optional[CheckpointTuple] = None
+        # Writes per checkpoint id, including ones that arrive before their checkpoint's put
+        self.writes: Dict[str, Dict[Tuple[str, int], Tuple[str, str, Any]]] = {}
+        self.touched = time.monotonic()
+
+    @property
+    def latest_id(self) -> Optional[str]:
+        return self.latest.config["configurable"]["checkpoint_id"] if self.latest else None
+
+    def snapshot(self) -> CheckpointTuple:
+        # The graph loop updates checkpoints in place, so callers never get the cached objects
+        return CheckpointTuple(
+            config=self.latest.config,
+            checkpoint=copy_checkpoint(self.latest.checkpoint),
+            metadata=self.latest.metadata,
+            parent_config=self.latest.parent_config,
+            pending_writes=list(self.writes.get(self.latest_id, {}).values()),
+        )
+
+class CachedCheckpointSaver(BaseCheckpointSaver):
+    """Write-behind LRU of hot thread checkpoints in front of the Postgres saver"""
+
+    def __init__(
+        self,
+        saver: BaseCheckpointSaver,
+        max_threads: int = CACHE_MAX_THREADS,
+        idle_seconds: float = CACHE_IDLE_SECONDS,
+        flush_interval_ms: float = FLUSH_INTERVAL_MS,
+        flush_max_pending: int = FLUSH_MAX_PENDING,
+        require_listener: bool = False,
+    ):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.max_threads = max_threads
+        self.idle_seconds = idle_seconds
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_max_pending = flush_max_pending
+        # With several workers, cached reads are only safe while invalidations are being received
+        self.require_listener = require_listener
+        self.listening = False
+        self._entries: "OrderedDict[Tuple[str, str], _ThreadEntry]" = OrderedDict()
+        # Per-thread queue of ("put" | "writes", args) in call order, waiting for the next flush
+        self._pending: Dict[str, List[Tuple[str, tuple]]] = {}
+        self._pending_since: Optional[float] = None
+        # Threads whose operations a running flush has taken out of _pending but not yet written
+        self._flushing: Set[str] = set()
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self.counters = {
+            "hits": 0, "misses": 0, "evictions": 0, "invalidations": 0,
+            "flushes": 0, "flushed_ops": 0, "flush_errors": 0,
+        }
+
+    @property
+    def config_specs(self):
+        return self.saver.config_specs
+
+    def get_next_version(self, current, channel):
+        return self.saver.get_next_version(current, channel)
+
+    # Cache bookkeeping
+
+    def _entry(self, thread_id: str, checkpoint_ns: str, create: bool = False) -> Optional[_ThreadEntry]:
+        key = (thread_id, checkpoint_ns)
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry.touched > self.idle_seconds:
+            del self._entries[key]
+            self.counters["evictions"] += 1
+            entry = None
+        if entry is None and create:
+            entry = self._entries[key] = _ThreadEntry()
+            while len(self._entries) > self.max_threads:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+        if entry:
+            entry.touched = time.monotonic()
+            self._entries.move_to_end(key)
+        return entry
+
+    def invalidate(self, thread_id: str) -> None:
+        """Dropping every cached namespace of a thread, the next read goes to Postgres"""
+        for key in [key for key in self._entries if key[0] == thread_id]:
+            del self._entries[key]
+            self.counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _enqueue(self, thread_id: str, op: str, args: tuple) -> None:
+        self._pending.setdefault(thread_id, []).append((op, args))
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        if self.pending_ops() >= self.flush_max_pending:
+            self._wake.set()
+
+    def pending_ops(self) -> int:
+        return sum(len(ops) for ops in self._pending.values())
+
+    # Reads
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = configurable.get("checkpoint_id")
+
+        if self.listening or not self.require_listener:
+            entry = self._entry(thread_id, checkpoint_ns)
+            if entry and entry.latest and checkpoint_id in (None, entry.latest_id):
+                self.counters["hits"] += 1
+                return entry.snapshot()
+
+        self.counters["misses"] += 1
+        # Older checkpoints live only in Postgres, which must first catch up with this thread
+        await self.flush_thread(thread_id)
+        saved = await self.saver.aget_tuple(config)
+        if saved and checkpoint_id is None:
+            entry = self._entry(thread_id, checkpoint_ns, create=True)
+            entry.latest = saved._replace(checkpoint=copy_checkpoint(saved.checkpoint), pending_writes=None)
+            entry.writes = {entry.latest_id: {(w[0], i): w for i, w in enumerate(saved.pending_writes or [])}}
+        return saved
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if config and config.get("configurable", {}).get("thread_id"):
+            await self.flush_thread(config["configurable"]["thread_id"])
+        else:
+            await self.flush()
+        async for saved in self.saver.alist(config, filter=filter, before=before, limit=limit):
+            yield saved
+
+    # Writes
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        next_config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+        parent_id = configurable.get("checkpoint_id")
+
+        entry = self._entry(thread_id, checkpoint_ns, create=True)
+        # Writes against older checkpoints are no longer needed in memory
+        entry.writes = {cid: writes for cid, writes in entry.writes.items() if cid >= checkpoint["id"]}
+        entry.latest = CheckpointTuple(
+            config=next_config,
+            checkpoint=copy_checkpoint(checkpoint),
+            metadata=get_checkpoint_metadata(config, metadata),
+            parent_config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}} if parent_id else None,
+        )
+        self._enqueue(thread_id, "put", (config, copy_checkpoint(checkpoint), metadata, dict(new_versions)))
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_id = configurable["checkpoint_id"]
+        entry = self._entry(thread_id, configurable.get("checkpoint_ns", ""))
+
+        # Checkpoint ids sort by time, so a newer id is a checkpoint whose put has not arrived yet
+        if entry and entry.latest and checkpoint_id >= entry.latest_id:
+            stored = entry.writes.setdefault(checkpoint_id, {})
+            for idx, (channel, value) in enumerate(writes):
+                key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+                # Special channels overwrite like the saver's upsert, others keep the first write
+                if channel in WRITES_IDX_MAP or key not in stored:
+                    stored[key] = (task_id, channel, value)
+        self._enqueue(thread_id, "writes", (config, list(writes), task_id, task_path))
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        async with self._flush_lock:
+            self._pending.pop(thread_id, None)
+        self.invalidate(thread_id)
+        await self.saver.adelete_thread(thread_id)
+        await self._notify([thread_id])
+
+    # Write-behind
+
+    async def _apply(self, ops: List[Tuple[str, tuple]]) -> int:
+        """Replaying one thread's queued operations in order, returning how many succeeded"""
+        for done, (op, args) in enumerate(ops):
+            try:
+                if op == "put":
+                    await self.saver.aput(*args)
+                else:
+                    await self.saver.aput_writes(*args)
+            except Exception as e:
+                print(f"Checkpoint flush failed, retrying next interval: {e}")
+                return done
+        return len(ops)
+
+    async def flush(self) -> int:
+        """Writing every queued checkpoint to Postgres, threads in parallel and each thread in order"""
+        async with self._flush_lock:
+            batch, self._pending, self._pending_since = self._pending, {}, None
+            if not batch:
+                return 0
+            self._flushing = set(batch)
+            try:
+                applied = await asyncio.gather(*(self._apply(ops) for ops in batch.values()))
+            finally:
+                self._flushing = set()
+            flushed, failed = [], 0
+            for (thread_id, ops), done in zip(batch.items(), applied):
+                if done < len(ops):
+                    # Keeping the failed remainder ahead of anything queued meanwhile
+                    self._pending[thread_id] = ops[done:] + self._pending.get(thread_id, [])
+                    self._pending_since = self._pending_since or time.monotonic()
+                    failed += 1
+                if done:
+                    flushed.append(thread_id)
+            self.counters["flushes"] += 1
+            self.counters["flushed_ops"] += sum(applied)
+            self.counters["flush_errors"] += failed
+        await self._notify(flushed)
+        return sum(applied)
+
+    async def flush_thread(self, thread_id: str) -> None:
+        """Writing one thread's queued checkpoints before reading it from Postgres"""
+        # A running flush may hold this thread's operations, Postgres is behind until it finishes
+        if thread_id not in self._pending and thread_id not in self._flushing:
+            return
+        async with self._flush_lock:
+            ops = self._pending.pop(thread_id, [])
+            if not ops:
+                return
+            done = await self._apply(ops)
+            self.counters["flushed_ops"] += done
+            if done < len(ops):
+                self._pending[thread_id] = ops[done:] + self._pending.get(thread_id, [])
+                self.counters["flush_errors"] += 1
+                raise RuntimeError(f"Could not write pending checkpoints for thread {thread_id}")
+        await self._notify([thread_id])
+
+    async def flush_loop(self) -> None:
+        """Background task flushing at least once per durability window"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    # Invalidation across workers
+
+    async def _notify(self, thread_ids: List[str]) -> None:
+        """Telling other workers which threads were written, one statement per flush"""
+        pool = getattr(self.saver, "conn", None)
+        if not thread_ids or not hasattr(pool, "connection"):
+            return
+        try:
+            async with pool.connection() as conn:
+                await conn.execute(
+                    "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload",
+                    (NOTIFY_CHANNEL, [f"{WORKER_ID} {thread_id}" for thread_id in thread_ids]),
+                )
+        except Exception as e:
+            print(f"Checkpoint invalidation notify failed: {e}")
+
+    def handle_notification(self, payload: str) -> None:
+        worker_id, _, thread_id = payload.partition(" ")
+        if worker_id != WORKER_ID:
+            self.invalidate(thread_id)
+
+    async def listen(self, conninfo: str) -> None:
+        """Background task evicting threads other workers wrote, reconnecting on failure"""
+        import psycopg
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(conninfo, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    # Anything cached while disconnected may have missed invalidations
+                    self.clear()
+                    self.listening = True
+                    async for notification in conn.notifies():
+                        self.handle_notification(notification.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Checkpoint invalidation listener disconnected: {e}")
+            finally:
+                self.listening = False
+            await asyncio.sleep(5)
+
+    def stats(self) -> dict:
+        """Reporting cache hit rate, write-behind backlog and invalidations"""
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "enabled": True,
+            "threads": len(self._entries),
+            "max_threads": self.max_threads,
+            "flush_interval_ms": self.flush_interval * 1000,
+            "pending_ops": self.pending_ops(),
+            "oldest_pending_ms": round((time.monotonic() - self._pending_since) * 1000, 1) if self._pending_since else 0.0,
+            "listening": self.listening,
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+# Cache in use by the API, if enabled
+cache: Optional[CachedCheckpointSaver] = None
+
+@asynccontextmanager
+async def open_checkpoint_cache(saver: BaseCheckpointSaver, conninfo: str = ""):
+    """Wrapping the saver in the write-behind cache, flushing everything on shutdown"""
+    global cache
+    if not CACHE_ENABLED:
+        yield saver
+        return
+
+    cache = CachedCheckpointSaver(saver, require_listener=bool(conninfo))
+    tasks = [asyncio.create_task(cache.flush_loop())]
+    if conninfo:
+        tasks.append(asyncio.create_task(cache.listen(conninfo)))
+    try:
+        yield cache
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await cache.flush()
+        cache = None
+
+def stats() -> dict:
+    if cache is None:
+        return {"enabled": False}
+    return cache.stats()
@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import List, Optional
+from dotenv import load_dotenv
+from agents import checkpointer
+from agents.tools import document_registry, vector_store
+
+load_dotenv()
+
+# Retention policy for the Postgres checkpoint tables
+RETENTION_ENABLED = os.environ.get("CHECKPOINT_RETENTION_ENABLED", "true").lower() == "true"
+# Checkpoints kept per thread, the graphs only ever resume from the newest one
+KEEP_LAST = int(os.environ.get("CHECKPOINT_KEEP_LAST", "10"))
+# Threads with no new checkpoint for this long are deleted entirely
+THREAD_TTL_HOURS = float(os.environ.get("CHECKPOINT_THREAD_TTL_HOURS", str(30 * 24)))
+INTERVAL_MINUTES = float(os.environ.get("CHECKPOINT_RETENTION_INTERVAL_MINUTES", "60"))
+
+# Report of the most recent run, served by the metrics router
+last_report: Optional[dict] = None
+
+# Every worker runs the loop, the transaction-scoped lock lets only one of them prune at a time
+RETENTION_LOCK_KEY = 7421809344172
+LOCK_SQL = "SELECT pg_try_advisory_xact_lock(%(key)s) AS acquired"
+
+# Deleted row counts and sizes come back from the DELETE itself via RETURNING
+EXPIRE_THREADS_SQL = """
+WITH idle AS (
+    SELECT thread_id FROM checkpoints
+    GROUP BY thread_id
+    HAVING max((checkpoint->>'ts')::timestamptz) < now() - make_interval(secs => %(ttl_seconds)s)
+), deleted AS (
+    DELETE FROM checkpoints c USING idle
+    WHERE c.thread_id = idle.thread_id
+    RETURNING c.thread_id, pg_column_size(c.*) AS size
+)
+SELECT thread_id, count(*) AS rows, coalesce(sum(size), 0) AS bytes FROM deleted GROUP BY thread_id
+"""
+
+TRIM_CHECKPOINTS_SQL = """
+WITH ranked AS (
+    SELECT thread_id, checkpoint_ns, checkpoint_id,
+           row_number() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS position
+    FROM checkpoints
+), deleted AS (
+    DELETE FROM checkpoints c USING ranked r
+    WHERE c.thread_id = r.thread_id
+      AND c.checkpoint_ns = r.checkpoint_ns
+      AND c.checkpoint_id = r.checkpoint_id
+      AND r.position > %(keep_last)s
+    RETURNING c.thread_id, pg_column_size(c.*) AS size
+)
+SELECT thread_id, count(*) AS rows, coalesce(sum(size), 0) AS bytes FROM deleted GROUP BY thread_id
+"""
+
+# Writes and blobs are only orphaned on threads that just lost checkpoints
+ORPHANED_WRITES_SQL = """
+WITH deleted AS (
+    DELETE FROM checkpoint_writes w
+    WHERE w.thread_id = ANY(%(thread_ids)s)
+      AND NOT EXISTS (
+          SELECT 1 FROM checkpoints c
+          WHERE c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns AND c.checkpoint_id = w.checkpoint_id
+      )
+    RETURNING pg_column_size(w.*) AS size
+)
+SELECT count(*) AS rows, coalesce(sum(size), 0) AS bytes FROM deleted
+"""
+
+# A blob is live while any remaining checkpoint of its thread points at that channel version
+ORPHANED_BLOBS_SQL = """
+WITH referenced AS (
+    SELECT DISTINCT c.thread_id, c.checkpoint_ns, v.key AS channel, v.value AS version
+    FROM checkpoints c, jsonb_each_text(c.checkpoint->'channel_versions') v
+    WHERE c.thread_id = ANY(%(thread_ids)s)
+), deleted AS (
+    DELETE FROM checkpoint_blobs b
+    WHERE b.thread_id = ANY(%(thread_ids)s)
+      AND NOT EXISTS (
+          SELECT 1 FROM referenced r
+          WHERE r.thread_id = b.thread_id AND r.checkpoint_ns = b.checkpoint_ns
+            AND r.channel = b.channel AND r.version = b.version
+      )
+    RETURNING pg_column_size(b.*) AS size
+)
+SELECT count(*) AS rows, coalesce(sum(size), 0) AS bytes FROM deleted
+"""
+
+TABLES = ["checkpoints", "checkpoint_writes", "checkpoint_blobs"]
+
+async def _fetch_all(conn, sql: str, params: dict) -> List[dict]:
+    cursor = await conn.execute(sql, params)
+    return await cursor.fetchall()
+
+def _forget_documents(thread_ids: List[str]) -> int:
+    """Dropping registry entries and stored chunks of expired threads"""
+    removed = 0
+    for thread_id in thread_ids:
+        if not document_registry.has_documents(thread_id):
+            continue
+        try:
+            vector_store.get_vector_store().delete(where={"thread_id": thread_id})
+        except Exception as e:
+            print(f"Could not delete document chunks for thread {thread_id}: {e}")
+        removed += document_registry.remove_thread(thread_id)
+    return removed
+
+async def prune(conn, keep_last: int = KEEP_LAST, ttl_hours: float = THREAD_TTL_HOURS, dry_run: bool = False) -> dict:
+    """Expiring idle threads and trimming old checkpoints in one transaction, returning what was reclaimed"""
+    started = time.perf_counter()
+    async with conn.transaction(force_rollback=dry_run):
+        if not (await _fetch_all(conn, LOCK_SQL, {"key": RETENTION_LOCK_KEY}))[0]["acquired"]:
+            # Another worker is pruning the same rows right now
+            return {
+                "dry_run": dry_run,
+                "keep_last": keep_last,
+                "ttl_hours": ttl_hours,
+                "skipped": True,
+                "bytes_reclaimed": 0,
+                "finished_at": time.time(),
+            }
+        expired = await _fetch_all(conn, EXPIRE_THREADS_SQL, {"ttl_seconds": ttl_hours * 3600})
+        trimmed = await _fetch_all(conn, TRIM_CHECKPOINTS_SQL, {"keep_last": keep_last})
+
+        touched = sorted({row["thread_id"] for row in expired + trimmed})
+        writes = {"rows": 0, "bytes": 0}
+        blobs = {"rows": 0, "bytes": 0}
+        if touched:
+            writes = (await _fetch_all(conn, ORPHANED_WRITES_SQL, {"thread_ids": touched}))[0]
+            blobs = (await _fetch_all(conn, ORPHANED_BLOBS_SQL, {"thread_ids": touched}))[0]
+
+    expired_threads = [row["thread_id"] for row in expired]
+    documents_removed = 0 if dry_run else await asyncio.to_thread(_forget_documents, expired_threads)
+
+    checkpoints = {
+        "rows": sum(int(row["rows"]) for row in expired + trimmed),
+        "bytes": sum(int(row["bytes"]) for row in expired + trimmed),
+    }
+    writes = {"rows": int(writes["rows"]), "bytes": int(writes["bytes"])}
+    blobs = {"rows": int(blobs["rows"]), "bytes": int(blobs["bytes"])}
+    return {
+        "dry_run": dry_run,
+        "keep_last": keep_last,
+        "ttl_hours": ttl_hours,
+        "skipped": False,
+        "expired_threads": len(expired_threads),
+        "trimmed_threads": len({row["thread_id"] for row in trimmed}),
+        "checkpoints": checkpoints,
+        "checkpoint_writes": writes,
+        "checkpoint_blobs": blobs,
+        "bytes_reclaimed": checkpoints["bytes"] + writes["bytes"] + blobs["bytes"],
+        "documents_removed": documents_removed,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "finished_at": time.time(),
+    }
+
+async def vacuum(conn) -> None:
+    """Returning freed pages to Postgres right away instead of waiting for autovacuum"""
+    for table in TABLES:
+        # VACUUM cannot run inside a transaction, pool connections are autocommit
+        await conn.execute(f"VACUUM (ANALYZE) {table}")
+
+async def run_retention(keep_last: int = KEEP_LAST, ttl_hours: float = THREAD_TTL_HOURS, dry_run: bool = False) -> dict:
+    """Running one retention pass on the shared checkpoint pool"""
+    global last_report
+    if checkpointer.pool is None:
+        raise RuntimeError("Checkpoint pool is not open")
+    async with checkpointer.pool.connection() as conn:
+        report = await prune(conn, keep_last, ttl_hours, dry_run)
+    if not dry_run and not report["skipped"]:
+        last_report = report
+    return report
+
+async def retention_loop(interval_minutes: float = INTERVAL_MINUTES) -> None:
+    """Background task pruning the checkpoint tables every interval for the app lifetime"""
+    while True:
+        try:
+            report = await run_retention()
+            if report["bytes_reclaimed"]:
+                print(f"Checkpoint retention reclaimed {report['bytes_reclaimed']} bytes "
+                      f"({report['expired_threads']} threads expired)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Checkpoint retention failed: {e}")
+        await asyncio.sleep(interval_minutes * 60)
+
+def stats() -> dict:
+    """Reporting the retention policy and the last run"""
+    return {
+        "enabled": RETENTION_ENABLED,
+        "keep_last": KEEP_LAST,
+        "thread_ttl_hours": THREAD_TTL_HOURS,
+        "interval_minutes": INTERVAL_MINUTES,
+        "last_run": last_report,
+    }
+
+async def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Prune old checkpoints and expire idle threads")
+    parser.add_argument("--keep-last", type=int, default=KEEP_LAST, help="Checkpoints kept per thread")
+    parser.add_argument("--ttl-hours", type=float, default=THREAD_TTL_HOURS, help="Delete threads idle for longer than this")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be deleted and roll back")
+    parser.add_argument("--vacuum", action="store_true", help="Run VACUUM (ANALYZE) on the checkpoint tables afterwards")
+    args = parser.parse_args(argv)
+
+    async with checkpointer.open_checkpointer():
+        report = await run_retention(args.keep_last, args.ttl_hours, args.dry_run)
+        if args.vacuum and not args.dry_run:
+            async with checkpointer.pool.connection() as conn:
+                await vacuum(conn)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
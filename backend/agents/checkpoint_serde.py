@@ -0,0 +1,147 @@
+import os
+import sys
+import json
+import time
+import zlib
+import threading
+from typing import Any, Dict, List, Tuple
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+load_dotenv()
+
+# "zstd", "zlib" or "none", zstd falls back to zlib when zstandard is not installed
+COMPRESSION = os.environ.get("CHECKPOINT_COMPRESSION", "zstd").lower()
+COMPRESSION_LEVEL = int(os.environ.get("CHECKPOINT_COMPRESSION_LEVEL", "3"))
+# Values smaller than this are stored as is, compression would only add overhead
+MIN_BYTES = int(os.environ.get("CHECKPOINT_COMPRESSION_MIN_BYTES", "256"))
+
+class CompressedSerializer(SerializerProtocol):
+    """JsonPlus serialisation with compressed blobs, the codec is recorded in the stored type"""
+
+    def __init__(self, codec: str = COMPRESSION, level: int = COMPRESSION_LEVEL, min_bytes: int = MIN_BYTES, serde: SerializerProtocol = None):
+        if codec == "zstd" and zstandard is None:
+            print("zstandard is not installed, compressing checkpoints with zlib")
+            codec = "zlib"
+        self.codec = codec
+        self.level = level
+        self.min_bytes = min_bytes
+        self.serde = serde or JsonPlusSerializer()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters = {"values": 0, "compressed": 0, "raw_bytes": 0, "stored_bytes": 0}
+
+    def _zstd(self) -> Tuple[Any, Any]:
+        # zstandard contexts are not thread safe, so each thread keeps its own pair
+        if not hasattr(self._local, "zstd"):
+            self._local.zstd = (zstandard.ZstdCompressor(level=self.level), zstandard.ZstdDecompressor())
+        return self._local.zstd
+
+    def compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return self._zstd()[0].compress(data)
+        return zlib.compress(data, self.level)
+
+    def decompress(self, codec: str, data: bytes) -> bytes:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("Checkpoint was written with zstd, install zstandard to read it")
+            return self._zstd()[1].decompress(data)
+        if codec == "zlib":
+            return zlib.decompress(data)
+        raise ValueError(f"Unknown checkpoint compression '{codec}'")
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.serde.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.serde.loads(data)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        """Serialising a channel value and compressing it when that saves space"""
+        typ, data = self.serde.dumps_typed(obj)
+        stored_typ, stored = typ, data
+        if self.codec != "none" and data and len(data) >= self.min_bytes:
+            compressed = self.compress(data)
+            if len(compressed) < len(data):
+                stored_typ, stored = f"{typ}+{self.codec}", compressed
+        with self._lock:
+            self.counters["values"] += 1
+            self.counters["compressed"] += stored_typ != typ
+            self.counters["raw_bytes"] += len(data or b"")
+            self.counters["stored_bytes"] += len(stored or b"")
+        return stored_typ, stored
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        typ, payload = data
+        # Rows written before compression was enabled have a plain type and load unchanged
+        if "+" not in typ:
+            return self.serde.loads_typed(data)
+        typ, codec = typ.rsplit("+", 1)
+        return self.serde.loads_typed((typ, self.decompress(codec, payload)))
+
+    def stats(self) -> dict:
+        """Reporting how much the stored checkpoint values shrank"""
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "codec": self.codec,
+            "level": self.level,
+            "min_bytes": self.min_bytes,
+            **counters,
+            "ratio": round(counters["stored_bytes"] / counters["raw_bytes"], 3) if counters["raw_bytes"] else 1.0,
+        }
+
+serializer = CompressedSerializer()
+
+def _conversation(turns: int) -> List[List[Any]]:
+    """Message lists as checkpointed after each turn of a typical coaching conversation"""
+    messages, snapshots = [], []
+    for turn in range(turns):
+        messages.append(HumanMessage(content=f"Turn {turn}: I want a prompt that helps me plan a study schedule "
+                                             f"for my exams in biology, chemistry and maths next month."))
+        messages.append(AIMessage(content=f"Great, let's refine that. Your task is clear, now tell me the context: "
+                                          f"who is the prompt for, what level are you at and what should turn {turn} "
+                                          f"of the plan focus on? Add any references such as notes or past papers."))
+        snapshots.append(list(messages))
+    return snapshots
+
+def benchmark(turns: int = 30, iterations: int = 20) -> Dict[str, dict]:
+    """Bytes written for the messages channel over a conversation and read latency per checkpoint,
+    for the default saver serialiser against each compression codec"""
+    snapshots = _conversation(turns)
+    candidates = {"jsonplus": JsonPlusSerializer(), "zlib": CompressedSerializer(codec="zlib")}
+    if zstandard is not None:
+        candidates["zstd"] = CompressedSerializer(codec="zstd")
+
+    results = {}
+    for name, serde in candidates.items():
+        blobs = [serde.dumps_typed(snapshot) for snapshot in snapshots]
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for snapshot in snapshots:
+                serde.dumps_typed(snapshot)
+        write_us = (time.perf_counter() - started) / (iterations * len(snapshots)) * 1e6
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for blob in blobs:
+                serde.loads_typed(blob)
+        read_us = (time.perf_counter() - started) / (iterations * len(blobs)) * 1e6
+        results[name] = {
+            "bytes_written": sum(len(blob[1]) for blob in blobs),
+            "last_checkpoint_bytes": len(blobs[-1][1]),
+            "write_us": round(write_us, 1),
+            "read_us": round(read_us, 1),
+        }
+    return results
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    print(json.dumps(benchmark(turns), indent=2))
@@ -0,0 +1,87 @@
+import os
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from agents.checkpoint_serde import serializer
+
+load_dotenv()
+
+# Setup PostgreSQL checkpointing
+DB_URI = os.environ.get("DATABASE_URL", "")
+
+# Pool sizing, tune max size to (uvicorn workers x concurrent requests per worker)
+POOL_MIN_SIZE = int(os.environ.get("CHECKPOINT_POOL_MIN_SIZE", "2"))
+POOL_MAX_SIZE = int(os.environ.get("CHECKPOINT_POOL_MAX_SIZE", "10"))
+POOL_TIMEOUT = float(os.environ.get("CHECKPOINT_POOL_TIMEOUT", "30"))
+POOL_MAX_IDLE = float(os.environ.get("CHECKPOINT_POOL_MAX_IDLE", "300"))
+POOL_RECONNECT_TIMEOUT = float(os.environ.get("CHECKPOINT_POOL_RECONNECT_TIMEOUT", "300"))
+
+# Connection settings required by the LangGraph Postgres saver
+CONNECTION_KWARGS = {
+    "autocommit": True,
+    "prepare_threshold": 0,
+    "row_factory": dict_row,
+}
+
+# Shared pool, opened by the API lifespan
+pool: AsyncConnectionPool | None = None
+
+def _on_reconnect_failed(failed_pool: AsyncConnectionPool) -> None:
+    print(f"Checkpoint pool '{failed_pool.name}' could not reconnect to the database")
+
+@asynccontextmanager
+async def open_checkpointer():
+    """Opening the pooled async Postgres checkpointer shared by the coach and refiner graphs"""
+    global pool
+    if not DB_URI:
+        raise RuntimeError("DATABASE_URL is not set in environment")
+
+    pool = AsyncConnectionPool(
+        conninfo=DB_URI,
+        name="checkpointer",
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        timeout=POOL_TIMEOUT,
+        max_idle=POOL_MAX_IDLE,
+        reconnect_timeout=POOL_RECONNECT_TIMEOUT,
+        reconnect_failed=_on_reconnect_failed,
+        # Health check on checkout so dropped connections are replaced instead of failing a request
+        check=AsyncConnectionPool.check_connection,
+        kwargs=CONNECTION_KWARGS,
+        open=False,
+    )
+    try:
+        await pool.open(wait=True, timeout=POOL_TIMEOUT)
+        # Channel values are stored compressed, older uncompressed rows still load
+        memory = AsyncPostgresSaver(pool, serde=serializer)
+        # Creating the checkpoint tables on first run
+        await memory.setup()
+        yield memory
+    finally:
+        await pool.close()
+        pool = None
+
+def pool_stats() -> dict:
+    """Reporting checkpoint pool usage and wait times"""
+    if pool is None:
+        return {"status": "closed"}
+
+    stats = pool.get_stats()
+    requests_num = stats.get("requests_num", 0)
+    return {
+        "status": "open",
+        "min_size": pool.min_size,
+        "max_size": pool.max_size,
+        "size": stats.get("pool_size", 0),
+        "available": stats.get("pool_available", 0),
+        "requests_waiting": stats.get("requests_waiting", 0),
+        "requests_total": requests_num,
+        "requests_queued": stats.get("requests_queued", 0),
+        "requests_errors": stats.get("requests_errors", 0),
+        "wait_ms_total": stats.get("requests_wait_ms", 0),
+        "wait_ms_avg": round(stats.get("requests_wait_ms", 0) / requests_num, 2) if requests_num else 0.0,
+        "connections_lost": stats.get("connections_lost", 0),
+        "connections_errors": stats.get("connections_errors", 0),
+    }
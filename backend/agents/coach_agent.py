@@ -1,27 +1,23 @@
 import sys
 import os
 from dotenv import load_dotenv
-import psycopg
-from typing import TypedDict, Annotated, List
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from typing import TypedDict, Annotated, Callable, List, Tuple
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, RemoveMessage
+from langchain_core.messages.utils import trim_messages, count_tokens_approximately
 from langgraph.graph import StateGraph, END, START
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.postgres import PostgresSaver
-from langchain_groq import ChatGroq
+from langgraph.config import get_stream_writer
 from streamlit import feedback
 from models.evaluation import EvaluationResult
 from agents.tools import coach_tools
+from agents import intent_matcher, grammar_precheck
+from agents.llm_scheduler import ScheduledChatGroq
 
 sys.path.append(os.path.abspath(".."))
 
 # Importing environment variables (load from project root if available)
 load_dotenv()
 
-# Setup PostgreSQL checkpointing
-DB_URI = os.environ.get("DATABASE_URL", "")
-if not DB_URI:
-    raise RuntimeError("DATABASE_URL is not set in environment")
-
 # Enabling LangSmith for coach agent (only if tracing is enabled)
 os.environ["LANGSMITH_API_KEY"] = os.environ.get("COACH_LANGSMITH_API_KEY", "")
 os.environ["LANGSMITH_PROJECT"] = os.environ.get("LANGSMITH_PROJECT", "coach_agent")
@@ -41,20 +37,47 @@ class CoachingState(TypedDict):
     context_corrected: str
     references_corrected: List[str]
     final_prompt_corrected: str
+    conversation_summary: str  # Running summary of turns dropped from messages
     
-# Models
-llm = ChatGroq(
+# Models, calls are queued with the refiner's so both stay under the provider's rate limits
+llm = ScheduledChatGroq(
     model="llama-3.1-8b-instant", 
     temperature=0.5
 )
 
 evaluation_llm = llm.with_structured_output(EvaluationResult)
 
-def correct_grammar(text: str) -> str:
+# "combined" corrects grammar inside the evaluation call, "separate" makes one call for each
+GRAMMAR_MODE = os.environ.get("COACH_GRAMMAR_MODE", "combined").lower()
+
+# Tags on LLM calls so streaming clients can tell correction, evaluation and reply tokens apart
+GRAMMAR_TAG = "grammar_correction"
+EVALUATION_TAG = "evaluation"
+MEMORY_TAG = "memory_summary"
+
+# Token budgets for the checkpointed history, older turns are summarised once it exceeds MEMORY_MAX_TOKENS
+MEMORY_MAX_TOKENS = int(os.environ.get("COACH_MEMORY_MAX_TOKENS", "3000"))
+MEMORY_WINDOW_TOKENS = int(os.environ.get("COACH_MEMORY_WINDOW_TOKENS", "1500"))
+AGENT_CONTEXT_TOKENS = int(os.environ.get("COACH_AGENT_CONTEXT_TOKENS", "1500"))
+
+def emit_progress(payload: dict) -> None:
+    """Sending a custom event to streaming clients, does nothing outside a graph run"""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer(payload)
+
+async def correct_grammar(text: str) -> str:
     """Automatically correct grammar and improve text clarity using LLM"""
     if not text or not text.strip():
         return text
     
+    # Clean input skips the LLM round trip entirely
+    if is_clean(text):
+        emit_progress({"grammar_corrected": text})
+        return text
+    
     correction_prompt = f"""Please correct any grammar, spelling, and punctuation errors in the following text while preserving its original meaning and intent. Make minimal changes - only fix clear errors and improve clarity where needed. Do not change the core content, style, or add new information.
 
 Text to correct: "{text}"
@@ -62,18 +85,47 @@ Text to correct: "{text}"
 Return only the corrected text, nothing else."""
     
     try:
-        response = llm.invoke(correction_prompt)
-        corrected_text = response.content.strip()
-        
-        # Remove quotes if the LLM wrapped the response in them
-        if corrected_text.startswith('"') and corrected_text.endswith('"'):
-            corrected_text = corrected_text[1:-1]
+        response = await llm.ainvoke(correction_prompt, config={"tags": [GRAMMAR_TAG]})
+        corrected_text = strip_wrapping_quotes(response.content.strip())
         
+        emit_progress({"grammar_corrected": corrected_text})
         return corrected_text
     except Exception as e:
         # If correction fails, return original text
         return text
 
+def strip_wrapping_quotes(text: str) -> str:
+    # Remove quotes if the LLM wrapped the response in them
+    if len(text) >= 2 and text.startswith('"') and text.endswith('"'):
+        return text[1:-1]
+    return text
+
+combined_correction_instruction = """
+    Also return the user's input with any grammar, spelling, and punctuation errors corrected in the
+    corrected_text field. Make minimal changes - only fix clear errors and improve clarity where needed.
+    Do not change the core content, style, or add new information.
+    Evaluate the input as if those errors were already fixed.
+    """
+
+def is_clean(text: str) -> bool:
+    """Checking input offline so only text with likely errors is sent for correction"""
+    return grammar_precheck.PRECHECK_ENABLED and not grammar_precheck.precheck.needs_correction(text)
+
+async def correct_and_evaluate(text: str, build_instruction: Callable[[str], str]) -> Tuple[str, EvaluationResult]:
+    """Correcting the user's input and evaluating it, in a single LLM call unless separate mode is set"""
+    if GRAMMAR_MODE == "separate":
+        corrected_text = await correct_grammar(text)
+        result = await evaluation_llm.ainvoke(build_instruction(corrected_text), config={"tags": [EVALUATION_TAG]})
+        return corrected_text, result
+
+    # Only asking for a correction when the offline check found likely errors
+    clean = not text or not text.strip() or is_clean(text)
+    instruction = build_instruction(text) if clean else build_instruction(text) + combined_correction_instruction
+    result: EvaluationResult = await evaluation_llm.ainvoke(instruction, config={"tags": [EVALUATION_TAG]})
+    corrected_text = text if clean else strip_wrapping_quotes((result.corrected_text or "").strip()) or text
+    emit_progress({"grammar_corrected": corrected_text})
+    return corrected_text, result
+
 welcome_message = """
 **Welcome!** I'm here to help you master prompt engineering by building an effective 
 prompt using the **'Task(Persona and Format), Context, References, Evaluate, Iterate'** framework.
@@ -87,6 +139,50 @@ It could be a specific goal or a general area of interest.
 **Don't have anything in mind?** Just ask me to "suggest some tasks" and I'll generate creative ideas for you!
 """
 
+async def manage_memory(state: CoachingState):
+    """Summarising older turns and dropping them once the history goes over its token budget"""
+    messages = state.get("messages", [])
+    if count_tokens_approximately(messages) <= MEMORY_MAX_TOKENS:
+        return {}
+
+    # Keeping the most recent turns, starting on a user message so the window reads naturally
+    window = trim_messages(
+        messages,
+        max_tokens=MEMORY_WINDOW_TOKENS,
+        token_counter=count_tokens_approximately,
+        strategy="last",
+        start_on="human"
+    )
+    if not window:
+        window = messages[-1:]
+    kept_ids = {message.id for message in window}
+    dropped = [message for message in messages if message.id not in kept_ids]
+    if not dropped:
+        return {}
+
+    transcript = "\n".join(f"{role}: {content}" for role, content in map(extract_message_content, dropped))
+    summary_prompt = f"""Summarise this prompt-coaching conversation for the coach's memory.
+Keep the user's task, context, references, stated preferences and any decisions. Leave out greetings and generic instructions.
+
+Existing summary: "{state.get("conversation_summary", "")}"
+
+Conversation to add:
+{transcript}
+
+Return only the updated summary in at most 150 words."""
+
+    try:
+        response = await llm.ainvoke(summary_prompt, config={"tags": [MEMORY_TAG]})
+    except Exception as e:
+        # Keeping the history as is and trying again next turn
+        print(f"Error summarising coach memory: {e}")
+        return {}
+
+    return {
+        "conversation_summary": response.content.strip(),
+        "messages": [RemoveMessage(id=message.id) for message in dropped]
+    }
+
 def start_coaching(state: CoachingState):
     existing_messages = state.get("messages", [])
     if existing_messages:
@@ -97,7 +193,7 @@ def start_coaching(state: CoachingState):
         "current_step": "awaiting_task_input"
     }
 
-def process_task_input(state: CoachingState):
+async def process_task_input(state: CoachingState):
     messages = state.get("messages", [])
     if not messages or not isinstance(messages[-1], HumanMessage):
         # Should never happen with proper routing, but just in case
@@ -107,7 +203,7 @@ def process_task_input(state: CoachingState):
     user_input = last_message.content.lower()
 
     # Check if it's just a greeting or very short input
-    if len(user_input.strip()) < 5 or user_input.strip() in ["hi", "hello", "hey", "sup", "yo"]:
+    if len(user_input.strip()) < 5 or intent_matcher.matcher("greeting").is_exactly(user_input):
         greeting_response = f"""
         Hello! 👋 I'm excited to help you create an effective prompt!
         
@@ -126,13 +222,13 @@ def process_task_input(state: CoachingState):
         }
         
         # Checking if user wants suggestions
-    if any(keyword in user_input for keyword in ["suggest", "suggestion", "random", "idea", "help me think"]):
+    if intent_matcher.matcher("suggestion").matches(user_input):
         suggestion_prompt = """
         Generate 4 creative and diverse task ideas for prompt engineering practice. 
         Each task should be practical, engaging, and cover different domains.
         Format your response as a numbered list with brief descriptions.
         """
-        response = llm.invoke(suggestion_prompt)
+        response = await llm.ainvoke(suggestion_prompt)
         
         suggestion_message = f"""
         **Here are some creative task suggestions for you:**
@@ -148,13 +244,12 @@ def process_task_input(state: CoachingState):
     
     # Correct grammar and store both original and corrected versions
     original_task = last_message.content
-    corrected_task = correct_grammar(original_task)
     
     # Evaluate the task
-    instruction = f"""
+    build_instruction = lambda task_text: f"""
     Evaluate the following user-defined task based on clarity, specificity, and actionability.
     Check if they have included a persona and output format.
-    User's Task: "{corrected_task}"
+    User's Task: "{task_text}"
     
    ACCEPT the task if it describes:
     - Any type of content creation (essays, stories, code, etc.)
@@ -171,7 +266,7 @@ def process_task_input(state: CoachingState):
     Be ENCOURAGING and HELPFUL. Most user inputs should be accepted as valid starting points.
     If the task is somewhat vague but shows clear intent, ACCEPT it and suggest improvements in the feedback.
     
-    For the task: "{corrected_task}"
+    For the task: "{task_text}"
     - Does this describe something the user wants to accomplish? 
     - Is it a reasonable request for AI assistance?
     
@@ -179,7 +274,7 @@ def process_task_input(state: CoachingState):
     If the task could be more specific, still mark as correct but suggest enhancements.
     """
     
-    result: EvaluationResult = evaluation_llm.invoke(instruction) 
+    corrected_task, result = await correct_and_evaluate(original_task, build_instruction)
     # Use corrected task for processing
     final_task = corrected_task
     
@@ -234,7 +329,7 @@ def process_task_input(state: CoachingState):
             "current_step": "awaiting_task_input"
         }
 
-def process_context_input(state: CoachingState):
+async def process_context_input(state: CoachingState):
     messages = state.get("messages", [])
     if not messages or not isinstance(messages[-1], HumanMessage):
         return {"current_step": "error"}
@@ -244,16 +339,15 @@ def process_context_input(state: CoachingState):
     
     # Correct grammar and store both original and corrected versions
     original_context = last_message.content
-    corrected_context = correct_grammar(original_context)
     
-    instruction = f"""
+    build_instruction = lambda context_text: f"""
     Evaluate the following user-defined context based on relevance, completeness, and clarity.
     Analyze how well it supports the task: "{task}"
-    User's Context: "{corrected_context}"
+    User's Context: "{context_text}"
     Is this context description sufficient to proceed?
     """
     
-    result: EvaluationResult = evaluation_llm.invoke(instruction) 
+    corrected_context, result = await correct_and_evaluate(original_context, build_instruction)
     # Use corrected context for processing
     final_context = corrected_context
     
@@ -297,7 +391,7 @@ def process_context_input(state: CoachingState):
             "current_step": "awaiting_context_input"
         }
 
-def process_reference_input(state: CoachingState):
+async def process_reference_input(state: CoachingState):
     messages = state.get("messages", [])
     if not messages or not isinstance(messages[-1], HumanMessage):
         return {"current_step": "error"}
@@ -307,15 +401,10 @@ def process_reference_input(state: CoachingState):
     context = state.get("context_corrected", state.get("context", ""))
     user_refs = (last_message.content or "").strip().lower()
     
-    # Correct grammar and store both original and corrected versions
     original_references = last_message.content
-    corrected_references = correct_grammar(original_references)
 
     # If user explicitly has no references, provide tailored suggestions instead of erroring
-    no_ref_patterns = [
-        "no references", "none", "don't have", "dont have", "i have none", "no ref", "no resource", "nothing"
-    ]
-    if any(p in user_refs for p in no_ref_patterns):
+    if intent_matcher.matcher("no_reference").matches(user_refs):
         suggestion_prompt = f"""
         Based on the user's task and context, suggest practical reference ideas the user could provide
         to improve prompt quality. Tailor to their scenario.
@@ -331,10 +420,10 @@ def process_reference_input(state: CoachingState):
         Keep items short (one line each).
         """
         # Combine LLM suggestions with web search suggestions (non-authoritative)
-        response = llm.invoke(suggestion_prompt)
+        response = await llm.ainvoke(suggestion_prompt)
         search_query = f"reference ideas for: {task} ({context[:60]}) study planner"
         try:
-            web_results = coach_tools.tavily_search_tool.run(search_query)
+            web_results = await coach_tools.tavily_search_tool.ainvoke(search_query)
         except Exception:
             web_results = ""
 
@@ -357,13 +446,14 @@ def process_reference_input(state: CoachingState):
             "current_step": "awaiting_reference_input"
         }
     
-    instruction = f"""
+    # Correct grammar and store both original and corrected versions
+    build_instruction = lambda references_text: f"""
     Evaluate the following user-defined references based on relevance, credibility, and usefulness.
-    Task: "{task}", Context: "{context}", References: "{corrected_references}"
+    Task: "{task}", Context: "{context}", References: "{references_text}"
     Is this reference description sufficient to proceed?
     """
     
-    result: EvaluationResult = evaluation_llm.invoke(instruction) 
+    corrected_references, result = await correct_and_evaluate(original_references, build_instruction)
     # Use corrected references for processing
     final_references = corrected_references
     
@@ -405,7 +495,7 @@ def process_reference_input(state: CoachingState):
             "current_step": "awaiting_reference_input"
         }
 
-def process_final_prompt(state: CoachingState):
+async def process_final_prompt(state: CoachingState):
     messages = state.get("messages", [])
     if not messages or not isinstance(messages[-1], HumanMessage):
         return {"current_step": "error"}
@@ -415,17 +505,16 @@ def process_final_prompt(state: CoachingState):
     
     # Correct grammar and store both original and corrected versions
     original_final_prompt = last_message.content
-    corrected_final_prompt = correct_grammar(original_final_prompt)
     
-    evaluation_instruction = f"""
+    build_instruction = lambda prompt_text: f"""
     Evaluate this final prompt for clarity, completeness, and effectiveness:
     Framework used: {summary}
-    Final prompt: "{corrected_final_prompt}"
+    Final prompt: "{prompt_text}"
     
     Is this prompt well-structured and ready to use?
     """
     
-    result: EvaluationResult = evaluation_llm.invoke(evaluation_instruction)
+    corrected_final_prompt, result = await correct_and_evaluate(original_final_prompt, build_instruction)
     
     if result.is_correct:
         # brief rubric and compatibility text for tests
@@ -447,7 +536,7 @@ def process_final_prompt(state: CoachingState):
             "current_step": "awaiting_final_prompt"
         }
 
-def agent_node(state: CoachingState):
+async def agent_node(state: CoachingState):
     # Agent node acts as the brain that uses tools to refine the final prompt
     final_prompt = state.get("final_prompt_corrected", state.get("final_prompt", ""))
     refine_instruction = f"""Please polish and improve this prompt, fixing any grammar, spelling, or clarity issues:
@@ -460,10 +549,18 @@ Make it more professional and well-written while preserving the original intent.
 - Clarity and readability enhancements
 - Professional tone and formatting"""
     
-    messages = state.get("messages", [])
-    messages.append(SystemMessage(content=refine_instruction))
-    
-    response = llm.invoke(messages)
+    # Sending a bounded window plus the summary, without touching the checkpointed history
+    recent_messages = trim_messages(
+        state.get("messages", []),
+        max_tokens=AGENT_CONTEXT_TOKENS,
+        token_counter=count_tokens_approximately,
+        strategy="last",
+        start_on="human"
+    )
+    conversation_summary = state.get("conversation_summary")
+    memory = [SystemMessage(content=f"Summary of the earlier conversation: {conversation_summary}")] if conversation_summary else []
+    
+    response = await llm.ainvoke(memory + recent_messages + [SystemMessage(content=refine_instruction)])
     return {"messages": [response]}
 
 def should_call_tools(state: CoachingState) -> str:
@@ -545,6 +642,7 @@ def await_user_input_node(state: CoachingState):
 builder = StateGraph(CoachingState)
 
 # Add all nodes
+builder.add_node("manage_memory", manage_memory)
 builder.add_node("start_coaching", start_coaching)
 builder.add_node("await_user_input", await_user_input_node) 
 builder.add_node("process_task_input", process_task_input)
@@ -554,8 +652,9 @@ builder.add_node("process_final_prompt", process_final_prompt)
 builder.add_node("agent_node", agent_node)
 builder.add_node("display_final_result", display_final_result)
 
-# Starting always goes to start_coaching
-builder.add_edge(START, "start_coaching")
+# Every turn first bounds the history, then goes to start_coaching
+builder.add_edge(START, "manage_memory")
+builder.add_edge("manage_memory", "start_coaching")
 
 # From start_coaching, go to router to wait for user input
 builder.add_edge("start_coaching", "await_user_input")
@@ -615,18 +714,12 @@ builder.add_conditional_edges(
 builder.add_edge("agent_node", "display_final_result")
 builder.add_edge("display_final_result", END)
 
-# compiling the graph with memory using a persistent connection
-
-# Temporary connection for setup
-setup_conn = psycopg.connect(DB_URI)
-setup_conn.autocommit = True
-PostgresSaver(setup_conn).setup()
-setup_conn.close()
+# compiling the graph, the API swaps in the Postgres checkpointer at startup
+def compile_graph(checkpointer=None):
+    """Compiling the coaching graph against the given checkpointer"""
+    return builder.compile(checkpointer=checkpointer)
 
-# Persistent connection for runtime
-conn = psycopg.connect(DB_URI)
-memory = PostgresSaver(conn)
-coach_graph = builder.compile(checkpointer=memory)
+coach_graph = compile_graph()
 
 # function for demo Streamlit app
 def extract_message_content(message) -> tuple[str, str]:
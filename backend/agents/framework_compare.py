@@ -0,0 +1,130 @@
+import os
+import re
+import time
+import asyncio
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from agents.tools.refinement_tools import clarity_tool_list, precision_tool_list, creative_tool_list
+from agents import llm_scheduler
+from agents.llm_scheduler import LLMBusy
+
+load_dotenv()
+
+# At most this many framework LLM calls run at once per comparison
+COMPARE_CONCURRENCY = int(os.environ.get("REFINER_COMPARE_CONCURRENCY", "4"))
+# A framework slower than this is reported as timed out instead of holding up the others
+COMPARE_TOOL_TIMEOUT = float(os.environ.get("REFINER_COMPARE_TOOL_TIMEOUT", "30"))
+
+CATEGORY_FRAMEWORKS: Dict[str, List[str]] = {
+    "clarity": [tool.name for tool in clarity_tool_list],
+    "precision": [tool.name for tool in precision_tool_list],
+    "creative": [tool.name for tool in creative_tool_list],
+}
+FRAMEWORK_TOOLS = {tool.name: tool for tool in clarity_tool_list + precision_tool_list + creative_tool_list}
+
+WORD_PATTERN = re.compile(r"[a-z][a-z']+")
+STRUCTURE_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+[.)]|#+|\*\*[^*]+\*\*|[A-Z][A-Za-z /]{1,30}:)", re.MULTILINE)
+PLACEHOLDER_PATTERN = re.compile(r"\[[^\]]{2,60}\]")
+# Words too common to show whether the refinement kept the user's intent
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "into", "about", "your", "you", "are",
+    "was", "were", "will", "would", "should", "could", "can", "have", "has", "had", "but", "not",
+    "all", "any", "some", "what", "how", "why", "when", "who", "which", "write", "make", "give",
+    "please", "help", "want", "need", "like", "just", "also", "them", "they", "their", "its"
+}
+
+def resolve_frameworks(names: List[str]) -> List[str]:
+    """Accepting tool names or short framework names ("core", "R.A.C.E."), rejecting unknown ones"""
+    resolved = []
+    for name in names:
+        key = re.sub(r"[^a-z]", "", name.lower()).removesuffix("refiner")
+        tool_name = f"{key}_refiner"
+        if tool_name not in FRAMEWORK_TOOLS:
+            raise ValueError(f"Unknown framework '{name}', expected one of {', '.join(FRAMEWORK_TOOLS)}")
+        if tool_name not in resolved:
+            resolved.append(tool_name)
+    return resolved
+
+def score_refinement(original: str, refined: str) -> float:
+    """Cheap quality estimate of a refined prompt, no model call.
+    Rewards keeping the user's key words, visible structure and a sensible length,
+    and penalises refinements that are mostly placeholders."""
+    original_words = {word for word in WORD_PATTERN.findall(original.lower()) if len(word) > 3 and word not in STOPWORDS}
+    refined_lower = refined.lower()
+    coverage = sum(word in refined_lower for word in original_words) / len(original_words) if original_words else 1.0
+
+    structure = min(1.0, len(STRUCTURE_PATTERN.findall(refined)) / 4)
+
+    refined_length = len(refined.split())
+    if refined_length < 20:
+        length = refined_length / 20
+    elif refined_length > 400:
+        length = max(0.0, 1 - (refined_length - 400) / 400)
+    else:
+        length = 1.0
+
+    placeholders = len(PLACEHOLDER_PATTERN.findall(refined))
+    placeholder = 1.0 - min(1.0, max(0, placeholders - 3) / 6)
+
+    return round(0.4 * coverage + 0.3 * structure + 0.2 * length + 0.1 * placeholder, 3)
+
+async def _run_framework(name: str, prompt: str, semaphore: asyncio.Semaphore, timeout: float) -> dict:
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            refined = await asyncio.wait_for(FRAMEWORK_TOOLS[name].ainvoke({"prompt": prompt}), timeout=timeout)
+            status = "error" if refined.startswith("Error") else "ok"
+        except asyncio.TimeoutError:
+            refined, status = None, "timeout"
+        except LLMBusy:
+            # An overloaded scheduler fails the whole comparison with a 503, like the other routes
+            raise
+        except Exception as e:
+            print(f"Framework {name} failed during comparison: {e}")
+            refined, status = None, "error"
+        return {
+            "framework": name,
+            "status": status,
+            "refined_prompt": refined,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+async def compare_frameworks(
+    prompt: str,
+    category: Optional[str] = None,
+    frameworks: Optional[List[str]] = None,
+    rank: bool = True,
+    concurrency: int = COMPARE_CONCURRENCY,
+    timeout: float = COMPARE_TOOL_TIMEOUT
+) -> dict:
+    """Running several frameworks on one prompt concurrently and returning the results side by side"""
+    names = resolve_frameworks(frameworks) if frameworks else CATEGORY_FRAMEWORKS[category]
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    started = time.perf_counter()
+    # A comparison fans out into several calls, chat turns are served ahead of it
+    with llm_scheduler.lane("batch"):
+        tasks = [asyncio.create_task(_run_framework(name, prompt, semaphore, timeout)) for name in names]
+    try:
+        results = await asyncio.gather(*tasks)
+    except LLMBusy:
+        # The remaining frameworks would only queue more calls for a response that is already a 503
+        for task in tasks:
+            task.cancel()
+        raise
+
+    best_framework = None
+    if rank:
+        for result in results:
+            result["score"] = score_refinement(prompt, result["refined_prompt"]) if result["status"] == "ok" else None
+        results.sort(key=lambda result: result["score"] if result["score"] is not None else -1, reverse=True)
+        if results and results[0]["score"] is not None:
+            best_framework = results[0]["framework"]
+
+    return {
+        "original_prompt": prompt,
+        "category": category,
+        "results": results,
+        "best_framework": best_framework,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
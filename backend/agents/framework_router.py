@@ -0,0 +1,51 @@
+import os
+import re
+import uuid
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage
+
+load_dotenv()
+
+# "local" picks the framework with the heuristics below, "llm" lets the model choose via tool calling
+ROUTER_MODE = os.environ.get("REFINER_ROUTER_MODE", "local").lower()
+
+# Cheap features used to pick a framework within a category
+STEP_PATTERN = re.compile(r"(^\s*(\d+[.)]|[-*])\s+)|\b(step|steps|first|then|finally|process|workflow|procedure)\b", re.IGNORECASE | re.MULTILINE)
+TECHNICAL_PATTERN = re.compile(r"\b(code|api|function|script|sql|database|deploy|debug|configure|install|algorithm|python|javascript)\b", re.IGNORECASE)
+EMOTIONAL_PATTERN = re.compile(r"\b(feel|feeling|felt|worried|anxious|upset|sad|angry|frustrated|excited|nervous|stressed|love|hate|afraid)\b", re.IGNORECASE)
+ROLE_PATTERN = re.compile(r"\b(act as|as an?|you are|pretend|role|persona|expert|assistant)\b", re.IGNORECASE)
+
+SHORT_PROMPT_WORDS = 12
+
+def route_framework(category: str, prompt: str) -> str:
+    """Picking the framework tool for a prompt from its category and surface features"""
+    if category == "creative":
+        return "idea_refiner"
+
+    if category == "precision":
+        # RISEN spells out steps, SCORER suits open-ended planning
+        if STEP_PATTERN.search(prompt) or TECHNICAL_PATTERN.search(prompt):
+            return "risen_refiner"
+        return "scorer_refiner"
+
+    if EMOTIONAL_PATTERN.search(prompt):
+        return "spear_refiner"
+    if ROLE_PATTERN.search(prompt):
+        return "race_refiner"
+    if len(prompt.split()) <= SHORT_PROMPT_WORDS:
+        return "car_refiner"
+    return "core_refiner"
+
+def routed_tool_call(category: str, prompt: str, tool_prompt: str = None) -> AIMessage:
+    """Building the tool call message the LLM router would have produced, so ToolNode runs it as-is.
+    The framework is picked from the prompt alone, tool_prompt (the prompt plus document context) is what the tool refines."""
+    framework = route_framework(category, prompt)
+    return AIMessage(
+        content="",
+        tool_calls=[{
+            "name": framework,
+            "args": {"prompt": tool_prompt or prompt},
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "type": "tool_call"
+        }]
+    )
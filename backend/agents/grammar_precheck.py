@@ -0,0 +1,161 @@
+import os
+import re
+import threading
+from typing import List, Optional, Set
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Offline check that lets clean input skip the grammar correction LLM call
+PRECHECK_ENABLED = os.environ.get("GRAMMAR_PRECHECK_ENABLED", "true").lower() == "true"
+WORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grammar_words.txt")
+# Optional file of extra known words (domain terms, product names), one per line
+EXTRA_WORDS_PATH = os.environ.get("GRAMMAR_PRECHECK_EXTRA_WORDS", "")
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+# Tokens that are not prose words: urls, emails, paths, code, numbers mixed with letters
+SKIP_PATTERN = re.compile(r"https?://\S+|www\.\S+|\S+@\S+|\S*[/\\_=<>{}\[\]#`|]\S*|\S*\d\S*")
+
+# Punctuation and casing slips the LLM would fix
+PUNCTUATION_RULES = [
+    ("lowercase_i", re.compile(r"(?<![\w'])i(?=[\s,.!?']|$)")),
+    ("double_space", re.compile(r"[^\s] {2,}[^\s]")),
+    ("space_before_punctuation", re.compile(r"\w\s+[,.!?;:](?!\w)")),
+    ("missing_space_after_punctuation", re.compile(r"[a-z][,;:!?][A-Za-z]|[a-z]{2}\.[A-Z][a-z]")),
+    ("repeated_punctuation", re.compile(r"[!?]{2,}|,{2,}|\.{4,}")),
+    ("repeated_word", re.compile(r"\b(\w+)\s+\1\b", re.IGNORECASE)),
+]
+
+# Endings stripped to find the listed word an inflection may come from
+SUFFIXES = ["'s", "s", "es", "ies", "ed", "d", "ied", "ing", "ly", "y", "er", "ers", "est", "ment", "ments", "ness", "ful", "less", "able"]
+VOWEL_SUFFIXES = ["ed", "ing", "er", "est", "able"]
+CONSONANT_SUFFIXES = ["ly", "ment", "ness", "ful", "less"]
+VOWELS = set("aeiou")
+# Verbs without a regular past tense, so "runned" or "goed" are not accepted. Their real
+# past forms ("ran", "went") are in the word list
+IRREGULAR_VERBS = {
+    "be", "become", "begin", "break", "bring", "build", "buy", "catch", "choose", "come", "cut",
+    "do", "draw", "drink", "drive", "eat", "fall", "feel", "fight", "find", "fly", "forget",
+    "get", "give", "go", "grow", "have", "hear", "hit", "hold", "keep", "know", "lead", "leave",
+    "let", "lose", "make", "meet", "pay", "put", "read", "ride", "rise", "run", "say", "see",
+    "sell", "send", "set", "sing", "sit", "sleep", "speak", "spend", "stand", "steal", "swim",
+    "take", "teach", "tell", "think", "throw", "understand", "wear", "win", "write"
+}
+
+def inflections(base: str) -> Set[str]:
+    """Regularly spelled inflections of a word ("write" gives "writing", never "writeing")"""
+    forms = {base + "'s"}
+    consonant_y = len(base) > 1 and base[-1] == "y" and base[-2] not in VOWELS
+    # Plural and third person
+    if consonant_y:
+        forms.add(base[:-1] + "ies")
+    elif base.endswith(("s", "x", "z", "ch", "sh")):
+        forms.add(base + "es")
+    else:
+        forms.add(base + "s")
+        if base.endswith("o"):
+            forms.add(base + "es")
+
+    for suffix in VOWEL_SUFFIXES:
+        if suffix == "ed" and base in IRREGULAR_VERBS:
+            continue
+        if base.endswith("e"):
+            forms.add(base[:-1] + suffix)
+            if suffix == "ing" and base.endswith(("ee", "oe", "ye")):
+                forms.add(base + suffix)
+        elif consonant_y and suffix != "ing":
+            forms.add(base[:-1] + "i" + suffix)
+        else:
+            forms.add(base + suffix)
+            # Doubled final consonant, as in "planned" or "running"
+            if len(base) > 2 and base[-1] not in VOWELS | {"w", "x", "y"} and base[-2] in VOWELS and base[-3] not in VOWELS:
+                forms.add(base + base[-1] + suffix)
+
+    for suffix in CONSONANT_SUFFIXES:
+        forms.add((base[:-1] + "i" if consonant_y else base) + suffix)
+    if base.endswith("le"):
+        forms.add(base[:-1] + "y")
+    # Plurals of derived nouns, as in "writers" or "assignments"
+    forms |= {form + "s" for form in forms if form.endswith(("er", "ment"))}
+    return forms
+
+def _load_words(path: str) -> Set[str]:
+    with open(path) as words_file:
+        return {line.strip().lower() for line in words_file if line.strip() and not line.startswith("#")}
+
+class GrammarPrecheck:
+    """Spelling and punctuation check against a bundled word list, no network or model needed"""
+
+    def __init__(self, words: Set[str]):
+        self.words = words
+        self._lock = threading.Lock()
+        self.counters = {"checked": 0, "clean": 0, "flagged": 0}
+
+    def is_known(self, word: str) -> bool:
+        word = word.lower()
+        if word in self.words:
+            return True
+        # Accepting an inflection only when a listed word is spelled exactly that way when inflected
+        for suffix in SUFFIXES:
+            if word.endswith(suffix) and len(word) > len(suffix) + 1:
+                stem = word[: -len(suffix)]
+                candidates = {stem, stem + "e", stem + "y", stem + "le"}
+                # "happily" and "happiness" come from "happy"
+                if stem.endswith("i"):
+                    candidates.add(stem[:-1] + "y")
+                if len(stem) > 2 and stem[-1] == stem[-2]:
+                    candidates.add(stem[:-1])
+                if any(candidate in self.words and word in inflections(candidate) for candidate in candidates):
+                    return True
+        return False
+
+    def issues(self, text: str) -> List[str]:
+        """Listing likely problems in the text, an empty list means it looks clean"""
+        found = []
+        stripped = text.strip()
+        if stripped and stripped[0].isalpha() and stripped[0].islower():
+            found.append("lowercase_start")
+        if stripped.count('"') % 2 or stripped.count("(") != stripped.count(")"):
+            found.append("unbalanced_quotes_or_brackets")
+        for name, pattern in PUNCTUATION_RULES:
+            if pattern.search(stripped):
+                found.append(name)
+
+        prose = SKIP_PATTERN.sub(" ", stripped)
+        for index, match in enumerate(TOKEN_PATTERN.finditer(prose)):
+            word = match.group(0)
+            # Capitalised words after the first are treated as names, acronyms as known
+            if word.isupper() and len(word) > 1:
+                continue
+            if index > 0 and word[0].isupper():
+                continue
+            if not self.is_known(word):
+                found.append(f"unknown_word:{word}")
+        return found
+
+    def needs_correction(self, text: str) -> bool:
+        """Deciding whether the text should go to the LLM for correction and recording the outcome"""
+        flagged = bool(self.issues(text))
+        with self._lock:
+            self.counters["checked"] += 1
+            self.counters["flagged" if flagged else "clean"] += 1
+        return flagged
+
+    def stats(self) -> dict:
+        """Reporting how often the LLM correction was skipped"""
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "enabled": PRECHECK_ENABLED,
+            "vocabulary_size": len(self.words),
+            **counters,
+            "skip_rate": round(counters["clean"] / counters["checked"], 3) if counters["checked"] else 0.0,
+        }
+
+def _build() -> GrammarPrecheck:
+    words = _load_words(WORDS_PATH)
+    if EXTRA_WORDS_PATH and os.path.exists(EXTRA_WORDS_PATH):
+        words |= _load_words(EXTRA_WORDS_PATH)
+    return GrammarPrecheck(words)
+
+precheck = _build()
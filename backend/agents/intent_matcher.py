@@ -0,0 +1,124 @@
+import os
+import re
+import sys
+import json
+import time
+from typing import Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Phrases behind the cheap pre-LLM routing in both agents. Every phrase matches on word
+# boundaries only, so "hi" no longer fires inside "this" and "help" inside "helpful".
+INTENT_PATTERNS: Dict[str, List[str]] = {
+    # A message opening with one of these is a greeting
+    "greeting": ["hello", "hi", "hey", "greetings", "good morning", "good afternoon", "good evening", "sup", "yo"],
+    # Questions about the refiner itself rather than prompts to refine
+    "help": [
+        "what can you do", "how do you work", "how does this work", "which framework", "what framework",
+        "what frameworks", "list the frameworks", "list frameworks", "show me the frameworks",
+        "recommend a framework", "suggest a framework", "framework options", "what are my options",
+        "c.o.r.e.", "r.a.c.e.", "c.a.r.", "s.p.e.a.r.", "core framework", "race framework", "car framework",
+        "spear framework", "risen framework", "scorer framework", "idea framework"
+    ],
+    # Whole messages that are a bare request for help
+    "help_command": ["help", "guide", "options", "frameworks", "help me", "show options"],
+    # The user pointing at an uploaded document
+    "rag": [
+        "from the document", "summarize the file", "what does it say about", "in the document",
+        "based on the file", "according to the document", "upload", "uploaded", "document", "documents",
+        "pdf", "image", "picture", "analyze this", "what's in this"
+    ],
+    # The coach user has no references to share
+    "no_reference": [
+        "no references", "no reference", "none", "don't have", "dont have", "i have none",
+        "no ref", "no refs", "no resource", "no resources", "nothing"
+    ],
+    # The coach user asks for task ideas
+    "suggestion": ["suggest", "suggestion", "suggestions", "random", "idea", "ideas", "help me think"],
+}
+
+# Optional JSON file of intent name -> phrases, replacing the defaults for those intents
+PATTERNS_PATH = os.environ.get("INTENT_PATTERNS_PATH", "")
+
+class IntentMatcher:
+    """All phrases of one intent compiled into a single word-bounded regex"""
+
+    def __init__(self, phrases: Iterable[str]):
+        # Longest first so overlapping phrases report the most specific match
+        self.phrases = sorted({phrase.lower() for phrase in phrases}, key=len, reverse=True)
+        alternation = "|".join(re.escape(phrase).replace(r"\ ", r"\s+") for phrase in self.phrases)
+        # Lowercasing the text up front is cheaper than a case-insensitive regex
+        self._pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)")
+
+    def find(self, text: str) -> Optional[str]:
+        """Returning the first phrase found anywhere in the text"""
+        match = self._pattern.search((text or "").lower())
+        return match.group(0) if match else None
+
+    def matches(self, text: str) -> bool:
+        return self._pattern.search((text or "").lower()) is not None
+
+    def starts_with(self, text: str) -> bool:
+        return self._pattern.match((text or "").lstrip().lower()) is not None
+
+    def is_exactly(self, text: str) -> bool:
+        """Checking whether the whole message is one phrase, ignoring surrounding punctuation"""
+        return self._pattern.fullmatch((text or "").strip().strip("!?.,;: ").lower()) is not None
+
+def _load_patterns() -> Dict[str, List[str]]:
+    patterns = dict(INTENT_PATTERNS)
+    if PATTERNS_PATH and os.path.exists(PATTERNS_PATH):
+        with open(PATTERNS_PATH) as patterns_file:
+            patterns.update(json.load(patterns_file))
+    return patterns
+
+_matchers: Dict[str, IntentMatcher] = {name: IntentMatcher(phrases) for name, phrases in _load_patterns().items()}
+
+def matcher(intent: str) -> IntentMatcher:
+    """Returning the compiled matcher for an intent"""
+    return _matchers[intent]
+
+def benchmark(iterations: int = 20000) -> Dict[str, float]:
+    """Timing the compiled matchers against one word-bounded regex per phrase and the old substring
+    scans (which misfire on partial words), in microseconds per message"""
+    samples = [
+        "Write a blog post about this year's product launch and its marketing plan",
+        "hello there",
+        "Summarize the uploaded pdf for my manager in three bullet points",
+        "I don't have any references to share right now",
+        "Can you suggest a few random ideas for practising prompts?",
+    ]
+    results = {}
+    for name, phrases in INTENT_PATTERNS.items():
+        compiled = matcher(name)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for sample in samples:
+                compiled.matches(sample)
+        compiled_us = (time.perf_counter() - started) / (iterations * len(samples)) * 1e6
+
+        per_phrase = [re.compile(rf"(?<!\w){re.escape(phrase)}(?!\w)") for phrase in phrases]
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for sample in samples:
+                lowered = sample.lower()
+                any(pattern.search(lowered) for pattern in per_phrase)
+        per_phrase_us = (time.perf_counter() - started) / (iterations * len(samples)) * 1e6
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for sample in samples:
+                lowered = sample.lower()
+                any(phrase in lowered for phrase in phrases)
+        scan_us = (time.perf_counter() - started) / (iterations * len(samples)) * 1e6
+        results[name] = {
+            "compiled_us": round(compiled_us, 3),
+            "per_phrase_regex_us": round(per_phrase_us, 3),
+            "substring_scan_us": round(scan_us, 3),
+        }
+    return results
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(json.dumps(benchmark(iterations), indent=2))
@@ -0,0 +1,332 @@
+import os
+import math
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from groq import APIConnectionError, APIStatusError
+from langchain_core.messages import BaseMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_groq import ChatGroq
+
+load_dotenv()
+
+# Provider limits shared by every LLM call in this process, 0 disables a limit.
+# Defaults match Groq's free tier for llama-3.1-8b-instant, set them to your plan's limits
+REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", "30"))
+TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", "6000"))
+MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+# Calls waiting beyond these limits are turned away with a 503 instead of piling up
+MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "100"))
+QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX_SECONDS", "20"))
+# Completion tokens reserved for a call that sets no max_tokens, corrected once usage is known
+COMPLETION_TOKENS = int(os.environ.get("LLM_COMPLETION_TOKENS_ESTIMATE", "512"))
+
+# Lower rank is served first, chat turns go ahead of background and fan-out work
+LANES = {"interactive": 0, "batch": 1}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+current_lane: ContextVar[str] = ContextVar("llm_lane", default="interactive")
+
+@contextmanager
+def lane(name: str):
+    """Running the LLM calls made inside the block (and tasks started from it) in another lane"""
+    if name not in LANES:
+        raise ValueError(f"Unknown LLM lane '{name}', expected one of {', '.join(LANES)}")
+    token = current_lane.set(name)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+class LLMBusy(HTTPException):
+    """The provider's rate limit is exhausted, routes pass this on as a 503 with Retry-After"""
+
+    def __init__(self, detail: str, retry_after: float = 1):
+        super().__init__(
+            status_code=503,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+class TokenBucket:
+    """Budget refilling continuously up to one minute's worth, 0 per minute means unlimited"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until the amount fits, calls larger than the whole budget wait for a full bucket"""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        if self.capacity:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Returning an overestimate, or going into debt for an underestimate"""
+        if self.capacity:
+            self.level = min(self.capacity, self.level + amount)
+
+class LLMScheduler:
+    """One queue in front of the provider for every agent and tool, served by lane then arrival"""
+
+    def __init__(
+        self,
+        requests_per_minute: int = REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = TOKENS_PER_MINUTE,
+        max_concurrency: int = MAX_CONCURRENCY,
+        max_queue: int = MAX_QUEUE,
+        queue_timeout: float = QUEUE_TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.active = 0
+        # Entries are (lane rank, arrival, sequence, lane, future, tokens), a cancelled future is
+        # skipped when reached. Retries keep their arrival, the sequence keeps entries unique
+        self._waiting: List[tuple] = []
+        self._arrivals = itertools.count()
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Set from Retry-After, nothing is dispatched before this time
+        self._paused_until = 0.0
+        self.counters = {"calls": 0, "retries": 0, "rate_limited": 0, "rejected": 0, "timeouts": 0}
+        self.tokens_used = 0
+        self._wait_seconds = {name: 0.0 for name in LANES}
+        self._dispatched = {name: 0 for name in LANES}
+
+    def _dispatch(self) -> None:
+        """Granting slots in lane order while concurrency and both budgets allow"""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiting and self.active < self.max_concurrency:
+            _, _, _, _, future, tokens = self._waiting[0]
+            if future.done():
+                heapq.heappop(self._waiting)
+                continue
+            now = time.monotonic()
+            delay = max(self._paused_until - now, self.requests.delay(1, now), self.tokens.delay(tokens, now))
+            if delay > 0:
+                # Later calls wait too, so a batch call never overtakes a waiting chat turn
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._waiting)
+            self.requests.take(1, now)
+            self.tokens.take(tokens, now)
+            self.active += 1
+            future.set_result(None)
+
+    def ticket(self) -> int:
+        """Arrival number for a call, reused by its retries so they keep their place in the queue"""
+        return next(self._arrivals)
+
+    async def _acquire(self, lane_name: str, tokens: int, arrival: int) -> None:
+        if sum(not entry[4].done() for entry in self._waiting) >= self.max_queue:
+            self.counters["rejected"] += 1
+            raise LLMBusy("Too many requests are waiting for the language model, try again shortly", self.backoff_max)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (LANES[lane_name], arrival, next(self._sequence), lane_name, future, tokens))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise LLMBusy("The language model is busy, try again shortly", self.backoff_max)
+        except asyncio.CancelledError:
+            # Granted just before the caller went away, the slot is handed on
+            if future.done() and not future.cancelled():
+                self._release(tokens, tokens)
+            raise
+
+    def _release(self, reserved: int, used: int) -> None:
+        self.active -= 1
+        self.tokens.adjust(reserved - used)
+        self.tokens_used += used
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, tokens: int, lane_name: Optional[str] = None, arrival: Optional[int] = None):
+        """Holding one concurrency slot and the estimated tokens, set usage["tokens"] to the actual count
+        and usage["billed"] to what a call that fails part way has already been charged"""
+        lane_name = lane_name or current_lane.get()
+        queued = time.monotonic()
+        await self._acquire(lane_name, tokens, self.ticket() if arrival is None else arrival)
+        self._wait_seconds[lane_name] += time.monotonic() - queued
+        self._dispatched[lane_name] += 1
+        self.counters["calls"] += 1
+        usage = {"tokens": tokens, "billed": 0}
+        try:
+            yield usage
+        except BaseException as e:
+            # Failed calls are only billed for what the provider already sent, the rest goes back to the budget
+            usage["tokens"] = usage["billed"]
+            # Pausing before the slot is handed on, or the next queued call would go straight out
+            self._pause_for_rate_limit(e)
+            raise
+        finally:
+            self._release(tokens, usage["tokens"])
+
+    def _pause_for_rate_limit(self, error: BaseException) -> None:
+        if getattr(error, "status_code", None) != 429:
+            return
+        self.counters["rate_limited"] += 1
+        # The limit is shared, so every queued call waits it out, not just this one
+        retry_after = parse_retry_after(getattr(error, "response", None))
+        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying a failed call, None when it should not be retried"""
+        status = getattr(error, "status_code", None)
+        if not (status in RETRY_STATUSES or isinstance(error, APIConnectionError)):
+            return None
+
+        retry_after = parse_retry_after(getattr(error, "response", None)) if status == 429 else 0.0
+        if attempt >= self.max_retries:
+            return None
+
+        backoff = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        # Never earlier than Retry-After, spread out so workers do not retry in lockstep
+        return max(retry_after, backoff) * random.uniform(1.0, 1.5)
+
+    async def retry_or_raise(self, error: Exception, attempt: int) -> None:
+        """Sleeping before the next attempt, or raising once retries are used up"""
+        delay = self.retry_delay(error, attempt)
+        if delay is None:
+            if isinstance(error, APIStatusError) and error.status_code in RETRY_STATUSES:
+                raise LLMBusy("The language model is over its rate limit, try again shortly", parse_retry_after(error.response)) from error
+            raise error
+        self.counters["retries"] += 1
+        await asyncio.sleep(delay)
+
+    async def call(self, fn: Callable[[Dict[str, int]], Awaitable[Any]], tokens: int, lane_name: Optional[str] = None) -> Any:
+        """Running one LLM call through the queue, retrying rate limits and transient errors"""
+        attempt = 0
+        arrival = self.ticket()
+        while True:
+            try:
+                async with self.slot(tokens, lane_name, arrival) as usage:
+                    return await fn(usage)
+            except LLMBusy:
+                raise
+            except Exception as e:
+                await self.retry_or_raise(e, attempt)
+                attempt += 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        waiting = {name: 0 for name in LANES}
+        for entry in self._waiting:
+            if not entry[4].done():
+                waiting[entry[3]] += 1
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": waiting,
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "requests_available": round(self.requests.level, 1) if self.requests.capacity else None,
+            "tokens_available": round(self.tokens.level) if self.tokens.capacity else None,
+            "paused_seconds": round(max(0.0, self._paused_until - now), 2),
+            "tokens_used": self.tokens_used,
+            "avg_wait_ms": {
+                name: round(self._wait_seconds[name] / self._dispatched[name] * 1000, 1) if self._dispatched[name] else 0.0
+                for name in LANES
+            },
+            **self.counters,
+        }
+
+def parse_retry_after(response) -> float:
+    """Reading Retry-After (seconds) from a provider response, 1 second when missing"""
+    try:
+        return max(0.0, float(response.headers.get("retry-after")))
+    except (AttributeError, TypeError, ValueError):
+        return 1.0
+
+def estimate_tokens(messages: List[BaseMessage], max_tokens: Optional[int]) -> int:
+    return count_tokens_approximately(messages) + (max_tokens or COMPLETION_TOKENS)
+
+scheduler = LLMScheduler()
+
+class ScheduledChatGroq(ChatGroq):
+    """ChatGroq whose calls, including structured output and tool binding, go through the shared scheduler"""
+
+    def __init__(self, **kwargs: Any):
+        # Retries are the scheduler's job so they respect the shared limits
+        kwargs.setdefault("max_retries", 0)
+        super().__init__(**kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.streaming:
+            # ChatGroq streams through _astream, which is scheduled itself
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+        generate = super()._agenerate
+        async def scheduled(usage: Dict[str, int]) -> ChatResult:
+            result = await generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            usage["tokens"] = ((result.llm_output or {}).get("token_usage") or {}).get("total_tokens") or usage["tokens"]
+            return result
+        return await scheduler.call(scheduled, estimate_tokens(messages, self.max_tokens))
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        prompt_tokens = count_tokens_approximately(messages)
+        tokens = estimate_tokens(messages, self.max_tokens)
+        attempt = 0
+        arrival = scheduler.ticket()
+        while True:
+            streamed = 0
+            try:
+                async with scheduler.slot(tokens, arrival=arrival) as usage:
+                    async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                        # Groq sends about one token per chunk, so a disconnect part way is charged for those
+                        streamed += 1
+                        usage["billed"] = prompt_tokens + streamed
+                        usage_metadata = getattr(chunk.message, "usage_metadata", None)
+                        if usage_metadata and usage_metadata.get("total_tokens"):
+                            usage["tokens"] = usage["billed"] = usage_metadata["total_tokens"]
+                        yield chunk
+                return
+            except LLMBusy:
+                raise
+            except Exception as e:
+                # Tokens already reached the client, a retry would send them twice
+                if streamed:
+                    raise
+                await scheduler.retry_or_raise(e, attempt)
+                attempt += 1
+
+def stats() -> dict:
+    """Queue depth per lane, budgets left and how often the provider pushed back"""
+    return scheduler.stats()
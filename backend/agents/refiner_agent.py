@@ -1,31 +1,43 @@
 import sys
 import os
+import asyncio
 from dotenv import load_dotenv
-import psycopg
 from typing import TypedDict, Annotated, Literal
-from langchain_core.messages import AIMessage, HumanMessage, BaseMessage
+from langchain_core.messages import AIMessage, HumanMessage, BaseMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END, START
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.postgres import PostgresSaver
-from langchain_groq import ChatGroq
 from langgraph.prebuilt import ToolNode
-from agents.tools.refinement_tools import clarity_tool_list, precision_tool_list, creative_tool_list, rag_tool_list
+from agents.tools.refinement_tools import clarity_tool_list, precision_tool_list, creative_tool_list, rag_tool_list, thread_id_from_config, retrieve_document_context
+from agents.tools import document_registry
+from agents import semantic_cache, framework_router, category_classifier, intent_matcher
+from agents.llm_scheduler import ScheduledChatGroq, LLMBusy
 
 sys.path.append(os.path.abspath(".."))
 load_dotenv()
 
-DB_URI = os.environ.get("DATABASE_URL", "")
-if not DB_URI:
-    raise RuntimeError("DATABASE_URL is not set in environment")
-
 # Enabling LangSmith for refiner agent (only if tracing is enabled)
 os.environ["LANGSMITH_API_KEY"] = os.environ.get("REFINER_LANGSMITH_API_KEY", "")
 os.environ["LANGSMITH_PROJECT"] = os.environ.get("REFINER_LANGSMITH_PROJECT", "refiner_agent")
 
-llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.3)
+llm = ScheduledChatGroq(model="llama-3.1-8b-instant", temperature=0.3)
+
+# "inline" writes the analysis narrative before responding, "deferred" responds with the refined
+# prompt first and writes the narrative in the background, "template" never calls the LLM for it
+ANALYSIS_MODE = os.environ.get("REFINER_ANALYSIS_MODE", "inline").lower()
+
+# Upper bound on retrieved document text passed into a framework tool
+DOCUMENT_CONTEXT_MAX_CHARS = int(os.environ.get("REFINER_DOCUMENT_CONTEXT_MAX_CHARS", "4000"))
 
 all_tools = clarity_tool_list + precision_tool_list + creative_tool_list + rag_tool_list
-tool_node = ToolNode(all_tools)
+
+def tool_error(e: Exception) -> str:
+    """Reporting tool errors back to the graph, except rate limits which must reach the route as a 503"""
+    if isinstance(e, LLMBusy):
+        raise e
+    return f"Error: {e!r}\n Please fix your mistakes."
+
+tool_node = ToolNode(all_tools, handle_tool_errors=tool_error)
 
 # State
 class RefinerState(TypedDict):
@@ -34,10 +46,44 @@ class RefinerState(TypedDict):
     prompt_category: Literal["clarity", "precision", "creative", "greeting", "help_request"]
     framework_used: str
     has_document: bool  # Flag to indicate if RAG processing is needed
+    semantic_cache_hit: bool  # Refined prompt was reused from a near-duplicate request
+    document_context: str  # Relevant uploaded content, retrieved while the prompt is classified
+    analysis_mode: Literal["inline", "deferred", "template"]
+    analysis_deferred: bool  # This turn's narrative is still to be written outside the graph
     messages: Annotated[list, add_messages]
     
+async def wants_documents(state: RefinerState, config: RunnableConfig, prompt_lower: str) -> bool:
+    """RAG only applies when this thread actually uploaded something, and the user points at it"""
+    return await document_registry.ahas_documents(thread_id_from_config(config)) and (
+        bool(state.get("has_document")) or intent_matcher.matcher("rag").matches(prompt_lower)
+    )
+
+def with_document_context(prompt: str, document_context: str) -> str:
+    """Appending retrieved document content to the prompt handed to a framework tool"""
+    if not document_context:
+        return prompt
+    return f"""{prompt}
+
+Use this content from the user's uploaded documents to make the refined prompt specific:
+{document_context}"""
+
 # Graph Nodes
-def classify_category(state: RefinerState) -> dict:
+async def retrieve_documents(state: RefinerState, config: RunnableConfig = None) -> dict:
+    """Searching the thread's documents for the new prompt while classify_category runs"""
+    last_human_message = next((msg for msg in reversed(state["messages"]) if isinstance(msg, HumanMessage)), None)
+    # Always writing the field so a previous turn's context is never reused
+    if not last_human_message or not await wants_documents(state, config, last_human_message.content.lower()):
+        return {"document_context": ""}
+
+    try:
+        # Embedding and vector search are blocking, so they run off the event loop
+        context = await asyncio.to_thread(retrieve_document_context, last_human_message.content.strip(), thread_id_from_config(config))
+    except Exception as e:
+        print(f"Document retrieval failed, refining without documents: {e}")
+        context = ""
+    return {"document_context": context[:DOCUMENT_CONTEXT_MAX_CHARS]}
+
+async def classify_category(state: RefinerState, config: RunnableConfig = None) -> dict:
     last_human_message = next((msg for msg in reversed(state["messages"]) if isinstance(msg, HumanMessage)), None)
     if not last_human_message:
         return {} # Should not happen 
@@ -45,29 +91,30 @@ def classify_category(state: RefinerState) -> dict:
     original_prompt = last_human_message.content.strip()
     prompt_lower = original_prompt.lower()
 
-    greeting_patterns = ["hello", "hi", "hey", "greetings", "good morning", "good afternoon", "good evening"]
-    if any(prompt_lower.startswith(p) for p in greeting_patterns):
+    if intent_matcher.matcher("greeting").starts_with(prompt_lower):
         return {"prompt_category": "greeting", "original_prompt": original_prompt, "has_document": False}
 
-    help_patterns = ["framework", "help", "guide", "suggest", "recommend", "options", "what can you do"]
-    if any(p in prompt_lower for p in help_patterns):
+    if intent_matcher.matcher("help").matches(prompt_lower) or intent_matcher.matcher("help_command").is_exactly(prompt_lower):
         return {"prompt_category": "help_request", "original_prompt": original_prompt, "has_document": False}
 
-    # Checking for document/image uploads or RAG content indicators
-    rag_keywords = [
-        "from the document", "summarize the file", "what does it say about", "in the document", 
-        "based on the file", "according to the document", "upload", "uploaded", "document", 
-        "pdf", "image", "picture", "analyze this", "what's in this"
-    ]
-    has_document = any(keyword in prompt_lower for keyword in rag_keywords) or os.path.exists("./chroma_db")
+    has_document = await wants_documents(state, config, prompt_lower)
+
+    category = None
+    # Classifying locally with embedding centroids, the LLM only decides low confidence prompts
+    if category_classifier.CLASSIFIER_MODE == "local":
+        try:
+            category, _ = await category_classifier.classifier.apredict(original_prompt)
+        except Exception as e:
+            print(f"Local category classifier unavailable: {e}")
 
-    analysis_prompt = f"""Analyze the user prompt and categorize it into ONLY one of the following:
+    if category is None:
+        analysis_prompt = f"""Analyze the user prompt and categorize it into ONLY one of the following:
     "clarity", "precision", or "creative".
 User Prompt: "{original_prompt}"
 Return only the single category name."""
 
-    response = llm.invoke(analysis_prompt)
-    category = response.content.strip().lower()
+        response = await llm.ainvoke(analysis_prompt)
+        category = response.content.strip().lower()
 
     if category not in ["clarity", "precision", "creative"]:
         category = "clarity"
@@ -140,52 +187,61 @@ Ready to see what we can create together? """
     
     return {"messages": [AIMessage(content=response_content)]}
 
-# Prompt refinement with integrated RAG processing when documents are present.
-def process_prompt_refinement(state: RefinerState) -> dict:
+# Prompt refinement with document context injected straight into the framework tool
+async def process_prompt_refinement(state: RefinerState) -> dict:
     category = state["prompt_category"]
     prompt_to_refine = state["original_prompt"]
-    has_document = state.get("has_document", False)
+    # Documents were flagged but nothing relevant was found, so this is a plain refinement
+    document_context = state.get("document_context", "") if state.get("has_document", False) else ""
+    has_document = bool(document_context)
+    
+    # Reusing the refinement of a near-duplicate prompt skips the tool selection and tool LLM calls
+    if semantic_cache.SEMANTIC_CACHE_ENABLED and not has_document:
+        match = await semantic_cache.cache.alookup(prompt_to_refine, category)
+        if match:
+            return {
+                "messages": [AIMessage(content=match["refined_prompt"])],
+                "framework_used": match["framework_used"],
+                "semantic_cache_hit": True,
+                "has_document": False
+            }
+    
+    # The framework tool gets the retrieved content with the prompt, no document_search hop needed
+    tool_prompt = with_document_context(prompt_to_refine, document_context)
+
+    # Picking the framework locally saves the tool-selection LLM round trip
+    if framework_router.ROUTER_MODE == "local":
+        response = framework_router.routed_tool_call(category, prompt_to_refine, tool_prompt)
+        return {
+            "messages": [response],
+            "framework_used": response.tool_calls[0]["name"],
+            "semantic_cache_hit": False,
+            "has_document": has_document
+        }
     
-    # Select appropriate tools based on category and document presence
+    # Select appropriate tools based on category
     if category == "clarity": 
         selected_tools = clarity_tool_list
     elif category == "precision": 
         selected_tools = precision_tool_list
     else: 
         selected_tools = creative_tool_list
-    
-    # Add RAG tools if document is present
-    if has_document and os.path.exists("./chroma_db"):
-        selected_tools = selected_tools + rag_tool_list
 
-    # Ensure we always have access to all tools in the tool node
     # The LLM will only call tools it's bound with, but the tool node needs all tools
     llm_with_selected_tools = llm.bind_tools(tools=selected_tools)
 
+    document_note = ""
     if has_document:
-        system_prompt = f"""You are a prompt refinement expert helping users create better, more effective prompts.
-
-The user submitted this prompt: "{prompt_to_refine}"
-Category: {category}
-Document Available: Yes - The user has uploaded or referenced documents that should be used.
-
-Your task is to:
-1. First, if the prompt involves document analysis, call the document_search tool to gather relevant information
-2. Then, select the most appropriate refinement tool to enhance this prompt using both the original prompt and any document context
-
-Focus on making the prompt:
-- More specific and actionable with document context
-- Clearer in requirements and expectations
-- Better structured for getting quality results from both the prompt and available documents
-- More detailed about the desired output format
+        document_note = f"""
+The user has uploaded documents. This relevant content will be passed to the refinement tool with the prompt:
+{document_context}
+"""
 
-You must call the appropriate tools to both access documents (if needed) and refine the prompt."""
-    else:
-        system_prompt = f"""You are a prompt refinement expert helping users create better, more effective prompts.
+    system_prompt = f"""You are a prompt refinement expert helping users create better, more effective prompts.
 
 The user submitted this prompt: "{prompt_to_refine}"
 Category: {category}
-
+{document_note}
 Your task is to select the SINGLE most appropriate refinement tool to enhance this prompt. Focus on making it:
 - More specific and actionable
 - Clearer in its requirements and expectations  
@@ -194,17 +250,20 @@ Your task is to select the SINGLE most appropriate refinement tool to enhance th
 
 You must call exactly one refinement tool that best fits this prompt's needs."""
     
-    response = llm_with_selected_tools.invoke(system_prompt)
+    response = await llm_with_selected_tools.ainvoke(system_prompt)
     
     framework_used = "direct_refinement"
     if response.tool_calls:
         framework_used = response.tool_calls[0]['name']
+        # The model only picks the framework, the tool always refines the prompt plus document context
+        for tool_call in response.tool_calls:
+            tool_call["args"]["prompt"] = tool_prompt
 
-    return {"messages": [response], "framework_used": framework_used}
+    return {"messages": [response], "framework_used": framework_used, "semantic_cache_hit": False, "has_document": has_document}
 
 
 # Creating the final report for the user after a tool has been run.
-def generate_analysis(state: RefinerState) -> dict:
+async def generate_analysis(state: RefinerState) -> dict:
     original_prompt = state["original_prompt"]
     framework_used = state.get("framework_used", "direct_refinement")
     category = state["prompt_category"]
@@ -221,12 +280,56 @@ def generate_analysis(state: RefinerState) -> dict:
     if not refined_prompt:
         refined_prompt = state.get("refined_prompt", "No refined prompt available")
 
-    # Handle both regular refinement and document-aware refinement
+    # Remembering fresh tool refinements so near-duplicate prompts can reuse them
+    if (
+        semantic_cache.SEMANTIC_CACHE_ENABLED
+        and not state.get("semantic_cache_hit")
+        and not state.get("has_document", False)
+        and isinstance(state["messages"][-1], ToolMessage)
+    ):
+        await semantic_cache.cache.aadd(original_prompt, category, framework_used, refined_prompt)
+
     has_document = state.get("has_document", False)
-    
+    analysis_mode = state.get("analysis_mode") or ANALYSIS_MODE
+
+    # The refined prompt is ready now, the narrative around it is optional
+    if analysis_mode in ("deferred", "template"):
+        return {
+            "messages": [AIMessage(content=template_analysis(original_prompt, framework_used, refined_prompt, has_document))],
+            "refined_prompt": refined_prompt,
+            "analysis_deferred": analysis_mode == "deferred"
+        }
+
+    final_response = await llm.ainvoke(analysis_prompt(original_prompt, framework_used, refined_prompt, has_document))
+    return {"messages": [AIMessage(content=final_response.content)], "refined_prompt": refined_prompt, "analysis_deferred": False}
+
+FRAMEWORK_NAMES = {
+    "core_refiner": "C.O.R.E.",
+    "race_refiner": "R.A.C.E.",
+    "car_refiner": "C.A.R.",
+    "spear_refiner": "S.P.E.A.R.",
+    "risen_refiner": "RISEN",
+    "scorer_refiner": "SCORER",
+    "idea_refiner": "IDEA",
+}
+
+def template_analysis(original_prompt: str, framework_used: str, refined_prompt: str, has_document: bool = False) -> str:
+    """Short reply around the refined prompt, built locally instead of by the LLM"""
+    framework = FRAMEWORK_NAMES.get(framework_used, framework_used)
+    source = " together with your uploaded documents" if has_document else ""
+    return f"""**Here's your refined prompt!** ✨
+
+I used the **{framework}** framework{source} to make "{original_prompt}" clearer and more specific.
+
+{refined_prompt}
+
+Fill in any [placeholders] with your own details, and you're ready to go!"""
+
+def analysis_prompt(original_prompt: str, framework_used: str, refined_prompt: str, has_document: bool = False) -> str:
+    """Building the LLM prompt for the enthusiastic analysis narrative"""
     if has_document:
         # Special handling for document-aware refinement
-        analysis_prompt = f"""You are an enthusiastic and friendly prompt engineering coach who just helped transform a user's prompt using their uploaded documents! 
+        return f"""You are an enthusiastic and friendly prompt engineering coach who just helped transform a user's prompt using their uploaded documents! 
 
 The user originally wanted: "{original_prompt}"
 You used the {framework_used} approach along with their document context to create this amazing enhanced version: {refined_prompt}
@@ -240,11 +343,8 @@ Write a warm, engaging response that shows your genuine excitement about the tra
 
 Write like you're a passionate friend who just helped them unlock the power of their own content. Use emojis, exclamation points, and conversational phrases. Make them feel proud of what you created together!
         """
-        final_response = llm.invoke(analysis_prompt)
-        return {"messages": [AIMessage(content=final_response.content)], "refined_prompt": refined_prompt}
-    else:
-        # Regular refinement without documents
-        analysis_prompt = f"""You are an enthusiastic and friendly prompt engineering coach who just helped transform a user's prompt. The user originally wanted: "{original_prompt}"
+    # Regular refinement without documents
+    return f"""You are an enthusiastic and friendly prompt engineering coach who just helped transform a user's prompt. The user originally wanted: "{original_prompt}"
 
 You used the {framework_used} approach to create this amazing enhanced version: {refined_prompt}
 
@@ -257,19 +357,21 @@ Write a warm, engaging response that shows your genuine excitement about the tra
 
 Write like you're a passionate friend who just helped them solve a problem. Use emojis, exclamation points, and conversational phrases. Make them feel proud of what you created together!
         """
-        final_response = llm.invoke(analysis_prompt)
-        return {"messages": [AIMessage(content=final_response.content)], "refined_prompt": refined_prompt}
 
 # Building the Graph
 builder = StateGraph(RefinerState)
 
 builder.add_node("classify_category", classify_category)
+builder.add_node("retrieve_documents", retrieve_documents)
 builder.add_node("handle_conversation", handle_conversation)
 builder.add_node("process_prompt_refinement", process_prompt_refinement)
 builder.add_node("tool_node", tool_node)
 builder.add_node("generate_analysis", generate_analysis)
 
 builder.set_entry_point("classify_category")
+# Retrieval runs in the same step as classification, so its context is ready when refinement starts
+builder.add_edge(START, "retrieve_documents")
+builder.add_edge("retrieve_documents", END)
 
 def route_after_classification(state: RefinerState):
     category = state["prompt_category"]
@@ -299,18 +401,15 @@ builder.add_conditional_edges("process_prompt_refinement", route_to_tools, {
 builder.add_edge("tool_node", "generate_analysis")
 builder.add_edge("generate_analysis", END)
 
-# Compiling the Graph with memory using a persistent connection
+# Compiling the Graph, the API swaps in the Postgres checkpointer at startup
+def compile_graph(checkpointer=None):
+    """Compiling the refiner graph against the given checkpointer"""
+    return builder.compile(checkpointer=checkpointer)
 
-# Temporary connection for setup
-setup_conn = psycopg.connect(DB_URI)
-setup_conn.autocommit = True
-PostgresSaver(setup_conn).setup()
-setup_conn.close()
+refiner_graph = compile_graph()
 
-# Persistent connection for runtime
-conn = psycopg.connect(DB_URI)
-memory = PostgresSaver(conn)
-refiner_graph = builder.compile(checkpointer=memory)
+# Graph without a checkpointer for one-shot refinements, never swapped at startup
+stateless_refiner_graph = compile_graph()
 
 # Helper Function for Streamlit demo
 def extract_message_content(message: BaseMessage) -> tuple[str, str]:
@@ -0,0 +1,128 @@
+import os
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from agents.tools import vector_store
+
+load_dotenv()
+
+# Opt-in cache that reuses refinements for near-duplicate prompts
+SEMANTIC_CACHE_ENABLED = os.environ.get("REFINER_SEMANTIC_CACHE", "false").lower() == "true"
+SIMILARITY_THRESHOLD = float(os.environ.get("REFINER_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+MAX_ENTRIES = int(os.environ.get("REFINER_SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+def _embed_with_shared_model(text: str) -> List[float]:
+    return vector_store.get_embeddings().embed_query(text)
+
+class SemanticCache:
+    """Cosine-similarity index over past refinements, searched with one matrix product.
+
+    The index stays small (bounded by max_entries), so an exact search over a
+    normalised embedding matrix is as fast as an approximate one would be.
+    """
+
+    def __init__(self, threshold: float, max_entries: int, embed: Callable[[str], List[float]] = _embed_with_shared_model):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embed = embed
+        self._entries: List[dict] = []
+        self._vectors: Optional[np.ndarray] = None
+        # Prompts embedded for a lookup are usually stored right after, so keep their vectors
+        self._recent_vectors: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "additions": 0, "evictions": 0}
+
+    def _vector(self, prompt: str) -> np.ndarray:
+        with self._lock:
+            cached = self._recent_vectors.get(prompt)
+        if cached is not None:
+            return cached
+
+        vector = np.asarray(self.embed(prompt), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        with self._lock:
+            self._recent_vectors[prompt] = vector
+            while len(self._recent_vectors) > 64:
+                self._recent_vectors.popitem(last=False)
+        return vector
+
+    def lookup(self, prompt: str, category: str) -> Optional[dict]:
+        """Returning the stored refinement most similar to the prompt, if it clears the threshold"""
+        vector = self._vector(prompt)
+        with self._lock:
+            if self._vectors is None or not self._entries:
+                self.counters["misses"] += 1
+                return None
+
+            scores = self._vectors @ vector
+            # Only entries refined for the same category are interchangeable
+            for index, entry in enumerate(self._entries):
+                if entry["category"] != category:
+                    scores[index] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.counters["misses"] += 1
+                return None
+
+            entry = self._entries[best]
+            entry["hits"] += 1
+            entry["last_used"] = time.time()
+            self.counters["hits"] += 1
+            return {**entry, "similarity": float(scores[best])}
+
+    def add(self, prompt: str, category: str, framework_used: str, refined_prompt: str) -> None:
+        """Storing a finished refinement, evicting the least useful entry when full"""
+        vector = self._vector(prompt)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Least hit entries go first, oldest use breaks ties
+                victim = min(range(len(self._entries)), key=lambda i: (self._entries[i]["hits"], self._entries[i]["last_used"]))
+                del self._entries[victim]
+                self._vectors = np.delete(self._vectors, victim, axis=0)
+                self.counters["evictions"] += 1
+
+            self._entries.append({
+                "prompt": prompt,
+                "category": category,
+                "framework_used": framework_used,
+                "refined_prompt": refined_prompt,
+                "hits": 0,
+                "last_used": time.time(),
+            })
+            row = vector.reshape(1, -1)
+            self._vectors = row if self._vectors is None or len(self._vectors) == 0 else np.vstack([self._vectors, row])
+            self.counters["additions"] += 1
+
+    async def alookup(self, prompt: str, category: str) -> Optional[dict]:
+        # Embedding is CPU bound, so it runs off the event loop
+        return await asyncio.to_thread(self.lookup, prompt, category)
+
+    async def aadd(self, prompt: str, category: str, framework_used: str, refined_prompt: str) -> None:
+        await asyncio.to_thread(self.add, prompt, category, framework_used, refined_prompt)
+
+    def stats(self) -> dict:
+        """Reporting hit counters and the most reused entries"""
+        with self._lock:
+            counters = dict(self.counters)
+            top_entries = sorted(self._entries, key=lambda entry: entry["hits"], reverse=True)[:10]
+            size = len(self._entries)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "enabled": SEMANTIC_CACHE_ENABLED,
+            "threshold": self.threshold,
+            "size": size,
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 3) if lookups else 0.0,
+            "top_entries": [
+                {"prompt": entry["prompt"], "framework_used": entry["framework_used"], "hits": entry["hits"]}
+                for entry in top_entries
+            ],
+        }
+
+cache = SemanticCache(SIMILARITY_THRESHOLD, MAX_ENTRIES)
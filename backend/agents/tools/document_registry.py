@@ -0,0 +1,118 @@
+import os
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Records which uploaded documents belong to which conversation thread.
+# Backed by SQLite so every worker on the host sees the same uploads.
+REGISTRY_PATH = os.environ.get("DOCUMENT_REGISTRY_PATH", "./document_registry.sqlite3")
+
+# How long a thread found without documents is remembered. Uploads through this worker
+# clear it at once, uploads through another worker are seen once it expires
+NEGATIVE_TTL = float(os.environ.get("DOCUMENT_REGISTRY_NEGATIVE_TTL_SECONDS", "10"))
+NEGATIVE_MAX_ENTRIES = 10000
+
+_lock = threading.Lock()
+_initialized = False
+# Threads known to have documents, so the common lookup never touches disk twice
+_threads_with_documents: set = set()
+# Threads recently found without documents, mapped to when that answer expires
+_threads_without_documents: Dict[str, float] = {}
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+    conn = sqlite3.connect(REGISTRY_PATH, timeout=5)
+    if not _initialized:
+        with _lock:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS thread_documents (
+                    thread_id TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    uploaded_at REAL NOT NULL,
+                    PRIMARY KEY (thread_id, filename)
+                )"""
+            )
+            conn.commit()
+            _initialized = True
+    return conn
+
+def register_document(thread_id: str, filename: str) -> None:
+    """Recording that a document was uploaded to a thread"""
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO thread_documents (thread_id, filename, uploaded_at) VALUES (?, ?, ?)",
+            (thread_id, filename, time.time())
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    with _lock:
+        _threads_with_documents.add(thread_id)
+        _threads_without_documents.pop(thread_id, None)
+
+def _cached(thread_id: str) -> Optional[bool]:
+    if thread_id in _threads_with_documents:
+        return True
+    expires = _threads_without_documents.get(thread_id)
+    if expires is not None and expires > time.monotonic():
+        return False
+    return None
+
+def has_documents(thread_id: Optional[str]) -> bool:
+    """Checking whether a thread has any uploaded documents"""
+    if not thread_id:
+        return False
+    cached = _cached(thread_id)
+    if cached is not None:
+        return cached
+
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT 1 FROM thread_documents WHERE thread_id = ? LIMIT 1", (thread_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    with _lock:
+        if row:
+            _threads_with_documents.add(thread_id)
+        else:
+            if len(_threads_without_documents) >= NEGATIVE_MAX_ENTRIES:
+                _threads_without_documents.clear()
+            _threads_without_documents[thread_id] = time.monotonic() + NEGATIVE_TTL
+    return row is not None
+
+async def ahas_documents(thread_id: Optional[str]) -> bool:
+    """Same check for graph nodes, only a cache miss reads SQLite and then off the event loop"""
+    if not thread_id:
+        return False
+    cached = _cached(thread_id)
+    if cached is not None:
+        return cached
+    return await asyncio.to_thread(has_documents, thread_id)
+
+def list_documents(thread_id: str) -> List[str]:
+    """Listing the filenames uploaded to a thread"""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT filename FROM thread_documents WHERE thread_id = ? ORDER BY uploaded_at", (thread_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [row[0] for row in rows]
+
+def remove_thread(thread_id: str) -> int:
+    """Forgetting a thread's documents, returns how many entries were removed"""
+    conn = _connect()
+    try:
+        removed = conn.execute("DELETE FROM thread_documents WHERE thread_id = ?", (thread_id,)).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    with _lock:
+        _threads_with_documents.discard(thread_id)
+    return removed
@@ -0,0 +1,162 @@
+import os
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Cache settings for framework refinement outputs
+CACHE_ENABLED = os.environ.get("REFINEMENT_CACHE_ENABLED", "true").lower() == "true"
+CACHE_PATH = os.environ.get("REFINEMENT_CACHE_PATH", "./refinement_cache.sqlite3")
+CACHE_TTL_SECONDS = int(os.environ.get("REFINEMENT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.environ.get("REFINEMENT_CACHE_MAX_ENTRIES", "5000"))
+MEMORY_MAX_ENTRIES = int(os.environ.get("REFINEMENT_CACHE_MEMORY_ENTRIES", "256"))
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapsing whitespace and case so trivially different prompts share an entry"""
+    return " ".join(prompt.split()).lower()
+
+def cache_key(framework: str, prompt: str, model: str, temperature: float) -> str:
+    """Building the cache key from the framework, normalised prompt and model settings"""
+    raw = "\x1f".join([framework, normalize_prompt(prompt), model, str(temperature)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class RefinementCache:
+    """Two-tier cache, an in-memory LRU in front of a SQLite store with TTL and size-based eviction"""
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int, memory_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._initialized = False
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._initialized:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS refinements (
+                    key TEXT PRIMARY KEY,
+                    framework TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS refinements_last_access ON refinements (last_access)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (value, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def get_from_memory(self, key: str) -> Optional[str]:
+        """Looking up the in-memory tier only"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            return value
+
+    def get_from_disk(self, key: str) -> Optional[str]:
+        """Looking up the SQLite tier and promoting hits into memory"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM refinements WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE refinements SET last_access = ? WHERE key = ?", (now, key))
+                conn.commit()
+        finally:
+            conn.close()
+
+        if row is None:
+            self._count("misses")
+            return None
+        self._count("disk_hits")
+        self._remember(key, row[0], row[1])
+        return row[0]
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.get_from_memory(key)
+        if value is not None:
+            return value
+        return self.get_from_disk(key)
+
+    def set(self, key: str, framework: str, value: str) -> None:
+        """Storing a refinement in both tiers and evicting expired or least recently used rows"""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        self._remember(key, value, expires_at)
+
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO refinements (key, framework, value, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, framework, value, expires_at, now)
+            )
+            evicted = conn.execute("DELETE FROM refinements WHERE expires_at < ?", (now,)).rowcount
+            evicted += conn.execute(
+                """DELETE FROM refinements WHERE key IN (
+                    SELECT key FROM refinements ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,)
+            ).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._count("writes")
+        if evicted:
+            self._count("evictions", evicted)
+
+    async def aget(self, key: str) -> Optional[str]:
+        # Memory hits are answered inline, only the disk lookup leaves the event loop
+        value = self.get_from_memory(key)
+        if value is not None:
+            return value
+        return await asyncio.to_thread(self.get_from_disk, key)
+
+    async def aset(self, key: str, framework: str, value: str) -> None:
+        await asyncio.to_thread(self.set, key, framework, value)
+
+    def stats(self) -> dict:
+        """Reporting hit and miss counters for the cache"""
+        with self._lock:
+            counters = dict(self.counters)
+            memory_size = len(self._memory)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {
+            "enabled": CACHE_ENABLED,
+            **counters,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": memory_size,
+        }
+
+cache = RefinementCache(CACHE_PATH, CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES, MEMORY_MAX_ENTRIES)
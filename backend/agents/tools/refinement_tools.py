@@ -1,22 +1,37 @@
-import os
+import asyncio
 from dotenv import load_dotenv
 from langchain_core.tools import tool
+from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
-from langchain_groq import ChatGroq
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
+from agents.tools import vector_store, document_registry, refinement_cache
+from agents.llm_scheduler import ScheduledChatGroq
 
 load_dotenv()
-llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.3)
+llm = ScheduledChatGroq(model="llama-3.1-8b-instant", temperature=0.3)
+
+async def run_refinement(framework: str, prompt: str, system_prompt: str) -> str:
+    """Calling the refinement LLM, reusing cached output for identical prompts and model settings"""
+    if not refinement_cache.CACHE_ENABLED:
+        refined_prompt = await llm.ainvoke(system_prompt)
+        return refined_prompt.content
+
+    key = refinement_cache.cache_key(framework, prompt, llm.model_name, llm.temperature)
+    cached = await refinement_cache.cache.aget(key)
+    if cached is not None:
+        return cached
+
+    refined_prompt = await llm.ainvoke(system_prompt)
+    await refinement_cache.cache.aset(key, framework, refined_prompt.content)
+    return refined_prompt.content
 
 class RefinePromptArgs(BaseModel):
     prompt: str = Field(description="The user's original, unrefined prompt.")
 
 # Clarity Tools 
 @tool("core_refiner", args_schema=RefinePromptArgs, return_direct=False)
-def core_refine(prompt: str) -> str:
+async def core_refine(prompt: str) -> str:
     """Refines prompts using C.O.R.E. (Context, Objective, Role, Example).
     Best for prompts needing better structure."""
     
@@ -39,11 +54,10 @@ Enhance the prompt by:
 
 Create a refined version that builds on what they provided while identifying what additional information would make it even better."""
 
-    refined_prompt = llm.invoke(system_prompt)
-    return refined_prompt.content
+    return await run_refinement("core_refiner", prompt, system_prompt)
 
 @tool("race_refiner", args_schema=RefinePromptArgs, return_direct=False)
-def race_refine(prompt: str) -> str:
+async def race_refine(prompt: str) -> str:
     """Refines prompts using R.A.C.E. (Role, Action, Context, Expectation). 
     Best for prompts needing clear roles and actions."""
     
@@ -66,11 +80,10 @@ Enhance the prompt by:
 
 Create a refined version that builds on their actual input while indicating where more specifics would improve results."""
 
-    refined_prompt = llm.invoke(system_prompt)
-    return refined_prompt.content
+    return await run_refinement("race_refiner", prompt, system_prompt)
 
 @tool("car_refiner", args_schema=RefinePromptArgs, return_direct=False)
-def car_refine(prompt: str) -> str:
+async def car_refine(prompt: str) -> str:
     """Refines prompts using C.A.R. (Context, Action, Result).
     Best for direct prompts needing clear context and outcomes."""
     
@@ -93,11 +106,10 @@ Enhance the prompt by:
 
 Create a refined version that works with their actual input while indicating where more details would enhance results."""
 
-    refined_prompt = llm.invoke(system_prompt)
-    return refined_prompt.content
+    return await run_refinement("car_refiner", prompt, system_prompt)
 
 @tool("spear_refiner", args_schema=RefinePromptArgs, return_direct=False)
-def spear_refine(prompt: str) -> str:
+async def spear_refine(prompt: str) -> str:
     """Refines prompts using S.P.E.A.R. (Situation, Problem, Emotion, Action, Result).
     Best for complex prompts with emotional context."""
     
@@ -109,14 +121,13 @@ Analyze the prompt and infer any missing components (Situation, Problem, Emotion
 User's Prompt: "{prompt}"
 Construct a new, refined prompt based on your analysis."""
 
-    refined_prompt = llm.invoke(system_prompt)
-    return refined_prompt.content
+    return await run_refinement("spear_refiner", prompt, system_prompt)
 
 clarity_tool_list = [core_refine, race_refine, car_refine, spear_refine]
 
 # Precision Tools
 @tool("risen_refiner", args_schema=RefinePromptArgs, return_direct=False)
-def risen_refine(prompt: str) -> str:
+async def risen_refine(prompt: str) -> str:
     """Refines prompts using Risen (Role, Instructions, Steps, Goal, Narrowing).
     Best for technical prompts needing step-by-step instructions."""
     
@@ -140,11 +151,10 @@ Enhance the prompt by:
 
 Create a refined version that builds on their actual input while indicating where more specifics would improve the results."""
 
-    refined_prompt = llm.invoke(system_prompt)
-    return refined_prompt.content
+    return await run_refinement("risen_refiner", prompt, system_prompt)
 
 @tool("scorer_refiner", args_schema=RefinePromptArgs, return_direct=False)
-def scorer_refine(prompt: str) -> str:
+async def scorer_refine(prompt: str) -> str:
     """Refines prompts using SCORER (Set scene, Clarify task, Offer options, Refine output, 
     Evaluate, Reflect). Best for complex projects needing planning."""
     
@@ -156,14 +166,13 @@ Analyze the prompt and infer any missing components (Set scene, Clarify task, Of
 User's Prompt: "{prompt}"
 Construct a new, refined prompt based on your analysis."""
 
-    refined_prompt = llm.invoke(system_prompt)
-    return refined_prompt.content
+    return await run_refinement("scorer_refiner", prompt, system_prompt)
 
 precision_tool_list = [risen_refine, scorer_refine]
 
 # Creative Tools 
 @tool("idea_refiner", args_schema=RefinePromptArgs, return_direct=False)
-def idea_refine(prompt: str) -> str:
+async def idea_refine(prompt: str) -> str:
     """Refines prompts using IDEA (Inspire, Develop, Express, Assess). 
     Best for creative prompts needing brainstorming."""
     
@@ -185,70 +194,82 @@ Enhance the prompt by:
 
 Create a refined version that builds on what they provided while indicating where additional specifics would improve the results."""
 
-    refined_prompt = llm.invoke(system_prompt)
-    return refined_prompt.content
+    return await run_refinement("idea_refiner", prompt, system_prompt)
 
 creative_tool_list = [idea_refine]
 
 # RAG Tools
 @tool("document_search")
-def search_documents(query: str) -> str:
+async def search_documents(query: str, config: RunnableConfig = None) -> str:
     """Searches uploaded documents for context to help refine a prompt. 
     Use this when you need information from a file or want to reference uploaded content."""
-    try:
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-mpnet-base-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'batch_size': 32}
+    thread_id = thread_id_from_config(config)
+    # Embedding and vector search are blocking, so they run off the event loop
+    return await asyncio.to_thread(_search_documents, query, thread_id)
+
+def thread_id_from_config(config: RunnableConfig = None):
+    """Reading the conversation thread ID from a runnable config"""
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+def retrieve_document_context(query: str, thread_id: str = None) -> str:
+    """Formatting this thread's chunks most relevant to the query, empty when nothing is close enough"""
+    # Only threads that uploaded something have chunks worth scanning
+    if not document_registry.has_documents(thread_id):
+        return ""
+
+    # Shared embedding model and collection handle, loaded once per process
+    store = vector_store.get_vector_store()
+
+    # Search with better parameters for more relevant results, limited to this thread's chunks
+    results = store.similarity_search_with_score(query, k=5, filter={"thread_id": thread_id})
+
+    # Filtering results by relevance score (lower scores are more similar)
+    relevant_results = [(doc, score) for doc, score in results if score < 0.8]
+    if not relevant_results:
+        return ""
+
+    # Formatting results with metadata and relevance scores
+    context_parts = []
+    for i, (doc, score) in enumerate(relevant_results):
+        filename = doc.metadata.get('filename', 'unknown')
+        relevance = "High" if score < 0.4 else "Medium" if score < 0.6 else "Low"
+        context_parts.append(
+            f"**Source {i+1}** (from {filename}, relevance: {relevance}):\n{doc.page_content}\n"
         )
-        persist_directory = "./chroma_db"
-        
-        if not os.path.exists(persist_directory):
+
+    return "Found relevant content from uploaded documents:\n\n" + "\n".join(context_parts)
+
+def _search_documents(query: str, thread_id: str = None) -> str:
+    try:
+        if not document_registry.has_documents(thread_id):
             return "No documents have been uploaded yet. Please upload a document first."
-        
-        vector_store = Chroma(
-            collection_name="uploads_collection",
-            embedding_function=embeddings,
-            persist_directory=persist_directory
-        )
-        
-        # Search with better parameters for more relevant results
-        results = vector_store.similarity_search_with_score(query, k=5)
-        
-        if not results:
+
+        context = retrieve_document_context(query, thread_id)
+        if not context:
             return "No relevant content found in uploaded documents for your query."
-        
-        # Filtering results by relevance score (lower scores are more similar)
-        relevant_results = [(doc, score) for doc, score in results if score < 0.8]
-        
-        if not relevant_results:
-            return "No highly relevant content found in uploaded documents for your query."
-        
-        # Formatting results with metadata and relevance scores
-        context_parts = []
-        for i, (doc, score) in enumerate(relevant_results):
-            filename = doc.metadata.get('filename', 'unknown')
-            relevance = "High" if score < 0.4 else "Medium" if score < 0.6 else "Low"
-            context_parts.append(
-                f"**Source {i+1}** (from {filename}, relevance: {relevance}):\n{doc.page_content}\n"
-            )
-        
-        context = "Found relevant content from uploaded documents:\n\n" + "\n".join(context_parts)
         return context
-        
+
     except Exception as e:
         return f"Error searching documents: {str(e)}"
 
 @tool("file_processor")
-def process_uploaded_file(file_content: str, filename: str = "uploaded_document") -> str:
+async def process_uploaded_file(file_content: str, filename: str = "uploaded_document", config: RunnableConfig = None) -> str:
     """Extracts text, generates embeddings, and stores it in the vector database with optimized batch processing."""
+    thread_id = thread_id_from_config(config)
+    return await asyncio.to_thread(_process_uploaded_file, file_content, filename, thread_id)
+
+def _process_uploaded_file(file_content: str, filename: str, thread_id: str = None) -> str:
     try:
-        # Creating document with better metadata
+        if not thread_id:
+            return "Error processing file: a conversation thread ID is required to upload documents."
+        
+        # Creating document with better metadata, tagged with its thread for filtered search
         documents = [Document(
             page_content=file_content, 
             metadata={
                 "source": "user_upload",
-                "filename": filename
+                "filename": filename,
+                "thread_id": thread_id
             }
         )]
         
@@ -261,21 +282,8 @@ def process_uploaded_file(file_content: str, filename: str = "uploaded_document"
         
         split_docs = text_splitter.split_documents(documents)
         
-        # Initialize embeddings once
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-mpnet-base-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'batch_size': 32}  # Batch processing
-        )
-        
-        persist_directory = "./chroma_db"
-        
-        # Initializing vector store
-        vector_store = Chroma(
-            collection_name="uploads_collection",
-            embedding_function=embeddings,
-            persist_directory=persist_directory
-        )
+        # Shared embedding model and collection handle, loaded once per process
+        store = vector_store.get_vector_store()
         
         # Batch processing for better performance
         batch_size = 10
@@ -283,7 +291,9 @@ def process_uploaded_file(file_content: str, filename: str = "uploaded_document"
         
         for i in range(0, total_chunks, batch_size):
             batch = split_docs[i:i + batch_size]
-            vector_store.add_documents(batch)
+            store.add_documents(batch)
+        
+        document_registry.register_document(thread_id, filename)
         
         return f"Successfully processed '{filename}'. Created {len(split_docs)} chunks with optimized batching."
     except Exception as e:
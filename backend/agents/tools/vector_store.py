@@ -0,0 +1,85 @@
+import os
+import resource
+import threading
+import time
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_chroma import Chroma
+
+# Shared RAG settings used by the refinement tools
+EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+PERSIST_DIRECTORY = "./chroma_db"
+COLLECTION_NAME = "uploads_collection"
+
+# Loaded once per process and reused by every tool call
+_lock = threading.Lock()
+_embeddings = None
+_vector_store = None
+_load_stats = {}
+
+def _rss_mb() -> float:
+    """Current resident memory of this process in MB"""
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Peak RSS (KB on Linux) where /proc is not available
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def get_embeddings() -> HuggingFaceEmbeddings:
+    """Returning the shared sentence-transformer, loading it on first use"""
+    global _embeddings
+    if _embeddings is None:
+        with _lock:
+            if _embeddings is None:
+                rss_before = _rss_mb()
+                started = time.perf_counter()
+                embeddings = HuggingFaceEmbeddings(
+                    model_name=EMBEDDING_MODEL,
+                    model_kwargs={'device': 'cpu'},
+                    encode_kwargs={'batch_size': 32}
+                )
+                rss_after = _rss_mb()
+                _load_stats.update({
+                    "model": EMBEDDING_MODEL,
+                    "load_seconds": round(time.perf_counter() - started, 3),
+                    "rss_before_mb": round(rss_before, 1),
+                    "rss_after_mb": round(rss_after, 1),
+                    "rss_delta_mb": round(rss_after - rss_before, 1),
+                })
+                print(f"Loaded embedding model {EMBEDDING_MODEL} in {_load_stats['load_seconds']}s (+{_load_stats['rss_delta_mb']} MB)")
+                _embeddings = embeddings
+    return _embeddings
+
+def get_vector_store() -> Chroma:
+    """Returning the shared Chroma collection handle for uploaded documents"""
+    global _vector_store
+    if _vector_store is None:
+        embeddings = get_embeddings()
+        with _lock:
+            if _vector_store is None:
+                _vector_store = Chroma(
+                    collection_name=COLLECTION_NAME,
+                    embedding_function=embeddings,
+                    persist_directory=PERSIST_DIRECTORY
+                )
+    return _vector_store
+
+def has_persisted_documents() -> bool:
+    """Checking whether any documents were ever stored on disk"""
+    return os.path.exists(PERSIST_DIRECTORY)
+
+def warm_up() -> None:
+    """Loading the embedding model and running one encode so the first query is fast"""
+    get_embeddings().embed_query("warm up")
+    if has_persisted_documents():
+        get_vector_store()
+
+def stats() -> dict:
+    """Reporting embedding model load time and memory footprint"""
+    return {
+        "embeddings_loaded": _embeddings is not None,
+        "vector_store_open": _vector_store is not None,
+        "current_rss_mb": round(_rss_mb(), 1),
+        **_load_stats,
+    }
@@ -0,0 +1,165 @@
+import os
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Optional
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastApi.sse import format_sse
+
+load_dotenv()
+
+# How long a turn waits for earlier turns on the same thread before giving up
+QUEUE_TIMEOUT = float(os.environ.get("THREAD_QUEUE_TIMEOUT_SECONDS", "120"))
+
+class ThreadQueue:
+    """One FIFO lock per thread so turns on a thread run strictly one after another"""
+
+    def __init__(self, timeout: float = QUEUE_TIMEOUT):
+        self.timeout = timeout
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Requests holding or waiting for each lock, the lock is dropped when this reaches zero
+        self._users: Dict[str, int] = {}
+        self.counters = {"turns": 0, "queued": 0, "timeouts": 0}
+
+    def _leave(self, key: str) -> None:
+        self._users[key] -= 1
+        if not self._users[key]:
+            del self._users[key]
+            del self._locks[key]
+
+    async def acquire(self, key: str) -> Callable[[], None]:
+        """Waiting for the thread's earlier turns, returns an idempotent release"""
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._users[key] = self._users.get(key, 0) + 1
+        self.counters["turns"] += 1
+        if self._users[key] > 1:
+            self.counters["queued"] += 1
+        try:
+            await asyncio.wait_for(lock.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            self._leave(key)
+            raise HTTPException(status_code=409, detail="Another turn on this thread is still running, try again shortly")
+        except BaseException:
+            self._leave(key)
+            raise
+
+        released = False
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                lock.release()
+                self._leave(key)
+        return release
+
+    def stats(self) -> dict:
+        return {
+            "active_threads": len(self._locks),
+            "waiting": sum(users - 1 for users in self._users.values()),
+            **self.counters,
+        }
+
+class Turn:
+    """One request's part in a graph run, either leading it or sharing the leader's result"""
+
+    def __init__(self, flights: "SingleFlight", key: str, future: asyncio.Future, leader: bool):
+        self.flights = flights
+        self.key = key
+        self.future = future
+        self.leader = leader
+        self.release: Callable[[], None] = lambda: None
+
+    def succeed(self, result: Any) -> None:
+        if self.leader and not self.future.done():
+            self.future.set_result(result)
+
+    def fail(self, error: BaseException) -> None:
+        # Cancellation is not passed on, close() gives followers a retryable error instead
+        if self.leader and isinstance(error, Exception) and not self.future.done():
+            self.future.set_exception(error)
+            # Marking the error as seen, followers are optional
+            self.future.exception()
+
+    async def close(self) -> None:
+        """Releasing the thread and ending the flight, safe to call more than once"""
+        if not self.leader:
+            return
+        self.release()
+        # A leader that stopped early (client disconnected) must not leave followers waiting
+        self.fail(HTTPException(status_code=409, detail="An identical request was cancelled, send it again"))
+        if self.flights._flights.get(self.key) is self.future:
+            del self.flights._flights[self.key]
+
+    async def shared_result(self) -> Any:
+        # Shielded so a disconnecting follower cannot cancel the leader's run
+        return await asyncio.shield(self.future)
+
+    async def run(self, work: Callable[[], Awaitable[Any]]) -> Any:
+        """Running the work as leader, or waiting for the identical run already in flight"""
+        if not self.leader:
+            return await self.shared_result()
+        try:
+            result = await work()
+            self.succeed(result)
+            return result
+        except BaseException as e:
+            self.fail(e)
+            raise
+        finally:
+            await self.close()
+
+class SingleFlight:
+    """Identical in-flight requests share one graph run and its result"""
+
+    def __init__(self, thread_queue: ThreadQueue):
+        self.thread_queue = thread_queue
+        self._flights: Dict[str, asyncio.Future] = {}
+        self.counters = {"runs": 0, "coalesced": 0}
+
+    async def start(self, key: str, thread_key: Optional[str] = None) -> Turn:
+        """Joining a matching run in flight, otherwise queueing on the thread to lead a new one"""
+        future = self._flights.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+            return Turn(self, key, future, leader=False)
+
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = future
+        self.counters["runs"] += 1
+        turn = Turn(self, key, future, leader=True)
+        if thread_key:
+            try:
+                turn.release = await self.thread_queue.acquire(thread_key)
+            except BaseException as e:
+                turn.fail(e)
+                await turn.close()
+                raise
+        return turn
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), **self.counters}
+
+def request_key(*parts: Any) -> str:
+    """Hashing everything that makes two requests the same turn"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+async def shared_result_stream(turn: Turn, build_response: Callable[[Any], Any]):
+    """Server-sent events for a request that joined another's run, only the final result is sent"""
+    try:
+        response = build_response(await turn.shared_result())
+        yield format_sse("result", response.model_dump())
+    except HTTPException as e:
+        yield format_sse("error", {"detail": e.detail})
+    except Exception as e:
+        print(f"An error occurred in the shared run: {e}")
+        yield format_sse("error", {"detail": "Internal Server Error"})
+
+thread_queue = ThreadQueue()
+single_flight = SingleFlight(thread_queue)
+
+def stats() -> dict:
+    """Reporting queued turns per thread and coalesced duplicate requests"""
+    return {"threads": thread_queue.stats(), "single_flight": single_flight.stats()}
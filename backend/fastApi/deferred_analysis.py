@@ -0,0 +1,135 @@
+import os
+import time
+import uuid
+import asyncio
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage
+from agents import refiner_agent, llm_scheduler
+from fastApi.concurrency import thread_queue
+from fastApi.sse import format_sse
+from fastApi.thread_state import rewrite_config
+
+load_dotenv()
+
+# How long a finished analysis can still be fetched before it is dropped
+ANALYSIS_TTL = float(os.environ.get("REFINER_ANALYSIS_TTL_SECONDS", "600"))
+
+class AnalysisEntry:
+    """One analysis narrative being written after its refined prompt was returned"""
+
+    def __init__(self):
+        self.status = "pending"
+        self.text = ""
+        self.created = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+
+    def done(self) -> bool:
+        return self.task is not None and self.task.done()
+
+class AnalysisStore:
+    """Writing refiner analysis narratives in the background, fetchable by id until they expire"""
+
+    def __init__(self, ttl: float = ANALYSIS_TTL):
+        self.ttl = ttl
+        self._entries: Dict[str, AnalysisEntry] = {}
+        self.counters = {"scheduled": 0, "completed": 0, "failed": 0, "expired": 0, "saved": 0, "save_errors": 0}
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for analysis_id, entry in list(self._entries.items()):
+            if entry.done() and now - entry.created > self.ttl:
+                del self._entries[analysis_id]
+                self.counters["expired"] += 1
+
+    def schedule(
+        self,
+        original_prompt: str,
+        framework_used: str,
+        refined_prompt: str,
+        has_document: bool = False,
+        graph=None,
+        config: Optional[dict] = None,
+        message_id: Optional[str] = None
+    ) -> str:
+        """Starting the narrative for a refined prompt, returns the id to fetch it with.
+        With a checkpointed thread the finished narrative replaces the templated reply (message_id) in it"""
+        self._expire()
+        analysis_id = str(uuid.uuid4())
+        entry = AnalysisEntry()
+        self._entries[analysis_id] = entry
+        self.counters["scheduled"] += 1
+        prompt = refiner_agent.analysis_prompt(original_prompt, framework_used, refined_prompt, has_document)
+        thread = (graph, config, message_id) if graph is not None and config and message_id else None
+        entry.task = asyncio.create_task(self._write(entry, prompt, thread))
+        return analysis_id
+
+    async def _write(self, entry: AnalysisEntry, prompt: str, thread: Optional[tuple]) -> None:
+        try:
+            # The refined prompt was already returned, chat turns are served ahead of the narrative
+            with llm_scheduler.lane("batch"):
+                async for chunk in refiner_agent.llm.astream(prompt):
+                    entry.text += chunk.content
+            if thread:
+                await self._save(entry.text, *thread)
+            entry.status = "done"
+            self.counters["completed"] += 1
+        except Exception as e:
+            print(f"Error writing deferred analysis: {e}")
+            entry.status = "error"
+            self.counters["failed"] += 1
+
+    async def _save(self, text: str, graph, config: dict, message_id: str) -> None:
+        """Replacing the templated reply stored with the thread, after any turn running on it"""
+        try:
+            release = await thread_queue.acquire(f"refiner:{config['configurable']['thread_id']}")
+            try:
+                # Same message id, so add_messages replaces the reply and history cursors stay valid.
+                # The checkpoint is marked, so the checkpoint_id the client already has stays usable
+                await graph.aupdate_state(
+                    rewrite_config(config),
+                    {"messages": [AIMessage(content=text, id=message_id)]},
+                    as_node="generate_analysis"
+                )
+            finally:
+                release()
+            self.counters["saved"] += 1
+        except Exception as e:
+            # The narrative can still be fetched by id, only the stored thread keeps the template
+            print(f"Error saving deferred analysis to thread: {e}")
+            self.counters["save_errors"] += 1
+
+    def get(self, analysis_id: str) -> Optional[AnalysisEntry]:
+        self._expire()
+        return self._entries.get(analysis_id)
+
+    async def wait(self, analysis_id: str, timeout: float = 30) -> Optional[AnalysisEntry]:
+        """Waiting up to the timeout for the narrative to finish, returns it as far as it got"""
+        entry = self.get(analysis_id)
+        if entry is not None:
+            # Waiting on the writer without cancelling it when the timeout runs out
+            await asyncio.wait([entry.task], timeout=timeout)
+        return entry
+
+    async def stream(self, entry: AnalysisEntry, token_event: str = "token", done_event: str = "done", interval: float = 0.05):
+        """Server-sent events with the narrative's new text as it is written, ending with its status"""
+        sent = 0
+        while True:
+            finished = entry.done()
+            if len(entry.text) > sent:
+                yield format_sse(token_event, {"content": entry.text[sent:]})
+                sent = len(entry.text)
+            if finished:
+                break
+            await asyncio.wait([entry.task], timeout=interval)
+        yield format_sse(done_event, {"status": entry.status})
+
+    def stats(self) -> dict:
+        return {
+            "pending": sum(not entry.done() for entry in self._entries.values()),
+            "stored": len(self._entries),
+            "ttl_seconds": self.ttl,
+            **self.counters,
+        }
+
+store = AnalysisStore()
@@ -0,0 +1,67 @@
+from fastapi import APIRouter
+from agents import refiner_agent, llm_scheduler, checkpointer, checkpoint_cache, checkpoint_retention, checkpoint_serde, semantic_cache, category_classifier, grammar_precheck
+from agents.tools import vector_store, refinement_cache
+from fastApi import concurrency, deferred_analysis
+from typing import Dict, Any
+
+router = APIRouter()
+
+@router.get("/llm_scheduler")
+async def llm_scheduler_metrics() -> Dict[str, Any]:
+    """LLM calls waiting per lane, rate limit budgets left and provider pushback"""
+    return llm_scheduler.stats()
+
+@router.get("/checkpointer")
+async def checkpointer_metrics() -> Dict[str, Any]:
+    """Checkpoint connection pool size and wait times"""
+    return checkpointer.pool_stats()
+
+@router.get("/checkpoint_cache")
+async def checkpoint_cache_metrics() -> Dict[str, Any]:
+    """Hot thread cache hit rate and checkpoints waiting to be written"""
+    return checkpoint_cache.stats()
+
+@router.get("/checkpoint_retention")
+async def checkpoint_retention_metrics() -> Dict[str, Any]:
+    """Checkpoint retention policy and rows and bytes reclaimed by the last run"""
+    return checkpoint_retention.stats()
+
+@router.get("/checkpoint_compression")
+async def checkpoint_compression_metrics() -> Dict[str, Any]:
+    """Checkpoint bytes before and after compression"""
+    return checkpoint_serde.serializer.stats()
+
+@router.get("/embeddings")
+async def embedding_metrics() -> Dict[str, Any]:
+    """Embedding model load time and memory footprint"""
+    return vector_store.stats()
+
+@router.get("/refinement_cache")
+async def refinement_cache_metrics() -> Dict[str, Any]:
+    """Framework refinement cache hit and miss counters"""
+    return refinement_cache.cache.stats()
+
+@router.get("/semantic_cache")
+async def semantic_cache_metrics() -> Dict[str, Any]:
+    """Near-duplicate refinement cache hits and most reused entries"""
+    return semantic_cache.cache.stats()
+
+@router.get("/category_classifier")
+async def category_classifier_metrics() -> Dict[str, Any]:
+    """How often categories were decided locally versus by the LLM"""
+    return {"mode": category_classifier.CLASSIFIER_MODE, **category_classifier.classifier.counters}
+
+@router.get("/grammar_precheck")
+async def grammar_precheck_metrics() -> Dict[str, Any]:
+    """How often the offline grammar check let coach input skip LLM correction"""
+    return grammar_precheck.precheck.stats()
+
+@router.get("/concurrency")
+async def concurrency_metrics() -> Dict[str, Any]:
+    """Turns queued behind others on the same thread and duplicate requests sharing a run"""
+    return concurrency.stats()
+
+@router.get("/deferred_analysis")
+async def deferred_analysis_metrics() -> Dict[str, Any]:
+    """Refiner analysis narratives written after the refined prompt was returned"""
+    return {"mode": refiner_agent.ANALYSIS_MODE, **deferred_analysis.store.stats()}
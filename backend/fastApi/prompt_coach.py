@@ -1,66 +1,98 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from langchain_core.messages import AIMessage
+from langchain_core.utils.json import parse_partial_json
 from models.coachResponse import CoachingResponse
 from models.coachRequest import CoachingRequest
+from models.threadHistory import ThreadHistoryPage
 from agents import coach_agent
+from fastApi.sse import format_sse, SSE_HEADERS
+from fastApi.concurrency import Turn, single_flight, request_key, shared_result_stream
+from fastApi.thread_state import latest_checkpoint_id, turn_messages, serialize_messages, messages_since, history_page
 import uuid
-from typing import Dict
+from typing import Dict, Tuple
 
 router = APIRouter()
 
+async def start_coach_turn(request: CoachingRequest) -> Tuple[Turn, str]:
+    """Queueing behind earlier turns on the thread, or joining an identical request already running"""
+    # Requests without a thread get their own instead of sharing one default thread
+    thread_id = request.thread_id or str(uuid.uuid4())
+    key = request_key("coach", thread_id, request.user_input, request.checkpoint_id, request.conversation_history)
+    return await single_flight.start(key, f"coach:{thread_id}"), thread_id
+
+async def prepare_coach_run(request: CoachingRequest, thread_id: str):
+    """Validating the request and building the graph input and config for a coach run"""
+    # Validating user input
+    if not request.user_input or not request.user_input.strip():
+        raise HTTPException(status_code=400, detail="User input cannot be empty")
+
+    config = {"configurable": {"thread_id": thread_id}}
+
+    # Only the new input is sent once the checkpointer holds the thread
+    messages = await turn_messages(
+        coach_agent.coach_graph,
+        config,
+        request.user_input,
+        request.conversation_history,
+        request.checkpoint_id
+    )
+
+    return {"messages": messages}, config
+
+async def run_coach_turn(request: CoachingRequest, thread_id: str):
+    """Running one coach turn, returning the final state, config and the next checkpoint cursor"""
+    graph_input, config = await prepare_coach_run(request, thread_id)
+    # Invoking compiled coaching graph with conversation context and thread management
+    final_state = await coach_agent.coach_graph.ainvoke(graph_input, config=config)
+    return final_state, config, await latest_checkpoint_id(coach_agent.coach_graph, config)
+
+def build_coaching_response(final_state: dict, request: CoachingRequest, config: dict, checkpoint_id: str = None) -> CoachingResponse:
+    """Creating the API response from the final coaching graph state"""
+    # Validating if agent response exists
+    if not final_state.get("messages") or len(final_state["messages"]) == 0:
+        raise HTTPException(status_code=500, detail="No response generated from coach agent")
+
+    # Getting the latest message from the agent
+    agent_output = final_state["messages"][-1].content
+
+    # Sending only what the client does not have yet, older turns are paged in from the history endpoint
+    new_messages = messages_since(final_state["messages"], request.history_cursor)
+    serialized_history = serialize_messages(new_messages, coach_agent.extract_message_content)
+
+    refined_prompt = (
+        final_state.get("final_prompt_corrected") or
+        final_state.get("final_prompt")
+    )
+
+    return CoachingResponse(
+        agent_output=agent_output,
+        refined_prompt=refined_prompt,
+        conversation_history=serialized_history,
+        history_cursor=final_state["messages"][-1].id,
+        thread_id=config["configurable"]["thread_id"],
+        checkpoint_id=checkpoint_id
+    )
+
+def partial_feedback(args: str) -> str:
+    """Pulling the feedback text out of partially streamed evaluation JSON"""
+    if not args:
+        return ""
+    try:
+        parsed = parse_partial_json(args)
+    except ValueError:
+        return ""
+    feedback = parsed.get("feedback") if isinstance(parsed, dict) else None
+    return feedback if isinstance(feedback, str) else ""
+
 @router.post("/chat", response_model=CoachingResponse)
 async def chat_with_coach(request: CoachingRequest):
     try:
-        # Validating user input
-        if not request.user_input or not request.user_input.strip():
-            raise HTTPException(status_code=400, detail="User input cannot be empty")
-        
-        # preserving conversation state
-        messages = []
-        
-        # Adding conversation history
-        if request.conversation_history:
-            for msg in request.conversation_history:
-                if msg["role"] == "user":
-                    messages.append(("human", msg["content"]))
-                elif msg["role"] == "assistant":
-                    messages.append(("ai", msg["content"]))
-        
-        # Adding current user input
-        messages.append(("human", request.user_input))
-        
-        # Generating unique thread ID for conversation persistence
-        thread_id = request.thread_id if hasattr(request, 'thread_id') and request.thread_id else "default_thread"
-        
-        # Invoking compiled coaching graph with conversation context and thread management
-        final_state = coach_agent.coach_graph.invoke(
-            {"messages": messages},
-            config={"configurable": {"thread_id": thread_id}}
-        )
-        
-        # Validating if agent response exists
-        if not final_state.get("messages") or len(final_state["messages"]) == 0:
-            raise HTTPException(status_code=500, detail="No response generated from coach agent")
-        
-        # Getting the latest message from the agent
-        agent_output = final_state["messages"][-1].content
-        
-        # creating conversation history
-        serialized_history = []
-        for msg in final_state.get("messages", []):
-            role, content = coach_agent.extract_message_content(msg)
-            serialized_history.append({"role": role, "content": content})
-        
-        refined_prompt = (
-            final_state.get("final_prompt_corrected") or 
-            final_state.get("final_prompt")
-        )
-        
-        return CoachingResponse(
-            agent_output=agent_output,
-            refined_prompt=refined_prompt,
-            conversation_history=serialized_history
-        )
-        
+        turn, thread_id = await start_coach_turn(request)
+        final_state, config, checkpoint_id = await turn.run(lambda: run_coach_turn(request, thread_id))
+        return build_coaching_response(final_state, request, config, checkpoint_id)
+
     except HTTPException:
         # Re-raise HTTP exceptions as-is
         raise
@@ -68,6 +100,102 @@ async def chat_with_coach(request: CoachingRequest):
         print(f"An error occurred: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@router.post("/chat/stream")
+async def chat_with_coach_stream(request: CoachingRequest):
+    """Streaming step changes, corrected text and feedback tokens as server-sent events"""
+    turn, thread_id = await start_coach_turn(request)
+    if not turn.leader:
+        # A duplicate of a running request only receives the shared final result
+        shared = shared_result_stream(turn, lambda result: build_coaching_response(result[0], request, result[1], result[2]))
+        return StreamingResponse(shared, media_type="text/event-stream", headers=SSE_HEADERS)
+
+    try:
+        graph_input, config = await prepare_coach_run(request, thread_id)
+    except BaseException as e:
+        turn.fail(e)
+        await turn.close()
+        raise
+
+    async def event_stream():
+        final_state = {}
+        current_step = None
+        # Structured evaluation output arrives as partial tool-call JSON, keyed by message id
+        evaluation_args: Dict[str, str] = {}
+        feedback_sent: Dict[str, int] = {}
+        try:
+            async for mode, chunk in coach_agent.coach_graph.astream(
+                graph_input,
+                config=config,
+                stream_mode=["updates", "messages", "custom", "values"]
+            ):
+                if mode == "custom":
+                    if "grammar_corrected" in chunk:
+                        yield format_sse("corrected", {"text": chunk["grammar_corrected"]})
+                elif mode == "messages":
+                    message, metadata = chunk
+                    if not isinstance(message, AIMessage):
+                        continue
+                    tags = metadata.get("tags") or []
+                    if coach_agent.GRAMMAR_TAG in tags or coach_agent.MEMORY_TAG in tags:
+                        # Corrected text is sent whole through the custom event above, memory summaries stay internal
+                        continue
+                    if coach_agent.EVALUATION_TAG in tags:
+                        for tool_chunk in getattr(message, "tool_call_chunks", None) or []:
+                            evaluation_args[message.id] = evaluation_args.get(message.id, "") + (tool_chunk.get("args") or "")
+                        feedback = partial_feedback(evaluation_args.get(message.id, ""))
+                        if len(feedback) > feedback_sent.get(message.id, 0):
+                            yield format_sse("feedback", {"content": feedback[feedback_sent.get(message.id, 0):]})
+                            feedback_sent[message.id] = len(feedback)
+                    elif message.content:
+                        yield format_sse("token", {
+                            "node": metadata.get("langgraph_node"),
+                            "content": message.content
+                        })
+                elif mode == "updates":
+                    for node, update in chunk.items():
+                        step = (update or {}).get("current_step")
+                        if step and step != current_step:
+                            current_step = step
+                            yield format_sse("step", {"node": node, "current_step": step})
+                else:
+                    final_state = chunk
+
+            checkpoint_id = await latest_checkpoint_id(coach_agent.coach_graph, config)
+            turn.succeed((final_state, config, checkpoint_id))
+            response = build_coaching_response(final_state, request, config, checkpoint_id)
+            yield format_sse("result", response.model_dump())
+        except HTTPException as e:
+            turn.fail(e)
+            yield format_sse("error", {"detail": e.detail})
+        except Exception as e:
+            turn.fail(e)
+            print(f"An error occurred while streaming: {e}")
+            yield format_sse("error", {"detail": "Internal Server Error"})
+        finally:
+            await turn.close()
+
+    # The background task frees the thread even if the client disconnects before streaming starts
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS, background=BackgroundTask(turn.close))
+
+@router.get("/threads/{thread_id}/messages", response_model=ThreadHistoryPage)
+async def get_coach_thread_messages(thread_id: str, before: str = None, limit: int = Query(20, ge=1, le=100)):
+    """Paging back through a coach thread's stored messages, newest page first"""
+    try:
+        page = await history_page(
+            coach_agent.coach_graph,
+            thread_id,
+            before,
+            limit,
+            coach_agent.extract_message_content,
+            summary_field="conversation_summary"
+        )
+        return ThreadHistoryPage(**page)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error reading coach thread: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
 @router.post("/threads")
 async def create_new_thread() -> Dict[str, str]:
     """Creating a new conversation thread ID"""
@@ -1,88 +1,305 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from langchain_core.messages import AIMessage, HumanMessage
 from models.refinerResponse import RefinerResponse
 from models.refinerRequest import RefinerRequest
+from models.threadHistory import ThreadHistoryPage
+from models.refinerCompareRequest import RefinerCompareRequest
+from models.refinerCompareResponse import RefinerCompareResponse
+from models.refinerAnalysis import RefinerAnalysisResponse
 from models.refine_prompt import RefinementAnalysis
-from agents import refiner_agent
+from models.documentRequest import DocumentUploadRequest
+from agents import refiner_agent, framework_compare
+from agents.tools import document_registry
+from agents.tools.refinement_tools import process_uploaded_file
+from fastApi.sse import format_sse, SSE_HEADERS
+from fastApi.concurrency import Turn, single_flight, request_key, shared_result_stream
+from fastApi.deferred_analysis import store as analysis_store
+from fastApi.thread_state import history_messages, latest_checkpoint_id, turn_messages, serialize_messages, messages_since, history_page
 import uuid
-from typing import Dict
+from typing import Dict, Any
 
 router = APIRouter()
 
+async def start_refiner_turn(request: RefinerRequest) -> Turn:
+    """Queueing behind earlier turns on the thread, or joining an identical request already running"""
+    checkpointed = request.thread_id and not request.stateless
+    key = request_key(
+        "refiner",
+        request.thread_id if checkpointed else None,
+        request.original_prompt,
+        request.checkpoint_id,
+        request.conversation_history,
+        request.has_document,
+        request.analysis_mode
+    )
+    # Stateless runs share no stored state, so only identical requests are coalesced
+    return await single_flight.start(key, f"refiner:{request.thread_id}" if checkpointed else None)
+
+async def prepare_refiner_run(request: RefinerRequest):
+    """Validating the request and building the graph, input and config for a refiner run"""
+    # Validating user input
+    if not request.original_prompt or not request.original_prompt.strip():
+        raise HTTPException(status_code=400, detail="Original prompt cannot be empty")
+
+    # One-shot refinements (explicit or without a thread) skip checkpointing entirely
+    # instead of piling every anonymous request onto one shared thread
+    if request.stateless or not request.thread_id:
+        graph = refiner_agent.stateless_refiner_graph
+        config = {}
+        # Nothing is stored, so the client's history is the whole conversation
+        messages = history_messages(request.conversation_history) + [("human", request.original_prompt)]
+    else:
+        graph = refiner_agent.refiner_graph
+        config = {"configurable": {"thread_id": request.thread_id}}
+        # Only the new input is sent once the checkpointer holds the thread
+        messages = await turn_messages(
+            graph,
+            config,
+            request.original_prompt,
+            request.conversation_history,
+            request.checkpoint_id
+        )
+
+    graph_input = {
+        "messages": messages,
+        "original_prompt": request.original_prompt,
+        "has_document": request.has_document or False,
+        "analysis_mode": request.analysis_mode or refiner_agent.ANALYSIS_MODE,
+        "analysis_deferred": False
+    }
+    return graph, graph_input, config
+
+async def response_checkpoint_id(graph, config: dict):
+    """Reading the cursor for the next turn, stateless runs have none"""
+    if not config:
+        return None
+    return await latest_checkpoint_id(graph, config)
+
+def schedule_analysis(final_state: dict, graph, config: dict):
+    """Starting the analysis narrative the graph left for later, returns its id"""
+    if not final_state.get("analysis_deferred"):
+        return None
+    return analysis_store.schedule(
+        final_state.get("original_prompt", ""),
+        final_state.get("framework_used", ""),
+        final_state.get("refined_prompt", ""),
+        final_state.get("has_document", False),
+        graph=graph,
+        config=config,
+        message_id=final_state["messages"][-1].id
+    )
+
+async def run_refiner_turn(request: RefinerRequest):
+    """Running one refiner turn, returning the final state, the next checkpoint cursor and any deferred analysis id"""
+    graph, graph_input, config = await prepare_refiner_run(request)
+    # Invoking compiled refiner graph with conversation context and thread management
+    final_state = await graph.ainvoke(graph_input, config=config)
+    return final_state, await response_checkpoint_id(graph, config), schedule_analysis(final_state, graph, config)
+
+def build_refiner_response(final_state: dict, request: RefinerRequest, checkpoint_id: str = None, analysis_id: str = None) -> RefinerResponse:
+    """Creating the API response from the final refiner graph state"""
+    # Validating for agent response
+    if not final_state.get("messages") or len(final_state["messages"]) == 0:
+        raise HTTPException(status_code=500, detail="No response generated from refiner agent")
+
+    # Getting latest message from the agent
+    agent_output = final_state["messages"][-1].content
+
+    # Sending only what the client does not have yet, older turns are paged in from the history endpoint
+    new_messages = messages_since(final_state["messages"], request.history_cursor)
+    serialized_history = serialize_messages(new_messages, refiner_agent.extract_message_content)
+
+    # Getting refinement analysis
+    refined_prompt = final_state.get("refined_prompt")
+    prompt_category = final_state.get("prompt_category")
+    framework_used = final_state.get("framework_used")
+
+    # Creating refinement analysis if we have the data
+    refinement_analysis = None
+    if refined_prompt and prompt_category and framework_used:
+        refinement_analysis = RefinementAnalysis(
+            category=prompt_category,
+            framework_used=framework_used,
+            reasoning=f"Applied {framework_used} framework for {prompt_category} improvement",
+            refined_prompt=refined_prompt
+        )
+
+    return RefinerResponse(
+        agent_output=agent_output,
+        refined_prompt=refined_prompt,
+        prompt_category=prompt_category,
+        framework_used=framework_used,
+        refinement_analysis=refinement_analysis,
+        conversation_history=serialized_history,
+        history_cursor=final_state["messages"][-1].id,
+        checkpoint_id=checkpoint_id,
+        analysis_id=analysis_id
+    )
+
 @router.post("/refine_chat", response_model=RefinerResponse)
 async def refine_prompt(request: RefinerRequest):
     try:
-        # Validating user input
-        if not request.original_prompt or not request.original_prompt.strip():
-            raise HTTPException(status_code=400, detail="Original prompt cannot be empty")
-        
-        # preserving conversation state
-        messages = []
-        
-        # Adding conversation history
-        if request.conversation_history:
-            for msg in request.conversation_history:
-                if msg["role"] == "user":
-                    messages.append(("human", msg["content"]))
-                elif msg["role"] == "assistant":
-                    messages.append(("ai", msg["content"]))
-        
-        # Adding current user input
-        messages.append(("human", request.original_prompt))
-        
-        # Generating unique thread ID for conversation persistence
-        thread_id = request.thread_id if hasattr(request, 'thread_id') and request.thread_id else "default_thread"
-        
-        # Invoking compiled refiner graph with conversation context and thread management
-        final_state = refiner_agent.refiner_graph.invoke(
-            {
-                "messages": messages,
-                "original_prompt": request.original_prompt,
-                "has_document": request.has_document or False
-            },
-            config={"configurable": {"thread_id": thread_id}}
+        turn = await start_refiner_turn(request)
+        final_state, checkpoint_id, analysis_id = await turn.run(lambda: run_refiner_turn(request))
+        return build_refiner_response(final_state, request, checkpoint_id, analysis_id)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@router.post("/refine_chat/stream")
+async def refine_prompt_stream(request: RefinerRequest):
+    """Streaming node progress and LLM tokens as server-sent events, ending with the full response"""
+    turn = await start_refiner_turn(request)
+    if not turn.leader:
+        # A duplicate of a running request only receives the shared final result
+        shared = shared_result_stream(turn, lambda result: build_refiner_response(result[0], request, result[1], result[2]))
+        return StreamingResponse(shared, media_type="text/event-stream", headers=SSE_HEADERS)
+
+    try:
+        graph, graph_input, config = await prepare_refiner_run(request)
+    except BaseException as e:
+        turn.fail(e)
+        await turn.close()
+        raise
+
+    async def event_stream():
+        final_state = {}
+        try:
+            async for mode, chunk in graph.astream(
+                graph_input,
+                config=config,
+                stream_mode=["updates", "messages", "values"]
+            ):
+                if mode == "messages":
+                    message, metadata = chunk
+                    # Tool call requests and tool results carry no user-facing tokens
+                    if isinstance(message, AIMessage) and message.content:
+                        yield format_sse("token", {
+                            "node": metadata.get("langgraph_node"),
+                            "content": message.content
+                        })
+                elif mode == "updates":
+                    for node, update in chunk.items():
+                        progress = {"node": node}
+                        for key in ("prompt_category", "framework_used"):
+                            if update and update.get(key):
+                                progress[key] = update[key]
+                        yield format_sse("node", progress)
+                else:
+                    final_state = chunk
+
+            checkpoint_id = await response_checkpoint_id(graph, config)
+            analysis_id = schedule_analysis(final_state, graph, config)
+            turn.succeed((final_state, checkpoint_id, analysis_id))
+            response = build_refiner_response(final_state, request, checkpoint_id, analysis_id)
+            yield format_sse("result", response.model_dump())
+
+            if analysis_id:
+                # The turn is complete, the next one on this thread need not wait for the narrative
+                await turn.close()
+                async for event in analysis_store.stream(analysis_store.get(analysis_id), "analysis", "analysis_done"):
+                    yield event
+        except HTTPException as e:
+            turn.fail(e)
+            yield format_sse("error", {"detail": e.detail})
+        except Exception as e:
+            turn.fail(e)
+            print(f"An error occurred while streaming: {e}")
+            yield format_sse("error", {"detail": "Internal Server Error"})
+        finally:
+            await turn.close()
+
+    # The background task frees the thread even if the client disconnects before streaming starts
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS, background=BackgroundTask(turn.close))
+
+@router.get("/analysis/{analysis_id}", response_model=RefinerAnalysisResponse)
+async def get_analysis(analysis_id: str, wait: bool = False, timeout: float = Query(30, gt=0, le=120)):
+    """Fetching a deferred analysis narrative, optionally waiting for it to finish"""
+    entry = await analysis_store.wait(analysis_id, timeout) if wait else analysis_store.get(analysis_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Analysis not found or expired")
+    return RefinerAnalysisResponse(analysis_id=analysis_id, status=entry.status, analysis=entry.text)
+
+@router.get("/analysis/{analysis_id}/stream")
+async def stream_analysis(analysis_id: str):
+    """Streaming a deferred analysis narrative as server-sent events while it is written"""
+    entry = analysis_store.get(analysis_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Analysis not found or expired")
+    return StreamingResponse(analysis_store.stream(entry), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/compare", response_model=RefinerCompareResponse)
+async def compare_frameworks(request: RefinerCompareRequest):
+    """Refining one prompt with several frameworks concurrently and returning the results side by side"""
+    if not request.original_prompt or not request.original_prompt.strip():
+        raise HTTPException(status_code=400, detail="Original prompt cannot be empty")
+
+    try:
+        category = request.category
+        if not category and not request.frameworks:
+            # Same classification the refiner graph uses, without storing anything
+            classified = await refiner_agent.classify_category({"messages": [HumanMessage(content=request.original_prompt)]})
+            category = classified.get("prompt_category")
+            if category not in framework_compare.CATEGORY_FRAMEWORKS:
+                raise HTTPException(status_code=400, detail="Prompt is a greeting or question, there is nothing to refine")
+
+        comparison = await framework_compare.compare_frameworks(
+            request.original_prompt.strip(),
+            category=category,
+            frameworks=request.frameworks,
+            rank=request.rank
         )
-        
-        # Validating for agent response
-        if not final_state.get("messages") or len(final_state["messages"]) == 0:
-            raise HTTPException(status_code=500, detail="No response generated from refiner agent")
-        
-        # Getting latest message from the agent
-        agent_output = final_state["messages"][-1].content
-        
-        # creating conversation history
-        serialized_history = []
-        for msg in final_state.get("messages", []):
-            role, content = refiner_agent.extract_message_content(msg)
-            serialized_history.append({"role": role, "content": content})
-        
-        # Getting refinement analysis
-        refined_prompt = final_state.get("refined_prompt")
-        prompt_category = final_state.get("prompt_category")
-        framework_used = final_state.get("framework_used")
-        
-        # Creating refinement analysis if we have the data
-        refinement_analysis = None
-        if refined_prompt and prompt_category and framework_used:
-            refinement_analysis = RefinementAnalysis(
-                category=prompt_category,
-                framework_used=framework_used,
-                reasoning=f"Applied {framework_used} framework for {prompt_category} improvement",
-                refined_prompt=refined_prompt
-            )
-        
-        return RefinerResponse(
-            agent_output=agent_output,
-            refined_prompt=refined_prompt,
-            prompt_category=prompt_category,
-            framework_used=framework_used,
-            refinement_analysis=refinement_analysis,
-            conversation_history=serialized_history
+        return RefinerCompareResponse(**comparison)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error comparing frameworks: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@router.post("/documents")
+async def upload_document(request: DocumentUploadRequest) -> Dict[str, Any]:
+    """Storing an uploaded document's text for RAG on one refiner thread"""
+    if not request.content or not request.content.strip():
+        raise HTTPException(status_code=400, detail="Document content cannot be empty")
+    if not request.thread_id:
+        raise HTTPException(status_code=400, detail="A thread ID is required to upload documents")
+
+    try:
+        result = await process_uploaded_file.ainvoke(
+            {"file_content": request.content, "filename": request.filename},
+            config={"configurable": {"thread_id": request.thread_id}}
         )
-        
+        if result.startswith("Error"):
+            raise HTTPException(status_code=500, detail=result)
+
+        return {
+            "thread_id": request.thread_id,
+            "documents": document_registry.list_documents(request.thread_id),
+            "detail": result
+        }
     except HTTPException:
         raise
     except Exception as e:
-        print(f"An error occurred: {e}")
+        print(f"Error uploading document: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@router.get("/threads/{thread_id}/messages", response_model=ThreadHistoryPage)
+async def get_refiner_thread_messages(thread_id: str, before: str = None, limit: int = Query(20, ge=1, le=100)):
+    """Paging back through a refiner thread's stored messages, newest page first"""
+    try:
+        page = await history_page(refiner_agent.refiner_graph, thread_id, before, limit, refiner_agent.extract_message_content)
+        return ThreadHistoryPage(**page)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error reading refiner thread: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 @router.post("/threads")
@@ -94,5 +311,5 @@ async def create_new_refiner_thread() -> Dict[str, str]:
     except Exception as e:
         print(f"Error creating refiner thread: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
-    
+
 
@@ -0,0 +1,11 @@
+import json
+
+# Stop proxies from buffering the stream so events reach the client immediately
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+def format_sse(event: str, data) -> str:
+    """Formatting one server-sent event frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
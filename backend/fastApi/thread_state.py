@@ -0,0 +1,120 @@
+from fastapi import HTTPException
+from langchain_core.messages import HumanMessage
+from typing import Callable, List, Optional, Tuple
+
+def history_messages(conversation_history: Optional[List[dict]]) -> List[Tuple[str, str]]:
+    """Converting client-side history entries into graph message tuples"""
+    messages = []
+    for msg in conversation_history or []:
+        if msg.get("role") == "user":
+            messages.append(("human", msg["content"]))
+        elif msg.get("role") == "assistant":
+            messages.append(("ai", msg["content"]))
+    return messages
+
+# Checkpoint metadata marking a reply rewritten after the turn, e.g. a deferred analysis narrative
+REWRITE_METADATA_KEY = "rewritten_reply"
+
+def checkpoint_id_of(config: Optional[dict]) -> Optional[str]:
+    return ((config or {}).get("configurable") or {}).get("checkpoint_id")
+
+def rewrite_config(config: dict) -> dict:
+    """Config for updating a finished turn's reply without invalidating the client's cursor"""
+    return {**config, "metadata": {**config.get("metadata", {}), REWRITE_METADATA_KEY: True}}
+
+async def is_current_cursor(graph, snapshot, checkpoint_id: str) -> bool:
+    """Checking the cursor is the newest checkpoint, allowing for replies rewritten since"""
+    while checkpoint_id != checkpoint_id_of(snapshot.config):
+        if not (snapshot.metadata or {}).get(REWRITE_METADATA_KEY) or not snapshot.parent_config:
+            return False
+        snapshot = await graph.aget_state(snapshot.parent_config)
+    return True
+
+async def latest_checkpoint_id(graph, config: dict) -> Optional[str]:
+    """Reading the id of the thread's newest checkpoint, the cursor clients send back next turn"""
+    snapshot = await graph.aget_state(config)
+    return checkpoint_id_of(snapshot.config)
+
+async def turn_messages(
+    graph,
+    config: dict,
+    new_input: str,
+    conversation_history: Optional[List[dict]] = None,
+    checkpoint_id: Optional[str] = None
+) -> List[Tuple[str, str]]:
+    """Building the messages for one turn, only the new input once the checkpointer holds the thread"""
+    history = history_messages(conversation_history)
+    # Some clients include the message being sent at the end of their history
+    if history and history[-1] == ("human", new_input):
+        history = history[:-1]
+
+    snapshot = await graph.aget_state(config)
+    stored = (snapshot.values or {}).get("messages", [])
+    if not stored:
+        # New or expired threads are seeded from whatever history the client still has
+        return history + [("human", new_input)]
+
+    # The cursor must point at the thread's newest checkpoint, otherwise another turn happened in between
+    if checkpoint_id and not await is_current_cursor(graph, snapshot, checkpoint_id):
+        raise HTTPException(
+            status_code=409,
+            detail="Conversation has changed since checkpoint_id, reload the thread and try again"
+        )
+
+    # History is only checked against the stored thread, never merged into it
+    last_client_input = next((content for role, content in reversed(history) if role == "human"), None)
+    last_stored_input = next((msg.content for msg in reversed(stored) if isinstance(msg, HumanMessage)), None)
+    if last_client_input is not None and last_client_input != last_stored_input:
+        raise HTTPException(
+            status_code=409,
+            detail="conversation_history does not match the stored thread"
+        )
+
+    return [("human", new_input)]
+
+def serialize_messages(messages: list, extract_message_content: Callable) -> List[dict]:
+    """Serialising messages with their ids, which clients use as history cursors"""
+    serialized = []
+    for msg in messages:
+        role, content = extract_message_content(msg)
+        serialized.append({"id": msg.id, "role": role, "content": content})
+    return serialized
+
+def messages_since(messages: list, cursor: Optional[str] = None) -> list:
+    """Returning the messages after the cursor, or this turn's messages when the cursor is unknown"""
+    ids = [msg.id for msg in messages]
+    if cursor and cursor in ids:
+        return messages[ids.index(cursor) + 1:]
+    # Without a usable cursor the client gets the latest user message and everything after it
+    last_human = max((index for index, msg in enumerate(messages) if isinstance(msg, HumanMessage)), default=0)
+    return messages[last_human:]
+
+async def history_page(
+    graph,
+    thread_id: str,
+    before: Optional[str],
+    limit: int,
+    extract_message_content: Callable,
+    summary_field: Optional[str] = None
+) -> dict:
+    """Reading one page of a thread's stored messages, newest first pages going back in time"""
+    snapshot = await graph.aget_state({"configurable": {"thread_id": thread_id}})
+    messages = (snapshot.values or {}).get("messages", [])
+    if not messages:
+        raise HTTPException(status_code=404, detail="Thread not found")
+
+    ids = [msg.id for msg in messages]
+    if before and before not in ids:
+        raise HTTPException(status_code=404, detail="Cursor not found in thread")
+    end = ids.index(before) if before else len(messages)
+    start = max(0, end - limit)
+
+    return {
+        "thread_id": thread_id,
+        "messages": serialize_messages(messages[start:end], extract_message_content),
+        "next_cursor": messages[start].id if start > 0 else None,
+        "has_more": start > 0,
+        "checkpoint_id": checkpoint_id_of(snapshot.config),
+        # Turns the graph summarised away are only available as this summary
+        "conversation_summary": snapshot.values.get(summary_field) if summary_field else None
+    }
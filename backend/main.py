@@ -1,6 +1,42 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastApi.routes import api_router
+from agents import coach_agent, refiner_agent, checkpoint_retention
+from agents.checkpointer import DB_URI, open_checkpointer
+from agents.checkpoint_cache import open_checkpoint_cache
+from agents.tools import vector_store
+
+# Loading the RAG embedding model at startup instead of on the first document query
+WARM_EMBEDDINGS = os.environ.get("WARM_EMBEDDINGS_ON_STARTUP", "true").lower() == "true"
+
+# Compiling both graphs against the shared async checkpointer for the app lifetime
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARM_EMBEDDINGS:
+        try:
+            await asyncio.to_thread(vector_store.warm_up)
+        except Exception as e:
+            print(f"Embedding warm-up failed, loading lazily instead: {e}")
+    # Hot threads are served from memory and written to Postgres in the background
+    async with open_checkpointer() as postgres_saver, open_checkpoint_cache(postgres_saver, DB_URI) as memory:
+        coach_agent.coach_graph = coach_agent.compile_graph(memory)
+        refiner_agent.refiner_graph = refiner_agent.compile_graph(memory)
+        # Pruning old checkpoints and idle threads in the background while the app runs
+        retention_task = None
+        if checkpoint_retention.RETENTION_ENABLED:
+            retention_task = asyncio.create_task(checkpoint_retention.retention_loop())
+        try:
+            yield
+        finally:
+            if retention_task:
+                retention_task.cancel()
+                try:
+                    await retention_task
+                except asyncio.CancelledError:
+                    pass
 
 #metadata
 app = FastAPI(
@@ -8,7 +44,8 @@ app = FastAPI(
     description="AI-powered prompt engineering coach and refiner with intelligent frameworks",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Including API routes
@@ -35,6 +72,7 @@ async def root():
         "version": "1.0.0",
         "services": {
             "coaching": "/coaching/",
-            "refiner": "/refiner/"
+            "refiner": "/refiner/",
+            "metrics": "/metrics/"
         }
     }
@@ -6,3 +6,5 @@ class CoachingRequest(BaseModel):
     user_input: str
     conversation_history: Optional[List[dict]] = None
     thread_id: Optional[str] = None  # For conversation thread management
+    checkpoint_id: Optional[str] = None  # cursor from the previous response, history is then not needed
+    history_cursor: Optional[str] = None  # id of the newest message the client already has
@@ -1,8 +1,11 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 # Model for API response to frontend
 class CoachingResponse(BaseModel):
     agent_output: str
-    refined_prompt: List[str] = None
-    conversation_history: List[dict]
\ No newline at end of file
+    refined_prompt: Optional[str] = None
+    conversation_history: List[dict]  # only messages after the request's history_cursor
+    history_cursor: Optional[str] = None  # id of the newest message, send back next turn
+    thread_id: Optional[str] = None  # generated when the request had none
+    checkpoint_id: Optional[str] = None  # send back with the next turn
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+# Model for uploading a document's extracted text to one refiner thread
+class DocumentUploadRequest(BaseModel):
+    thread_id: str
+    filename: str
+    content: str
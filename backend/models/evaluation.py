@@ -32,5 +32,14 @@ class EvaluationResult(BaseModel):
         default=None,
         description="List of specific suggestions for improvement. Optional field."
     )
+
+    corrected_text: Optional[str] = Field(
+        default=None,
+        description="""
+        The user's input with grammar, spelling, and punctuation errors fixed.
+        Make minimal changes and preserve the original meaning, style, and content.
+        Only filled in when the instruction asks for a correction.
+        """
+    )
     
         
\ No newline at end of file
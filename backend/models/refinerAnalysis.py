@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import Literal
+
+# Model for a refiner analysis narrative written after the refined prompt was returned
+class RefinerAnalysisResponse(BaseModel):
+    analysis_id: str
+    status: Literal["pending", "done", "error"]
+    analysis: str  # text written so far, complete once status is "done"
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+# Model for comparing several frameworks on one prompt
+class RefinerCompareRequest(BaseModel):
+    original_prompt: str
+    category: Optional[Literal["clarity", "precision", "creative"]] = None  # classified when neither this nor frameworks is given
+    frameworks: Optional[List[str]] = None  # subset to run, e.g. ["core", "race"], defaults to every framework of the category
+    rank: Optional[bool] = True  # order results by a local heuristic score
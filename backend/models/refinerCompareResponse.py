@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+# Model for one framework's output in a comparison
+class FrameworkResult(BaseModel):
+    framework: str
+    status: Literal["ok", "timeout", "error"]
+    refined_prompt: Optional[str] = None
+    duration_ms: float
+    score: Optional[float] = None  # local heuristic, only when ranking was requested
+
+# Model for the side by side framework comparison
+class RefinerCompareResponse(BaseModel):
+    original_prompt: str
+    category: Optional[str] = None
+    results: List[FrameworkResult]  # best first when ranked, otherwise in framework order
+    best_framework: Optional[str] = None
+    duration_ms: float  # wall clock for the whole comparison
@@ -1,9 +1,15 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Literal
 
 # Model for refiner api request from the frontend
 class RefinerRequest(BaseModel):
     original_prompt: str
     conversation_history: Optional[List[dict]] = None
     thread_id: Optional[str] = None  # for conversation thread management
+    checkpoint_id: Optional[str] = None  # cursor from the previous response, history is then not needed
+    history_cursor: Optional[str] = None  # id of the newest message the client already has
     has_document: Optional[bool] = False  # for rag processing
+    stateless: Optional[bool] = False  # one-shot refinement without checkpointing
+    # "deferred" returns the refined prompt before the analysis narrative is written,
+    # "template" skips the narrative LLM call, unset uses the server default
+    analysis_mode: Optional[Literal["inline", "deferred", "template"]] = None
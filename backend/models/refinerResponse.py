@@ -9,4 +9,7 @@ class RefinerResponse(BaseModel):
     prompt_category: Optional[str] = None
     framework_used: Optional[str] = None
     refinement_analysis: Optional[RefinementAnalysis] = None
-    conversation_history: List[dict]
+    conversation_history: List[dict]  # only messages after the request's history_cursor
+    history_cursor: Optional[str] = None  # id of the newest message, send back next turn
+    checkpoint_id: Optional[str] = None  # send back with the next turn, None for stateless runs
+    analysis_id: Optional[str] = None  # set when the analysis narrative is still being written
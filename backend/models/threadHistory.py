@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+# Model for one page of a stored conversation thread
+class ThreadHistoryPage(BaseModel):
+    thread_id: str
+    messages: List[dict]  # oldest first, each with id, role and content
+    next_cursor: Optional[str] = None  # pass as before= to load older messages
+    has_more: bool = False
+    checkpoint_id: Optional[str] = None
+    conversation_summary: Optional[str] = None  # coach only, covers turns no longer stored
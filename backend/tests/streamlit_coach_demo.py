@@ -3,7 +3,9 @@ import os
 from dotenv import load_dotenv
 import streamlit as st
 import uuid
+import asyncio
 from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
 
 # Adding path of files imported
 sys.path.append(os.path.abspath(".."))
@@ -11,7 +13,10 @@ sys.path.append(os.path.abspath(".."))
 # Load environment variables from .env file
 load_dotenv(dotenv_path="../.env")
 
-from agents.coach_agent import coach_graph, extract_message_content, CoachingState
+from agents.coach_agent import compile_graph, extract_message_content, CoachingState
+
+# In-memory checkpointer keeps the demo conversation across Streamlit reruns
+coach_graph = compile_graph(MemorySaver())
 
 def initialize_session_state():
     if "thread_id" not in st.session_state:
@@ -31,7 +36,7 @@ def start_conversation():
         config = {"configurable": {"thread_id": st.session_state.thread_id}}
         try:
             # Start the conversation by invoking the graph without user input
-            initial_state = coach_graph.invoke({}, config)
+            initial_state = asyncio.run(coach_graph.ainvoke({}, config))
             st.session_state.graph_state = initial_state
             
             # Add the welcome message to display
@@ -54,7 +59,7 @@ def process_user_input(user_input: str):
         graph_input = {"messages": [HumanMessage(content=user_input)]}
         
         # Invoke the graph with user input
-        updated_state = coach_graph.invoke(graph_input, config)
+        updated_state = asyncio.run(coach_graph.ainvoke(graph_input, config))
         
         # Update session state
         st.session_state.graph_state = updated_state
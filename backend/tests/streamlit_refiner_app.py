@@ -1,4 +1,5 @@
 import uuid
+import asyncio
 import streamlit as st
 import os
 import sys
@@ -8,11 +9,15 @@ import pdfplumber
 sys.path.append(os.path.abspath(".."))
 
 from dotenv import load_dotenv
-from agents.refiner_agent import refiner_graph, extract_message_content
+from agents.refiner_agent import compile_graph, extract_message_content
 from langchain_core.messages import HumanMessage, AIMessage
+from langgraph.checkpoint.memory import MemorySaver
 
 load_dotenv(dotenv_path="../.env")
 
+# In-memory checkpointer keeps the demo conversation across Streamlit reruns
+refiner_graph = compile_graph(MemorySaver())
+
 # Page Config
 st.set_page_config(page_title="Prompt Refiner Agent", layout="wide")
 
@@ -33,7 +38,7 @@ def process_refinement(user_input: str, thread_id: str):
     try:
         graph_input = {"messages": [HumanMessage(content=user_input)]}
         config = {"configurable": {"thread_id": thread_id}}
-        result = refiner_graph.invoke(graph_input, config)
+        result = asyncio.run(refiner_graph.ainvoke(graph_input, config))
         return result["messages"][-1]
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
@@ -48,7 +53,10 @@ def process_uploaded_document(uploaded_file):
             from agents.tools.refinement_tools import process_uploaded_file
             
             # Call the file processor tool to store in vector database
-            result = process_uploaded_file(text_content, uploaded_file.name)
+            result = asyncio.run(process_uploaded_file.ainvoke(
+                {"file_content": text_content, "filename": uploaded_file.name},
+                config={"configurable": {"thread_id": st.session_state.thread_id}}
+            ))
             
             # Also store in session state for reference
             if "uploaded_documents" not in st.session_state:
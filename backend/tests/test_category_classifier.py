@@ -0,0 +1,70 @@
+"""
+Simple pytest tests for the local category classifier.
+Uses a keyword embedding instead of the sentence-transformer.
+"""
+import os
+import sys
+import pytest
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.category_classifier import CategoryClassifier, load_examples, CATEGORIES
+
+KEYWORDS = [["explain", "email", "summarize"], ["steps", "sql", "schedule"], ["poem", "story", "brainstorm"]]
+
+def keyword_embed(texts):
+    vectors = []
+    for text in texts:
+        words = text.lower().split()
+        vectors.append([float(sum(words.count(word) for word in group)) + 0.01 for group in KEYWORDS])
+    return vectors
+
+
+class TestCategoryClassifier:
+    """Test class for category classifier functionality."""
+    
+    @pytest.fixture
+    def classifier(self):
+        classifier = CategoryClassifier(embed=keyword_embed, min_margin=0.1)
+        classifier.train({
+            "clarity": ["explain gravity", "write an email"],
+            "precision": ["list the steps", "write sql"],
+            "creative": ["write a poem", "tell a story"],
+        })
+        return classifier
+    
+    def test_seed_set_covers_every_category(self):
+        """Test that the bundled seed set has examples for each category."""
+        examples = load_examples()
+        
+        assert all(len(examples[category]) >= 10 for category in CATEGORIES)
+    
+    def test_confident_prediction(self, classifier):
+        """Test that a clear prompt is classified locally."""
+        category, margin = classifier.predict("write a poem about rain")
+        
+        assert category == "creative"
+        assert margin >= 0.1
+        assert classifier.counters["local"] == 1
+    
+    def test_ambiguous_prompt_falls_back(self, classifier):
+        """Test that a prompt with no signal is left to the LLM."""
+        category, _ = classifier.predict("hmm")
+        
+        assert category is None
+        assert classifier.counters["fallback"] == 1
+    
+    def test_save_and_load_centroids(self, classifier, tmp_path):
+        """Test that retrained centroids round-trip through the centroids file."""
+        path = str(tmp_path / "centroids.json")
+        classifier.save(path)
+        
+        restored = CategoryClassifier(embed=keyword_embed, min_margin=0.1)
+        
+        assert restored.load(path)
+        assert restored.predict("list the steps for sql")[0] == "precision"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
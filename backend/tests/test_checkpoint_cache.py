@@ -0,0 +1,156 @@
+"""
+Simple pytest tests for the write-behind checkpoint cache.
+"""
+import os
+import sys
+import asyncio
+import operator
+import pytest
+from typing import Annotated, List, TypedDict
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import StateGraph, START, END
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set test environment variables
+os.environ.setdefault("GROQ_API_KEY", "test_key")
+os.environ.setdefault("TAVILY_API_KEY", "test_key")
+
+from agents.checkpoint_cache import CachedCheckpointSaver, WORKER_ID
+
+
+class CountingSaver(InMemorySaver):
+    """In-memory saver counting how often the cache had to read through"""
+
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    async def aget_tuple(self, config):
+        self.reads += 1
+        return await super().aget_tuple(config)
+
+
+class SlowSaver(InMemorySaver):
+    """In-memory saver that takes a while to write, like Postgres under load"""
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        await asyncio.sleep(0.02)
+        return await super().aput(config, checkpoint, metadata, new_versions)
+
+
+class TurnState(TypedDict):
+    turns: Annotated[List[str], operator.add]
+
+
+def build_graph(saver):
+    builder = StateGraph(TurnState)
+    builder.add_node("reply", lambda state: {"turns": [f"reply {len(state['turns'])}"]})
+    builder.add_edge(START, "reply")
+    builder.add_edge("reply", END)
+    return builder.compile(checkpointer=saver)
+
+
+class TestCheckpointCache:
+    """Test class for the hot thread checkpoint cache."""
+
+    def test_turns_served_from_memory_until_flushed(self):
+        """Test that a hot thread's turns read from the cache and reach Postgres only on flush."""
+        async def run():
+            inner = CountingSaver()
+            cache = CachedCheckpointSaver(inner)
+            graph = build_graph(cache)
+            config = {"configurable": {"thread_id": "t1"}}
+
+            await graph.ainvoke({"turns": ["hi"]}, config)
+            await graph.ainvoke({"turns": ["again"]}, config)
+            assert inner.reads == 1
+            assert await inner.aget_tuple(config) is None
+            assert cache.pending_ops() > 0
+
+            cached = await graph.aget_state(config)
+            await cache.flush()
+            stored = await build_graph(inner).aget_state(config)
+            return cached, stored, cache.stats()
+
+        cached, stored, stats = asyncio.run(run())
+        assert cached.values["turns"] == ["hi", "reply 1", "again", "reply 3"]
+        assert stored.values == cached.values
+        assert stored.config["configurable"]["checkpoint_id"] == cached.config["configurable"]["checkpoint_id"]
+        assert stats["pending_ops"] == 0
+        assert stats["hits"] >= 2
+
+    def test_older_checkpoint_read_during_flush(self):
+        """Test that reading an older checkpoint while a flush is writing it waits for that flush."""
+        async def run():
+            cache = CachedCheckpointSaver(SlowSaver())
+            graph = build_graph(cache)
+            config = {"configurable": {"thread_id": "t5"}}
+            await graph.ainvoke({"turns": ["hi"]}, config)
+            older = (await graph.aget_state(config)).config
+            await graph.ainvoke({"turns": ["again"]}, config)
+
+            flushing = asyncio.create_task(cache.flush())
+            await asyncio.sleep(0)
+            saved = await cache.aget_tuple(older)
+            await flushing
+            return older, saved
+
+        older, saved = asyncio.run(run())
+        assert saved is not None
+        assert saved.config["configurable"]["checkpoint_id"] == older["configurable"]["checkpoint_id"]
+
+    def test_cached_checkpoint_not_mutated_by_caller(self):
+        """Test that callers get copies and cannot change the cached checkpoint."""
+        async def run():
+            cache = CachedCheckpointSaver(InMemorySaver())
+            graph = build_graph(cache)
+            config = {"configurable": {"thread_id": "t2"}}
+            await graph.ainvoke({"turns": ["hi"]}, config)
+
+            first = await cache.aget_tuple(config)
+            first.checkpoint["channel_versions"]["turns"] = "tampered"
+            return await cache.aget_tuple(config)
+
+        second = asyncio.run(run())
+        assert second.checkpoint["channel_versions"]["turns"] != "tampered"
+
+    def test_invalidation_from_other_worker(self):
+        """Test that a notification from another worker makes the next read go to Postgres."""
+        async def run():
+            inner = CountingSaver()
+            cache = CachedCheckpointSaver(inner)
+            config = {"configurable": {"thread_id": "t3"}}
+            await build_graph(cache).ainvoke({"turns": ["hi"]}, config)
+            await cache.flush()
+
+            cache.handle_notification(f"{WORKER_ID} t3")
+            await cache.aget_tuple(config)
+            reads_after_own_write = inner.reads
+
+            cache.handle_notification("another-worker t3")
+            await cache.aget_tuple(config)
+            return reads_after_own_write, inner.reads
+
+        own, other = asyncio.run(run())
+        assert other == own + 1
+
+    def test_reads_bypass_cache_without_listener(self):
+        """Test that cached reads are skipped while cross-worker invalidation is not connected."""
+        async def run():
+            inner = CountingSaver()
+            cache = CachedCheckpointSaver(inner, require_listener=True)
+            config = {"configurable": {"thread_id": "t4"}}
+            await build_graph(cache).ainvoke({"turns": ["hi"]}, config)
+            before = inner.reads
+            saved = await cache.aget_tuple(config)
+            return before, inner.reads, saved
+
+        before, after, saved = asyncio.run(run())
+        assert after == before + 1
+        assert saved.checkpoint["channel_values"]["turns"] == ["hi", "reply 1"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,145 @@
+"""
+Simple pytest tests for checkpoint retention.
+"""
+import os
+import sys
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import patch, MagicMock
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set test environment variables
+os.environ.setdefault("GROQ_API_KEY", "test_key")
+os.environ.setdefault("TAVILY_API_KEY", "test_key")
+
+from agents import checkpoint_retention
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    """Answers each retention query with canned rows and records what ran"""
+
+    def __init__(self, expired, trimmed, writes=None, blobs=None, locked=False):
+        self.results = {
+            checkpoint_retention.LOCK_SQL: [{"acquired": not locked}],
+            checkpoint_retention.EXPIRE_THREADS_SQL: expired,
+            checkpoint_retention.TRIM_CHECKPOINTS_SQL: trimmed,
+            checkpoint_retention.ORPHANED_WRITES_SQL: [writes or {"rows": 0, "bytes": 0}],
+            checkpoint_retention.ORPHANED_BLOBS_SQL: [blobs or {"rows": 0, "bytes": 0}],
+        }
+        self.executed = []
+        self.rolled_back = None
+
+    @asynccontextmanager
+    async def transaction(self, force_rollback=False):
+        self.rolled_back = force_rollback
+        yield
+
+    async def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+        return FakeCursor(self.results[sql])
+
+
+class FakePool:
+    """Hands out the one fake connection"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def connection(self):
+        yield self.conn
+
+
+class TestCheckpointRetention:
+    """Test class for checkpoint pruning."""
+
+    def test_prune_reports_rows_and_bytes(self):
+        """Test that deleted rows and bytes are summed per table and orphans are scoped to touched threads."""
+        conn = FakeConnection(
+            expired=[{"thread_id": "old", "rows": 4, "bytes": 4000}],
+            trimmed=[{"thread_id": "busy", "rows": 6, "bytes": 9000}],
+            writes={"rows": 12, "bytes": 3000},
+            blobs={"rows": 5, "bytes": 20000},
+        )
+        with patch.object(checkpoint_retention, "_forget_documents", return_value=1) as forget:
+            report = asyncio.run(checkpoint_retention.prune(conn, keep_last=3, ttl_hours=24))
+
+        assert conn.rolled_back is False
+        assert report["expired_threads"] == 1
+        assert report["trimmed_threads"] == 1
+        assert report["checkpoints"] == {"rows": 10, "bytes": 13000}
+        assert report["checkpoint_writes"] == {"rows": 12, "bytes": 3000}
+        assert report["checkpoint_blobs"] == {"rows": 5, "bytes": 20000}
+        assert report["bytes_reclaimed"] == 36000
+        assert report["documents_removed"] == 1
+        forget.assert_called_once_with(["old"])
+
+        params = dict(conn.executed)
+        assert params[checkpoint_retention.EXPIRE_THREADS_SQL] == {"ttl_seconds": 24 * 3600}
+        assert params[checkpoint_retention.TRIM_CHECKPOINTS_SQL] == {"keep_last": 3}
+        assert params[checkpoint_retention.ORPHANED_BLOBS_SQL] == {"thread_ids": ["busy", "old"]}
+
+    def test_dry_run_rolls_back_and_keeps_documents(self):
+        """Test that a dry run rolls the transaction back and leaves uploaded documents alone."""
+        conn = FakeConnection(expired=[{"thread_id": "old", "rows": 2, "bytes": 100}], trimmed=[])
+        with patch.object(checkpoint_retention, "_forget_documents") as forget:
+            report = asyncio.run(checkpoint_retention.prune(conn, dry_run=True))
+
+        assert conn.rolled_back is True
+        assert report["dry_run"] is True
+        assert report["documents_removed"] == 0
+        forget.assert_not_called()
+
+    def test_nothing_to_prune_skips_orphan_cleanup(self):
+        """Test that orphaned writes and blobs are not scanned when no checkpoint was deleted."""
+        conn = FakeConnection(expired=[], trimmed=[])
+        report = asyncio.run(checkpoint_retention.prune(conn))
+
+        assert [sql for sql, _ in conn.executed] == [
+            checkpoint_retention.LOCK_SQL,
+            checkpoint_retention.EXPIRE_THREADS_SQL,
+            checkpoint_retention.TRIM_CHECKPOINTS_SQL,
+        ]
+        assert report["bytes_reclaimed"] == 0
+
+    def test_prune_skipped_while_another_worker_holds_lock(self):
+        """Test that a worker which cannot take the advisory lock deletes nothing and keeps the last report."""
+        conn = FakeConnection(expired=[{"thread_id": "old", "rows": 2, "bytes": 100}], trimmed=[], locked=True)
+        with patch.object(checkpoint_retention.checkpointer, "pool", FakePool(conn)), \
+             patch.object(checkpoint_retention, "last_report", {"bytes_reclaimed": 500}), \
+             patch.object(checkpoint_retention, "_forget_documents") as forget:
+            report = asyncio.run(checkpoint_retention.run_retention())
+            last = checkpoint_retention.last_report
+
+        assert report["skipped"] is True
+        assert report["bytes_reclaimed"] == 0
+        assert conn.executed == [(checkpoint_retention.LOCK_SQL, {"key": checkpoint_retention.RETENTION_LOCK_KEY})]
+        assert last == {"bytes_reclaimed": 500}
+        forget.assert_not_called()
+
+    def test_expired_thread_documents_removed(self):
+        """Test that expired threads lose their registry entries and stored chunks."""
+        store = MagicMock()
+        with patch.object(checkpoint_retention.document_registry, "has_documents", side_effect=lambda t: t == "docs"), \
+             patch.object(checkpoint_retention.document_registry, "remove_thread", return_value=2) as remove, \
+             patch.object(checkpoint_retention.vector_store, "get_vector_store", return_value=store):
+            removed = checkpoint_retention._forget_documents(["docs", "plain"])
+
+        assert removed == 2
+        store.delete.assert_called_once_with(where={"thread_id": "docs"})
+        remove.assert_called_once_with("docs")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,55 @@
+"""
+Simple pytest tests for the compressed checkpoint serializer.
+"""
+import os
+import sys
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set test environment variables
+os.environ.setdefault("GROQ_API_KEY", "test_key")
+os.environ.setdefault("TAVILY_API_KEY", "test_key")
+
+from agents.checkpoint_serde import CompressedSerializer, _conversation
+
+
+class TestCheckpointSerde:
+    """Test class for checkpoint compression."""
+
+    def test_messages_round_trip_compressed(self):
+        """Test that a message list is stored compressed and loads back unchanged."""
+        serde = CompressedSerializer(codec="zlib")
+        messages = _conversation(10)[-1]
+        typ, blob = serde.dumps_typed(messages)
+
+        assert typ.endswith("+zlib")
+        assert len(blob) < len(JsonPlusSerializer().dumps_typed(messages)[1])
+        loaded = serde.loads_typed((typ, blob))
+        assert [type(msg) for msg in loaded] == [HumanMessage, AIMessage] * 10
+        assert [msg.content for msg in loaded] == [msg.content for msg in messages]
+
+    def test_uncompressed_rows_still_load(self):
+        """Test that checkpoints written by the plain serializer load unchanged."""
+        legacy = JsonPlusSerializer().dumps_typed({"task": "Plan a trip", "step": 2})
+        assert CompressedSerializer(codec="zlib").loads_typed(legacy) == {"task": "Plan a trip", "step": 2}
+
+    def test_small_values_stored_as_is(self):
+        """Test that values below the size threshold skip compression."""
+        serde = CompressedSerializer(codec="zlib", min_bytes=256)
+        assert "+" not in serde.dumps_typed("clarity")[0]
+        assert serde.dumps_typed(None) == JsonPlusSerializer().dumps_typed(None)
+        assert serde.stats()["compressed"] == 0
+
+    def test_disabled_compression(self):
+        """Test that compression can be switched off entirely."""
+        serde = CompressedSerializer(codec="none")
+        messages = _conversation(5)[-1]
+        assert serde.dumps_typed(messages) == JsonPlusSerializer().dumps_typed(messages)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
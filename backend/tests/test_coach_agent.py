@@ -3,8 +3,9 @@ Simple pytest tests for the coach agent.
 Tests basic functionality using actual environment variables.
 """
 import os
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -24,6 +25,8 @@ from agents.coach_agent import (
     process_context_input,
     process_reference_input,
     process_final_prompt,
+    manage_memory,
+    agent_node,
     extract_message_content
 )
 
@@ -92,7 +95,7 @@ class TestCoachAgent:
             "final_prompt_corrected": ""
         }
         
-        result = process_task_input(state)
+        result = asyncio.run(process_task_input(state))
         
         # For short greetings, it should return a greeting response
         assert "messages" in result
@@ -115,7 +118,7 @@ class TestCoachAgent:
             "final_prompt_corrected": ""
         }
         
-        result = process_task_input(state)
+        result = asyncio.run(process_task_input(state))
         
         assert "task_corrected" in result
         assert result["current_step"] == "evaluating_task"
@@ -141,7 +144,7 @@ class TestCoachAgent:
         # Mock the LLM response for grammar correction
         mock_response = MagicMock()
         mock_response.content = "I want to write a prompt for generating marketing copy."
-        mock_llm.invoke.return_value = mock_response
+        mock_llm.ainvoke = AsyncMock(return_value=mock_response)
         
         state = {
             "messages": [HumanMessage(content="i want to write a prompt for generating marketing copy")],
@@ -156,12 +159,12 @@ class TestCoachAgent:
             "final_prompt_corrected": ""
         }
         
-        result = process_task_input(state)
+        result = asyncio.run(process_task_input(state))
         
         # Verify that grammar correction was attempted
         assert "task_corrected" in result
         assert result["current_step"] == "evaluating_task"
-        mock_llm.invoke.assert_called()
+        mock_llm.ainvoke.assert_called()
     
     def test_coaching_state_structure(self):
         """Test that CoachingState has the expected structure."""
@@ -188,6 +191,109 @@ class TestCoachAgent:
         assert state["context_corrected"] == "corrected context"
         assert state["references_corrected"] == ["corrected ref1", "corrected ref2"]
         assert state["final_prompt_corrected"] == "corrected prompt"
+    
+    @patch('agents.coach_agent.llm')
+    @patch('agents.coach_agent.evaluation_llm')
+    def test_combined_mode_corrects_in_evaluation_call(self, mock_evaluation_llm, mock_llm):
+        """Test that combined mode takes the correction from the single evaluation call."""
+        from langchain_core.messages import HumanMessage
+        from models.evaluation import EvaluationResult
+        
+        mock_evaluation_llm.ainvoke = AsyncMock(return_value=EvaluationResult(
+            is_correct=True,
+            feedback="Good context",
+            corrected_text="I am a student with 20 hours a week."
+        ))
+        mock_llm.ainvoke = AsyncMock()
+        
+        state = {
+            "messages": [HumanMessage(content="im a student with 20 hour a week")],
+            "task_corrected": "Plan my study week"
+        }
+        
+        with patch('agents.coach_agent.GRAMMAR_MODE', "combined"):
+            result = asyncio.run(process_context_input(state))
+        
+        assert result["context_corrected"] == "I am a student with 20 hours a week."
+        assert result["current_step"] == "awaiting_reference_input"
+        assert mock_evaluation_llm.ainvoke.call_count == 1
+        mock_llm.ainvoke.assert_not_called()
+    
+    @patch('agents.coach_agent.llm')
+    @patch('agents.coach_agent.evaluation_llm')
+    def test_separate_mode_corrects_before_evaluating(self, mock_evaluation_llm, mock_llm):
+        """Test that separate mode keeps the dedicated grammar correction call."""
+        from langchain_core.messages import HumanMessage
+        from models.evaluation import EvaluationResult
+        
+        mock_response = MagicMock()
+        mock_response.content = "I am a student."
+        mock_llm.ainvoke = AsyncMock(return_value=mock_response)
+        mock_evaluation_llm.ainvoke = AsyncMock(return_value=EvaluationResult(is_correct=True, feedback="Good"))
+        
+        state = {
+            "messages": [HumanMessage(content="im a student")],
+            "task_corrected": "Plan my study week"
+        }
+        
+        with patch('agents.coach_agent.GRAMMAR_MODE', "separate"):
+            result = asyncio.run(process_context_input(state))
+        
+        assert result["context_corrected"] == "I am a student."
+        mock_llm.ainvoke.assert_called_once()
+        assert "I am a student." in mock_evaluation_llm.ainvoke.call_args[0][0]
+
+
+    @patch('agents.coach_agent.llm')
+    def test_manage_memory_within_budget(self, mock_llm):
+        """Test that short histories are left untouched."""
+        from langchain_core.messages import HumanMessage
+        
+        mock_llm.ainvoke = AsyncMock()
+        state = {"messages": [HumanMessage(content="Write a blog post", id="1")]}
+        
+        assert asyncio.run(manage_memory(state)) == {}
+        mock_llm.ainvoke.assert_not_called()
+    
+    @patch('agents.coach_agent.llm')
+    def test_manage_memory_summarises_older_turns(self, mock_llm):
+        """Test that turns beyond the window are summarised and removed."""
+        from langchain_core.messages import HumanMessage, AIMessage, RemoveMessage
+        
+        mock_response = MagicMock()
+        mock_response.content = "User wants a study plan for three courses."
+        mock_llm.ainvoke = AsyncMock(return_value=mock_response)
+        
+        messages = []
+        for turn in range(6):
+            messages.append(HumanMessage(content=f"user turn {turn} " + "word " * 400, id=f"h{turn}"))
+            messages.append(AIMessage(content=f"coach turn {turn} " + "word " * 400, id=f"a{turn}"))
+        messages.append(HumanMessage(content="Here is my final prompt", id="last"))
+        
+        with patch('agents.coach_agent.MEMORY_MAX_TOKENS', 1000), patch('agents.coach_agent.MEMORY_WINDOW_TOKENS', 500):
+            result = asyncio.run(manage_memory({"messages": messages, "conversation_summary": ""}))
+        
+        removed_ids = {message.id for message in result["messages"]}
+        assert result["conversation_summary"] == "User wants a study plan for three courses."
+        assert all(isinstance(message, RemoveMessage) for message in result["messages"])
+        assert "last" not in removed_ids
+        assert "h0" in removed_ids
+    
+    @patch('agents.coach_agent.llm')
+    def test_agent_node_does_not_mutate_history(self, mock_llm):
+        """Test that the refine instruction is not appended to the state messages."""
+        from langchain_core.messages import HumanMessage, AIMessage
+        
+        mock_llm.ainvoke = AsyncMock(return_value=AIMessage(content="Polished prompt"))
+        messages = [HumanMessage(content="My final prompt", id="1")]
+        state = {"messages": messages, "final_prompt": "My final prompt", "conversation_summary": "Earlier turns"}
+        
+        result = asyncio.run(agent_node(state))
+        
+        assert len(messages) == 1
+        assert result["messages"][0].content == "Polished prompt"
+        sent = mock_llm.ainvoke.call_args[0][0]
+        assert "Earlier turns" in sent[0].content
 
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+"""
+Simple pytest tests for per-thread turn ordering and single-flight requests.
+"""
+import os
+import sys
+import asyncio
+import pytest
+from fastapi import HTTPException
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set test environment variables
+os.environ.setdefault("GROQ_API_KEY", "test_key")
+os.environ.setdefault("TAVILY_API_KEY", "test_key")
+
+from fastApi.concurrency import SingleFlight, ThreadQueue, request_key
+
+
+class TestConcurrency:
+    """Test class for thread queues and single-flight coalescing."""
+
+    def test_turns_on_one_thread_run_in_order(self):
+        """Test that different turns on the same thread never overlap and keep arrival order."""
+        async def run():
+            flights = SingleFlight(ThreadQueue())
+            events = []
+
+            async def turn(name):
+                handle = await flights.start(request_key("coach", "t1", name), "coach:t1")
+                async def work():
+                    events.append(f"start {name}")
+                    await asyncio.sleep(0.01)
+                    events.append(f"end {name}")
+                    return name
+                return await handle.run(work)
+
+            results = await asyncio.gather(turn("first"), turn("second"), turn("third"))
+            return results, events, flights.thread_queue.stats()
+
+        results, events, stats = asyncio.run(run())
+        assert results == ["first", "second", "third"]
+        assert events == ["start first", "end first", "start second", "end second", "start third", "end third"]
+        assert stats["queued"] == 2
+        assert stats["active_threads"] == 0
+
+    def test_identical_requests_share_one_run(self):
+        """Test that a duplicate in-flight request gets the leader's result without running again."""
+        async def run():
+            flights = SingleFlight(ThreadQueue())
+            runs = []
+
+            async def request():
+                handle = await flights.start(request_key("coach", "t1", "Plan a trip"), "coach:t1")
+                async def work():
+                    runs.append(1)
+                    await asyncio.sleep(0.01)
+                    return {"messages": ["done"]}
+                return await handle.run(work)
+
+            results = await asyncio.gather(request(), request(), request())
+            return results, runs, flights.stats()
+
+        results, runs, stats = asyncio.run(run())
+        assert len(runs) == 1
+        assert results == [{"messages": ["done"]}] * 3
+        assert stats == {"in_flight": 0, "runs": 1, "coalesced": 2}
+
+    def test_leader_error_reaches_followers(self):
+        """Test that followers receive the leader's error instead of hanging."""
+        async def run():
+            flights = SingleFlight(ThreadQueue())
+
+            async def request():
+                handle = await flights.start(request_key("refiner", "t1", "x"), "refiner:t1")
+                async def work():
+                    await asyncio.sleep(0.01)
+                    raise HTTPException(status_code=409, detail="conversation_history does not match the stored thread")
+                return await handle.run(work)
+
+            return await asyncio.gather(request(), request(), return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert all(isinstance(result, HTTPException) and result.status_code == 409 for result in results)
+
+    def test_queue_timeout(self):
+        """Test that a turn stuck behind a long one gives up with a conflict."""
+        async def run():
+            queue = ThreadQueue(timeout=0.01)
+            release = await queue.acquire("coach:t1")
+            with pytest.raises(HTTPException) as error:
+                await queue.acquire("coach:t1")
+            release()
+            release()
+            return error.value, queue.stats()
+
+        error, stats = asyncio.run(run())
+        assert error.status_code == 409
+        assert stats["timeouts"] == 1
+        assert stats["active_threads"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
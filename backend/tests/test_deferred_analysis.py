@@ -0,0 +1,172 @@
+"""
+Simple pytest tests for analysis narratives written after the refined prompt is returned.
+"""
+import os
+import sys
+import asyncio
+import pytest
+from types import SimpleNamespace
+from typing import Annotated, TypedDict
+from unittest.mock import patch
+from fastapi import HTTPException
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set test environment variables
+os.environ.setdefault("GROQ_API_KEY", "test_key")
+os.environ.setdefault("TAVILY_API_KEY", "test_key")
+
+from fastApi.concurrency import thread_queue
+from fastApi.deferred_analysis import AnalysisStore
+from fastApi.thread_state import latest_checkpoint_id, turn_messages
+
+
+def fake_astream(*chunks, delay=0.01, error=None):
+    """Stands in for llm.astream, yielding the chunks with a short delay"""
+    async def astream(prompt):
+        for chunk in chunks:
+            await asyncio.sleep(delay)
+            yield SimpleNamespace(content=chunk)
+        if error:
+            raise error
+    return astream
+
+
+class TestDeferredAnalysis:
+    """Test class for the deferred analysis store."""
+
+    def test_analysis_written_in_background(self):
+        """Test that scheduling returns at once and the narrative can be waited for by id."""
+        async def run():
+            store = AnalysisStore()
+            analysis_id = store.schedule("Plan a trip", "race_refiner", "Role: travel agent")
+            pending = store.get(analysis_id).status
+            entry = await store.wait(analysis_id, timeout=1)
+            return pending, entry, store.stats()
+
+        with patch("agents.refiner_agent.llm", SimpleNamespace(astream=fake_astream("Great ", "prompt!"))):
+            pending, entry, stats = asyncio.run(run())
+
+        assert pending == "pending"
+        assert entry.status == "done"
+        assert entry.text == "Great prompt!"
+        assert stats["completed"] == 1
+        assert stats["pending"] == 0
+
+    def test_stream_sends_text_then_status(self):
+        """Test that streaming sends the written text and ends with the final status."""
+        async def run():
+            store = AnalysisStore()
+            analysis_id = store.schedule("Plan a trip", "race_refiner", "Role: travel agent")
+            return [event async for event in store.stream(store.get(analysis_id))]
+
+        with patch("agents.refiner_agent.llm", SimpleNamespace(astream=fake_astream("Great ", "prompt", "!"))):
+            events = asyncio.run(run())
+
+        tokens = "".join(event.split('"content": "')[1].split('"}')[0] for event in events if event.startswith("event: token"))
+        assert tokens == "Great prompt!"
+        assert events[-1] == 'event: done\ndata: {"status": "done"}\n\n'
+
+    def test_failed_analysis_reported(self):
+        """Test that an LLM error marks the analysis as failed instead of leaving it pending."""
+        async def run():
+            store = AnalysisStore()
+            analysis_id = store.schedule("Plan a trip", "race_refiner", "Role: travel agent")
+            return await store.wait(analysis_id, timeout=1), store.stats()
+
+        with patch("agents.refiner_agent.llm", SimpleNamespace(astream=fake_astream("Great ", error=RuntimeError("rate limited")))):
+            entry, stats = asyncio.run(run())
+
+        assert entry.status == "error"
+        assert stats["failed"] == 1
+
+    def test_narrative_replaces_template_in_thread(self):
+        """Test that the finished narrative replaces the templated reply in the stored thread, after the running turn."""
+        class State(TypedDict):
+            messages: Annotated[list, add_messages]
+
+        builder = StateGraph(State)
+        builder.add_node("generate_analysis", lambda state: {"messages": [AIMessage(content="Here is your refined prompt.")]})
+        builder.add_edge(START, "generate_analysis")
+        builder.add_edge("generate_analysis", END)
+        graph = builder.compile(checkpointer=InMemorySaver())
+        config = {"configurable": {"thread_id": "deferred-thread"}}
+
+        async def run():
+            final_state = await graph.ainvoke({"messages": [("human", "Plan a trip")]}, config=config)
+            template = final_state["messages"][-1]
+            store = AnalysisStore()
+            # The turn still holds the thread until its response is sent
+            release = await thread_queue.acquire("refiner:deferred-thread")
+            analysis_id = store.schedule("Plan a trip", "race_refiner", "Role: travel agent", graph=graph, config=config, message_id=template.id)
+            await asyncio.sleep(0.1)
+            during_turn = (await graph.aget_state(config)).values["messages"][-1].content
+            release()
+            await store.wait(analysis_id, timeout=1)
+            messages = (await graph.aget_state(config)).values["messages"]
+            return template, during_turn, messages, store.stats()
+
+        with patch("agents.refiner_agent.llm", SimpleNamespace(astream=fake_astream("Great ", "prompt!"))):
+            template, during_turn, messages, stats = asyncio.run(run())
+
+        assert during_turn == "Here is your refined prompt."
+        assert len(messages) == 2
+        assert messages[-1].id == template.id
+        assert messages[-1].content == "Great prompt!"
+        assert stats["saved"] == 1
+
+    def test_turn_after_analysis_accepts_old_cursor(self):
+        """Test that the checkpoint_id returned with the refined prompt still works once the narrative is saved."""
+        class State(TypedDict):
+            messages: Annotated[list, add_messages]
+
+        builder = StateGraph(State)
+        builder.add_node("generate_analysis", lambda state: {"messages": [AIMessage(content="Here is your refined prompt.")]})
+        builder.add_edge(START, "generate_analysis")
+        builder.add_edge("generate_analysis", END)
+        graph = builder.compile(checkpointer=InMemorySaver())
+        config = {"configurable": {"thread_id": "cursor-thread"}}
+
+        async def run():
+            final_state = await graph.ainvoke({"messages": [("human", "Plan a trip")]}, config=config)
+            cursor = await latest_checkpoint_id(graph, config)
+            store = AnalysisStore()
+            analysis_id = store.schedule("Plan a trip", "race_refiner", "Role: travel agent", graph=graph, config=config, message_id=final_state["messages"][-1].id)
+            await store.wait(analysis_id, timeout=1)
+            newest = await latest_checkpoint_id(graph, config)
+            messages = await turn_messages(graph, config, "Make it shorter", None, cursor)
+            await graph.ainvoke({"messages": messages}, config=config)
+            # A cursor from before a later turn is still stale
+            with pytest.raises(HTTPException) as stale:
+                await turn_messages(graph, config, "Again", None, cursor)
+            return cursor, newest, messages, stale.value
+
+        with patch("agents.refiner_agent.llm", SimpleNamespace(astream=fake_astream("Great prompt!"))):
+            cursor, newest, messages, stale = asyncio.run(run())
+
+        assert newest != cursor
+        assert messages == [("human", "Make it shorter")]
+        assert stale.status_code == 409
+
+    def test_finished_analysis_expires(self):
+        """Test that finished narratives are dropped after the TTL and unknown ids return None."""
+        async def run():
+            store = AnalysisStore(ttl=0)
+            analysis_id = store.schedule("Plan a trip", "race_refiner", "Role: travel agent")
+            await store.wait(analysis_id, timeout=1)
+            return store.get(analysis_id), store.stats()
+
+        with patch("agents.refiner_agent.llm", SimpleNamespace(astream=fake_astream("Great prompt!"))):
+            entry, stats = asyncio.run(run())
+
+        assert entry is None
+        assert stats["expired"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,66 @@
+"""
+Simple pytest tests for the per-thread document registry.
+"""
+import os
+import sys
+import asyncio
+import pytest
+from unittest.mock import patch
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.tools import document_registry
+
+
+class TestDocumentRegistry:
+    """Test class for document registry functionality."""
+    
+    @pytest.fixture(autouse=True)
+    def setup_method(self, tmp_path, monkeypatch):
+        """Point the registry at a fresh database for each test."""
+        monkeypatch.setattr(document_registry, "REGISTRY_PATH", str(tmp_path / "registry.sqlite3"))
+        monkeypatch.setattr(document_registry, "_initialized", False)
+        monkeypatch.setattr(document_registry, "_threads_with_documents", set())
+        monkeypatch.setattr(document_registry, "_threads_without_documents", {})
+    
+    def test_thread_without_uploads_has_no_documents(self):
+        """Test that unknown and missing thread IDs report no documents."""
+        assert document_registry.has_documents("thread-a") is False
+        assert document_registry.has_documents(None) is False
+    
+    def test_register_document_is_scoped_to_thread(self):
+        """Test that an upload only marks its own thread as having documents."""
+        document_registry.register_document("thread-a", "notes.pdf")
+        
+        assert document_registry.has_documents("thread-a") is True
+        assert document_registry.has_documents("thread-b") is False
+        assert document_registry.list_documents("thread-a") == ["notes.pdf"]
+    
+    def test_registry_is_shared_through_database(self):
+        """Test that a fresh process cache still finds uploads recorded on disk."""
+        document_registry.register_document("thread-a", "notes.pdf")
+        document_registry._threads_with_documents.clear()
+        
+        assert document_registry.has_documents("thread-a") is True
+    
+    def test_missing_documents_answer_is_cached(self):
+        """Test that repeated lookups for a thread without uploads skip the database until an upload."""
+        assert document_registry.has_documents("thread-a") is False
+        with patch.object(document_registry, "_connect", side_effect=AssertionError("database opened")):
+            assert document_registry.has_documents("thread-a") is False
+            assert asyncio.run(document_registry.ahas_documents("thread-a")) is False
+
+        document_registry.register_document("thread-a", "notes.pdf")
+        assert document_registry.has_documents("thread-a") is True
+
+    def test_remove_thread(self):
+        """Test that removing a thread forgets its documents."""
+        document_registry.register_document("thread-a", "notes.pdf")
+        
+        assert document_registry.remove_thread("thread-a") == 1
+        assert document_registry.has_documents("thread-a") is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
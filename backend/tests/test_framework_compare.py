@@ -0,0 +1,100 @@
+"""
+Simple pytest tests for concurrent framework comparison.
+"""
+import os
+import sys
+import time
+import asyncio
+import pytest
+from unittest.mock import patch
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set test environment variables
+os.environ.setdefault("GROQ_API_KEY", "test_key")
+os.environ.setdefault("TAVILY_API_KEY", "test_key")
+
+from agents import framework_compare
+from agents.llm_scheduler import LLMBusy
+
+
+class FakeTool:
+    """Stands in for a framework tool with a fixed delay and output"""
+
+    def __init__(self, delay, output):
+        self.delay = delay
+        self.output = output
+
+    async def ainvoke(self, args):
+        await asyncio.sleep(self.delay)
+        return self.output.format(**args)
+
+
+STRUCTURED = "Role: tutor\nContext: {prompt}\n- Objective: a weekly plan\n- Format: table\n" + "Keep each session short and focused. " * 4
+
+
+class TestFrameworkCompare:
+    """Test class for the multi-framework comparison."""
+
+    def test_frameworks_run_concurrently(self):
+        """Test that the comparison takes about as long as the slowest framework."""
+        tools = {name: FakeTool(0.1, STRUCTURED) for name in framework_compare.CATEGORY_FRAMEWORKS["clarity"]}
+        with patch.dict(framework_compare.FRAMEWORK_TOOLS, tools):
+            started = time.perf_counter()
+            comparison = asyncio.run(framework_compare.compare_frameworks("Make a study plan for biology exams", category="clarity"))
+            elapsed = time.perf_counter() - started
+
+        assert len(comparison["results"]) == 4
+        assert all(result["status"] == "ok" for result in comparison["results"])
+        assert elapsed < 0.3
+
+    def test_concurrency_cap(self):
+        """Test that no more frameworks than the cap run at the same time."""
+        tools = {name: FakeTool(0.05, STRUCTURED) for name in framework_compare.CATEGORY_FRAMEWORKS["clarity"]}
+        with patch.dict(framework_compare.FRAMEWORK_TOOLS, tools):
+            started = time.perf_counter()
+            asyncio.run(framework_compare.compare_frameworks("Plan a trip", category="clarity", concurrency=1))
+            elapsed = time.perf_counter() - started
+
+        assert elapsed >= 0.2
+
+    def test_timeout_and_ranking(self):
+        """Test that slow frameworks time out and the rest are ranked best first."""
+        tools = {
+            "core_refiner": FakeTool(0.01, STRUCTURED),
+            "race_refiner": FakeTool(0.01, "Rewrite: [topic]"),
+            "car_refiner": FakeTool(1.0, STRUCTURED),
+        }
+        with patch.dict(framework_compare.FRAMEWORK_TOOLS, tools):
+            comparison = asyncio.run(framework_compare.compare_frameworks(
+                "Make a study plan for biology exams", frameworks=["C.A.R.", "race", "core_refiner"], timeout=0.2
+            ))
+
+        statuses = {result["framework"]: result["status"] for result in comparison["results"]}
+        assert statuses == {"core_refiner": "ok", "race_refiner": "ok", "car_refiner": "timeout"}
+        assert comparison["best_framework"] == "core_refiner"
+        assert [result["framework"] for result in comparison["results"]][-1] == "car_refiner"
+
+    def test_scheduler_overload_fails_comparison(self):
+        """Test that an overloaded LLM scheduler surfaces as a 503 instead of a per-framework error."""
+        class BusyTool:
+            async def ainvoke(self, args):
+                raise LLMBusy("The language model is busy, try again shortly", 5)
+
+        slow = FakeTool(1.0, STRUCTURED)
+        tools = {"core_refiner": BusyTool(), "race_refiner": slow}
+        with patch.dict(framework_compare.FRAMEWORK_TOOLS, tools), pytest.raises(LLMBusy) as busy:
+            asyncio.run(framework_compare.compare_frameworks("Make a study plan", frameworks=["core", "race"]))
+
+        assert busy.value.status_code == 503
+
+    def test_unknown_framework_rejected(self):
+        """Test that framework names are resolved and unknown ones are rejected."""
+        assert framework_compare.resolve_frameworks(["S.P.E.A.R.", "idea", "spear_refiner"]) == ["spear_refiner", "idea_refiner"]
+        with pytest.raises(ValueError):
+            framework_compare.resolve_frameworks(["tree_of_thought"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,69 @@
+"""
+Simple pytest tests for the offline grammar pre-check.
+"""
+import os
+import sys
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set test environment variables
+os.environ.setdefault("GROQ_API_KEY", "test_key")
+os.environ.setdefault("TAVILY_API_KEY", "test_key")
+
+from agents.grammar_precheck import GrammarPrecheck, precheck
+
+
+class TestGrammarPrecheck:
+    """Test class for grammar pre-check functionality."""
+    
+    def test_clean_sentences_pass(self):
+        """Test that well formed input is not flagged."""
+        assert precheck.issues("Create a chatbot for tutoring students in math.") == []
+        assert precheck.issues("I've attached notes from past assignments and my planner.") == []
+        assert precheck.issues("Use https://example.com/docs and the Q3 report.") == []
+    
+    def test_spelling_and_punctuation_flagged(self):
+        """Test that misspellings and punctuation slips are flagged."""
+        issues = precheck.issues("Write a profesional email about the the deadline , thanks")
+        
+        assert "unknown_word:profesional" in issues
+        assert "repeated_word" in issues
+        assert "space_before_punctuation" in issues
+        assert "lowercase_start" in precheck.issues("i need help")
+    
+    def test_misspelled_inflections_flagged(self):
+        """Test that inflections are only accepted when spelled the regular way."""
+        assert precheck.issues("I am writeing a story about dogs.") == ["unknown_word:writeing"]
+        for word in ["runned", "goed", "writting", "studyed", "happyness"]:
+            assert not precheck.is_known(word), word
+        for word in ["writing", "planned", "studied", "happiness", "simply", "ran", "went"]:
+            assert precheck.is_known(word), word
+
+    def test_counters_report_skip_rate(self):
+        """Test that the skip rate reflects clean versus flagged input."""
+        checker = GrammarPrecheck({"write", "a", "poem"})
+        
+        assert not checker.needs_correction("Write a poem.")
+        assert checker.needs_correction("Write a pome.")
+        assert checker.stats()["skip_rate"] == 0.5
+    
+    @patch('agents.coach_agent.llm')
+    def test_clean_input_skips_correction_call(self, mock_llm):
+        """Test that correct_grammar does not call the LLM for clean input."""
+        from agents.coach_agent import correct_grammar
+        
+        mock_llm.ainvoke = AsyncMock()
+        
+        with patch('agents.grammar_precheck.PRECHECK_ENABLED', True):
+            result = asyncio.run(correct_grammar("Design a lesson plan for teaching history."))
+        
+        assert result == "Design a lesson plan for teaching history."
+        mock_llm.ainvoke.assert_not_called()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,53 @@
+"""
+Simple pytest tests for the shared intent matcher.
+"""
+import os
+import sys
+import pytest
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.intent_matcher import IntentMatcher, matcher, benchmark
+
+
+class TestIntentMatcher:
+    """Test class for intent matching functionality."""
+    
+    def test_phrases_match_on_word_boundaries(self):
+        """Test that phrases do not fire inside longer words."""
+        greeting = matcher("greeting")
+        
+        assert greeting.starts_with("Hi, can you help?")
+        assert not greeting.starts_with("this is a prompt about history")
+        assert not matcher("rag").matches("documentary script about whales")
+    
+    def test_help_phrases_do_not_swallow_prompts(self):
+        """Test that prompts mentioning help are not treated as help requests."""
+        assert not matcher("help").matches("write a prompt that helps me organize my thoughts")
+        assert matcher("help").matches("Which framework should I use?")
+        assert matcher("help_command").is_exactly("help!")
+        assert not matcher("help_command").is_exactly("help me write a cover letter")
+    
+    def test_multi_word_phrases_tolerate_spacing(self):
+        """Test that multi word phrases match across extra whitespace and case."""
+        assert matcher("no_reference").find("Sorry, I  DON'T HAVE any") == "don't have"
+        assert matcher("rag").matches("What does it say about pricing in the document?")
+    
+    def test_custom_pattern_set(self):
+        """Test that a matcher can be built from any phrase list."""
+        custom = IntentMatcher(["c++", "node.js"])
+        
+        assert custom.matches("rewrite this in node.js please")
+        assert not custom.matches("nodexjs")
+    
+    def test_benchmark_reports_every_intent(self):
+        """Test that the benchmark covers each pattern set."""
+        results = benchmark(iterations=10)
+        
+        assert {"greeting", "help", "rag", "no_reference", "suggestion"} <= set(results)
+        assert all(result["compiled_us"] > 0 for result in results.values())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,225 @@
+"""
+Simple pytest tests for the shared LLM scheduler.
+"""
+import os
+import sys
+import time
+import asyncio
+import httpx
+import pytest
+from groq import RateLimitError
+from unittest.mock import AsyncMock, patch
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_groq import ChatGroq
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set test environment variables
+os.environ.setdefault("GROQ_API_KEY", "test_key")
+os.environ.setdefault("TAVILY_API_KEY", "test_key")
+
+from agents import llm_scheduler
+from agents.llm_scheduler import LLMBusy, LLMScheduler, ScheduledChatGroq
+
+
+def rate_limit_error(retry_after="0.05"):
+    """A 429 as the Groq client raises it"""
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return RateLimitError("Rate limit reached", response=response, body=None)
+
+
+class TestLLMScheduler:
+    """Test class for rate limiting, priority lanes and retries."""
+
+    def test_interactive_lane_served_first(self):
+        """Test that a waiting chat call is dispatched before batch calls that arrived earlier."""
+        async def run():
+            scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, max_concurrency=1)
+            order = []
+
+            async def call(name, lane_name):
+                async with scheduler.slot(10, lane_name):
+                    order.append(name)
+                    await asyncio.sleep(0.01)
+
+            first = asyncio.create_task(call("first", "interactive"))
+            await asyncio.sleep(0)
+            batch = asyncio.create_task(call("batch", "batch"))
+            await asyncio.sleep(0)
+            with llm_scheduler.lane("interactive"):
+                chat = asyncio.create_task(call("chat", None))
+            await asyncio.sleep(0)
+            depth = scheduler.stats()["queue_depth"]
+            await asyncio.gather(first, batch, chat)
+            return order, depth
+
+        order, depth = asyncio.run(run())
+        assert order == ["first", "chat", "batch"]
+        assert depth == {"interactive": 1, "batch": 1}
+
+    def test_budget_exhausted_returns_503(self):
+        """Test that calls beyond the per-minute budget wait, then give up with a 503 and Retry-After."""
+        async def run():
+            scheduler = LLMScheduler(requests_per_minute=2, tokens_per_minute=0, queue_timeout=0.05)
+            for _ in range(2):
+                async with scheduler.slot(10):
+                    pass
+            with pytest.raises(LLMBusy) as error:
+                async with scheduler.slot(10):
+                    pass
+            return error.value, scheduler.stats()
+
+        error, stats = asyncio.run(run())
+        assert error.status_code == 503
+        assert "Retry-After" in error.headers
+        assert stats["timeouts"] == 1
+        assert stats["calls"] == 2
+        assert stats["active"] == 0
+
+    def test_retry_after_honoured(self):
+        """Test that a 429 is retried no earlier than its Retry-After and then succeeds."""
+        async def run():
+            scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, backoff_base=0.001)
+            attempts = []
+
+            async def call(usage):
+                attempts.append(time.monotonic())
+                if len(attempts) == 1:
+                    raise rate_limit_error("0.05")
+                return "ok"
+
+            result = await scheduler.call(call, 10)
+            return result, attempts, scheduler.stats()
+
+        result, attempts, stats = asyncio.run(run())
+        assert result == "ok"
+        assert attempts[1] - attempts[0] >= 0.05
+        assert stats["rate_limited"] == 1
+        assert stats["retries"] == 1
+
+    def test_rate_limit_pauses_queued_calls(self):
+        """Test that a call queued behind a 429 is not sent before the Retry-After has passed."""
+        async def run():
+            scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, max_concurrency=1, max_retries=0)
+            times = {}
+
+            async def limited(usage):
+                await asyncio.sleep(0.01)
+                times["limited"] = time.monotonic()
+                raise rate_limit_error("0.2")
+
+            async def queued(usage):
+                times["queued"] = time.monotonic()
+                return "ok"
+
+            first = asyncio.create_task(scheduler.call(limited, 10))
+            await asyncio.sleep(0)
+            second = asyncio.create_task(scheduler.call(queued, 10))
+            results = await asyncio.gather(first, second, return_exceptions=True)
+            return results, times
+
+        results, times = asyncio.run(run())
+        assert isinstance(results[0], LLMBusy)
+        assert results[1] == "ok"
+        assert times["queued"] - times["limited"] >= 0.2
+
+    def test_retry_keeps_its_place(self):
+        """Test that a retried call is served ahead of calls that arrived after it first did."""
+        async def run():
+            scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, max_concurrency=1)
+            order = []
+
+            async def call(name, arrival=None):
+                async with scheduler.slot(10, arrival=arrival):
+                    order.append(name)
+
+            retry_ticket = scheduler.ticket()
+            async with scheduler.slot(10):
+                later = asyncio.create_task(call("later"))
+                await asyncio.sleep(0)
+                retry = asyncio.create_task(call("retry", retry_ticket))
+                await asyncio.sleep(0)
+            await asyncio.gather(later, retry)
+            return order
+
+        assert asyncio.run(run()) == ["retry", "later"]
+
+    def test_exhausted_retries_and_other_errors(self):
+        """Test that rate limits past the retry budget become a 503 and other errors are not retried."""
+        async def run():
+            scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, max_retries=1, backoff_base=0.001)
+
+            async def limited(usage):
+                raise rate_limit_error("0")
+
+            async def invalid(usage):
+                raise ValueError("bad request")
+
+            with pytest.raises(LLMBusy) as busy:
+                await scheduler.call(limited, 10)
+            with pytest.raises(ValueError):
+                await scheduler.call(invalid, 10)
+            return busy.value, scheduler.stats()
+
+        busy, stats = asyncio.run(run())
+        assert busy.status_code == 503
+        assert stats["retries"] == 1
+        assert stats["calls"] == 3
+        assert stats["active"] == 0
+
+    def test_chat_model_calls_are_scheduled(self):
+        """Test that model calls, including structured ones, hold a slot and record actual token usage."""
+        scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=1000)
+        result = ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content="Refined prompt"))],
+            llm_output={"token_usage": {"total_tokens": 42}}
+        )
+        llm = ScheduledChatGroq(model="llama-3.1-8b-instant")
+        with patch.object(llm_scheduler, "scheduler", scheduler), patch.object(ChatGroq, "_agenerate", AsyncMock(return_value=result)):
+            response = asyncio.run(llm.ainvoke("Refine this prompt"))
+
+        stats = scheduler.stats()
+        assert response.content == "Refined prompt"
+        assert llm.max_retries == 0
+        assert stats["calls"] == 1
+        assert stats["tokens_used"] == 42
+
+    def test_disconnected_stream_keeps_streamed_tokens(self):
+        """Test that a stream closed part way is charged for the prompt and chunks sent, and one that never started for nothing."""
+        async def fake_astream(self, messages, stop=None, run_manager=None, **kwargs):
+            for word in ["Refined ", "prompt ", "text"]:
+                yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+        async def run(chunks_read):
+            scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=10000)
+            llm = ScheduledChatGroq(model="llama-3.1-8b-instant")
+            with patch.object(llm_scheduler, "scheduler", scheduler), patch.object(ChatGroq, "_astream", fake_astream):
+                stream = llm._astream(messages)
+                for _ in range(chunks_read):
+                    await anext(stream)
+                await stream.aclose()
+            return scheduler.stats()
+
+        messages = [HumanMessage(content="Refine this prompt")]
+        disconnected = asyncio.run(run(2))
+        assert disconnected["tokens_used"] == count_tokens_approximately(messages) + 2
+        assert disconnected["active"] == 0
+
+        async def cancelled():
+            scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=10000)
+            async with scheduler.slot(100):
+                pass
+            with pytest.raises(asyncio.CancelledError):
+                async with scheduler.slot(100):
+                    raise asyncio.CancelledError()
+            return scheduler.stats()
+
+        assert asyncio.run(cancelled())["tokens_used"] == 100
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,65 @@
+"""
+Simple pytest tests for the refinement tool cache.
+"""
+import os
+import sys
+import time
+import pytest
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.tools.refinement_cache import RefinementCache, cache_key
+
+
+class TestRefinementCache:
+    """Test class for refinement cache functionality."""
+    
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Fresh cache with a small memory tier for each test."""
+        return RefinementCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=60, max_entries=3, memory_entries=2)
+    
+    def test_cache_key_normalizes_prompt(self):
+        """Test that whitespace and case differences share a key."""
+        key_a = cache_key("core_refiner", "Write a  blog post", "llama-3.1-8b-instant", 0.3)
+        key_b = cache_key("core_refiner", " write a blog post\n", "llama-3.1-8b-instant", 0.3)
+        
+        assert key_a == key_b
+        assert key_a != cache_key("race_refiner", "Write a blog post", "llama-3.1-8b-instant", 0.3)
+        assert key_a != cache_key("core_refiner", "Write a blog post", "llama-3.1-8b-instant", 0.7)
+    
+    def test_memory_and_disk_hits(self, cache):
+        """Test that entries are served from memory first and from disk after memory eviction."""
+        cache.set("a", "core_refiner", "refined a")
+        assert cache.get("a") == "refined a"
+        assert cache.counters["memory_hits"] == 1
+        
+        cache._memory.clear()
+        assert cache.get("a") == "refined a"
+        assert cache.counters["disk_hits"] == 1
+        assert cache.get("missing") is None
+        assert cache.counters["misses"] == 1
+    
+    def test_expired_entries_are_misses(self, cache):
+        """Test that entries past their TTL are not returned."""
+        cache.ttl_seconds = -1
+        cache.set("a", "core_refiner", "refined a")
+        
+        assert cache.get("a") is None
+    
+    def test_size_eviction(self, cache):
+        """Test that the disk tier keeps only the most recently used entries."""
+        for key in ["a", "b", "c", "d"]:
+            cache.set(key, "core_refiner", f"refined {key}")
+            time.sleep(0.01)
+        cache._memory.clear()
+        
+        assert cache.get("a") is None
+        assert cache.get("d") == "refined d"
+        assert cache.counters["evictions"] == 1
+        assert cache.stats()["writes"] == 4
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -3,8 +3,9 @@ Simple pytest tests for the refiner agent.
 Tests basic functionality using actual environment variables.
 """
 import os
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -52,6 +53,13 @@ class TestRefinerAgent:
         # Check for graph structure instead of 'edges' attribute
         assert hasattr(refiner_graph, 'get_graph')
     
+    def test_stateless_refiner_graph_has_no_checkpointer(self):
+        """Test that the one-shot refiner graph runs without checkpointing."""
+        from agents.refiner_agent import stateless_refiner_graph
+        
+        assert stateless_refiner_graph is not refiner_graph
+        assert stateless_refiner_graph.checkpointer is None
+    
     def test_classify_category_greeting(self):
         """Test category classification for greeting messages."""
         from langchain_core.messages import HumanMessage
@@ -65,7 +73,7 @@ class TestRefinerAgent:
             "has_document": False
         }
         
-        result = classify_category(state)
+        result = asyncio.run(classify_category(state))
         
         assert result["prompt_category"] == "greeting"
         assert result["original_prompt"] == "Hello! How are you?"
@@ -84,7 +92,7 @@ class TestRefinerAgent:
             "has_document": False
         }
         
-        result = classify_category(state)
+        result = asyncio.run(classify_category(state))
         
         assert result["prompt_category"] == "help_request"
         assert result["original_prompt"] == "Can you help me understand the C.O.R.E. framework?"
@@ -103,7 +111,7 @@ class TestRefinerAgent:
             "has_document": False
         }
         
-        result = classify_category(state)
+        result = asyncio.run(classify_category(state))
         
         # The function might classify this as help_request instead of clarity
         assert result["prompt_category"] in ["clarity", "help_request"]
@@ -123,7 +131,7 @@ class TestRefinerAgent:
             "has_document": False
         }
         
-        result = classify_category(state)
+        result = asyncio.run(classify_category(state))
         
         assert result["prompt_category"] == "precision"
         assert result["original_prompt"] == "Create a technical prompt with specific parameters and constraints"
@@ -143,7 +151,7 @@ class TestRefinerAgent:
             "has_document": False
         }
         
-        result = classify_category(state)
+        result = asyncio.run(classify_category(state))
         
         assert result["prompt_category"] == "creative"
         assert result["original_prompt"] == "Design a creative and engaging prompt for storytelling"
@@ -198,7 +206,7 @@ class TestRefinerAgent:
         # Mock the LLM response for refinement
         mock_response = MagicMock()
         mock_response.content = "Here's a refined prompt with better structure..."
-        mock_llm.invoke.return_value = mock_response
+        mock_llm.bind_tools.return_value.ainvoke = AsyncMock(return_value=mock_response)
         
         state = {
             "messages": [HumanMessage(content="Write a prompt that helps me organize my thoughts better")],
@@ -209,12 +217,12 @@ class TestRefinerAgent:
             "has_document": False
         }
         
-        result = process_prompt_refinement(state)
+        result = asyncio.run(process_prompt_refinement(state))
         
         assert "messages" in result
         assert "framework_used" in result
         # The function might not call llm.invoke directly
-        # mock_llm.invoke.assert_called()
+        # mock_llm.ainvoke.assert_called()
     
     @patch('agents.refiner_agent.llm')
     def test_process_prompt_refinement_with_document(self, mock_llm):
@@ -224,7 +232,7 @@ class TestRefinerAgent:
         # Mock the LLM response for refinement
         mock_response = MagicMock()
         mock_response.content = "Here's a refined prompt using document context..."
-        mock_llm.invoke.return_value = mock_response
+        mock_llm.bind_tools.return_value.ainvoke = AsyncMock(return_value=mock_response)
         
         state = {
             "messages": [HumanMessage(content="Refine this prompt using the uploaded document")],
@@ -235,13 +243,55 @@ class TestRefinerAgent:
             "has_document": True  # RAG processing enabled
         }
         
-        result = process_prompt_refinement(state)
+        result = asyncio.run(process_prompt_refinement(state))
         
         assert "messages" in result
         assert "framework_used" in result
         # Should have RAG tools available when has_document is True
         # The function might not call llm.invoke directly
-        # mock_llm.invoke.assert_called()
+        # mock_llm.ainvoke.assert_called()
+    
+    def test_retrieval_runs_alongside_classification(self):
+        """Test that document retrieval starts in the same step as classification."""
+        edges = {(edge.source, edge.target) for edge in refiner_graph.get_graph().edges}
+        assert ("__start__", "classify_category") in edges
+        assert ("__start__", "retrieve_documents") in edges
+    
+    @patch('agents.refiner_agent.retrieve_document_context')
+    def test_retrieve_documents_skips_threads_without_uploads(self, mock_retrieve):
+        """Test that no vector search happens for threads that uploaded nothing."""
+        from langchain_core.messages import HumanMessage
+        from agents.refiner_agent import retrieve_documents
+        
+        state = {"messages": [HumanMessage(content="Summarize the uploaded pdf")], "has_document": True}
+        with patch('agents.refiner_agent.document_registry.has_documents', return_value=False):
+            result = asyncio.run(retrieve_documents(state, {"configurable": {"thread_id": "t1"}}))
+        
+        assert result == {"document_context": ""}
+        mock_retrieve.assert_not_called()
+    
+    @patch('agents.refiner_agent.llm')
+    def test_document_context_injected_into_tool_call(self, mock_llm):
+        """Test that retrieved content goes straight into the framework tool without an LLM hop."""
+        from langchain_core.messages import HumanMessage
+        
+        state = {
+            "messages": [HumanMessage(content="Write a summary of the quarterly report from the document")],
+            "original_prompt": "Write a summary of the quarterly report from the document",
+            "prompt_category": "clarity",
+            "has_document": True,
+            "document_context": "Found relevant content from uploaded documents:\n\nQ3 revenue grew 12%"
+        }
+        
+        with patch('agents.refiner_agent.framework_router.ROUTER_MODE', "local"):
+            result = asyncio.run(process_prompt_refinement(state))
+        
+        tool_call = result["messages"][0].tool_calls[0]
+        assert tool_call["name"] in {"core_refiner", "race_refiner", "car_refiner", "spear_refiner"}
+        assert "Q3 revenue grew 12%" in tool_call["args"]["prompt"]
+        assert result["has_document"] is True
+        mock_llm.bind_tools.assert_not_called()
+        mock_llm.ainvoke.assert_not_called()
     
     def test_refiner_state_structure(self):
         """Test that RefinerState has the expected structure."""
@@ -277,7 +327,7 @@ class TestRefinerAgent:
                 "has_document": False
             }
             
-            result = classify_category(state)
+            result = asyncio.run(classify_category(state))
             assert result["prompt_category"] in valid_categories
     
     @patch('agents.refiner_agent.llm')
@@ -288,7 +338,7 @@ class TestRefinerAgent:
         # Mock the LLM response for analysis
         mock_response = MagicMock()
         mock_response.content = "Analysis: This prompt was refined using the C.O.R.E. framework..."
-        mock_llm.invoke.return_value = mock_response
+        mock_llm.ainvoke = AsyncMock(return_value=mock_response)
         
         state = {
             "messages": [HumanMessage(content="Test prompt"), AIMessage(content="Refined prompt")],
@@ -299,11 +349,35 @@ class TestRefinerAgent:
             "has_document": False
         }
         
-        result = generate_analysis(state)
+        result = asyncio.run(generate_analysis(state))
         
         assert "messages" in result
         assert len(result["messages"]) >= 1  # Should have at least the analysis
-        mock_llm.invoke.assert_called()
+        mock_llm.ainvoke.assert_called()
+
+    @patch('agents.refiner_agent.llm')
+    def test_generate_analysis_without_llm(self, mock_llm):
+        """Test that deferred and template modes return the refined prompt without an analysis LLM call."""
+        from langchain_core.messages import HumanMessage, ToolMessage
+
+        mock_llm.ainvoke = AsyncMock()
+        state = {
+            "messages": [HumanMessage(content="Plan a trip"), ToolMessage(content="Role: travel agent\nPlan a 3 day trip", tool_call_id="1")],
+            "original_prompt": "Plan a trip",
+            "prompt_category": "clarity",
+            "framework_used": "race_refiner",
+            "has_document": False
+        }
+
+        deferred = asyncio.run(generate_analysis({**state, "analysis_mode": "deferred"}))
+        template = asyncio.run(generate_analysis({**state, "analysis_mode": "template"}))
+
+        assert deferred["analysis_deferred"] is True
+        assert template["analysis_deferred"] is False
+        assert deferred["refined_prompt"] == "Role: travel agent\nPlan a 3 day trip"
+        assert "R.A.C.E." in template["messages"][0].content
+        assert "Plan a 3 day trip" in template["messages"][0].content
+        mock_llm.ainvoke.assert_not_called()
 
 
 if __name__ == "__main__":
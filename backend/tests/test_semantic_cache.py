@@ -0,0 +1,61 @@
+"""
+Simple pytest tests for the semantic refinement cache.
+Uses a tiny bag-of-words embedding instead of the sentence-transformer.
+"""
+import os
+import sys
+import pytest
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.semantic_cache import SemanticCache
+
+VOCABULARY = ["write", "blog", "post", "about", "cats", "dogs", "recipe", "pasta"]
+
+def bag_of_words(text):
+    words = text.lower().replace("blogpost", "blog post").split()
+    return [float(words.count(term)) for term in VOCABULARY]
+
+
+class TestSemanticCache:
+    """Test class for semantic cache functionality."""
+    
+    @pytest.fixture
+    def cache(self):
+        return SemanticCache(threshold=0.9, max_entries=2, embed=bag_of_words)
+    
+    def test_near_duplicate_prompt_hits(self, cache):
+        """Test that a reworded prompt reuses the stored refinement."""
+        cache.add("write a blog post about cats", "creative", "idea_refiner", "Refined cats post")
+        
+        match = cache.lookup("write a blogpost about cats", "creative")
+        
+        assert match is not None
+        assert match["refined_prompt"] == "Refined cats post"
+        assert match["hits"] == 1
+    
+    def test_different_prompt_or_category_misses(self, cache):
+        """Test that dissimilar prompts and other categories do not match."""
+        cache.add("write a blog post about cats", "creative", "idea_refiner", "Refined cats post")
+        
+        assert cache.lookup("pasta recipe", "creative") is None
+        assert cache.lookup("write a blog post about cats", "clarity") is None
+        assert cache.stats()["misses"] == 2
+    
+    def test_eviction_keeps_most_hit_entries(self, cache):
+        """Test that the least hit entry is evicted when the cache is full."""
+        cache.add("write a blog post about cats", "creative", "idea_refiner", "cats")
+        cache.add("write a blog post about dogs", "creative", "idea_refiner", "dogs")
+        cache.lookup("write a blog post about cats", "creative")
+        
+        cache.add("pasta recipe", "creative", "idea_refiner", "pasta")
+        
+        assert cache.stats()["size"] == 2
+        assert cache.stats()["evictions"] == 1
+        assert cache.lookup("write a blog post about dogs", "creative") is None
+        assert cache.lookup("write a blog post about cats", "creative") is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,145 @@
+"""
+Simple pytest tests for the thread delta protocol helpers.
+Uses a tiny echo graph with an in-memory checkpointer.
+"""
+import os
+import sys
+import asyncio
+import pytest
+from typing import TypedDict, Annotated
+from fastapi import HTTPException
+from langchain_core.messages import AIMessage
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+from langgraph.checkpoint.memory import MemorySaver
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastApi.thread_state import turn_messages, latest_checkpoint_id, messages_since, history_page
+
+
+class EchoState(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def echo(state: EchoState):
+    return {"messages": [AIMessage(content=f"echo: {state['messages'][-1].content}")]}
+
+
+def build_graph():
+    builder = StateGraph(EchoState)
+    builder.add_node("echo", echo)
+    builder.add_edge(START, "echo")
+    builder.add_edge("echo", END)
+    return builder.compile(checkpointer=MemorySaver())
+
+
+async def run_turn(graph, config, text, history=None, checkpoint_id=None):
+    messages = await turn_messages(graph, config, text, history, checkpoint_id)
+    state = await graph.ainvoke({"messages": messages}, config=config)
+    return messages, state, await latest_checkpoint_id(graph, config)
+
+
+class TestThreadState:
+    """Test class for the delta protocol."""
+    
+    @pytest.fixture
+    def graph(self):
+        return build_graph()
+    
+    def test_empty_thread_is_seeded_from_history(self, graph):
+        """Test that a new thread takes the client's history once."""
+        config = {"configurable": {"thread_id": "seed"}}
+        history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+        
+        messages, state, checkpoint_id = asyncio.run(run_turn(graph, config, "next", history))
+        
+        assert messages == [("human", "hi"), ("ai", "hello"), ("human", "next")]
+        assert len(state["messages"]) == 4
+        assert checkpoint_id
+    
+    def test_stored_thread_only_receives_new_input(self, graph):
+        """Test that later turns send only the new message and history does not pile up."""
+        config = {"configurable": {"thread_id": "delta"}}
+        
+        async def scenario():
+            _, _, checkpoint_id = await run_turn(graph, config, "first")
+            history = [{"role": "user", "content": "first"}, {"role": "assistant", "content": "echo: first"}]
+            return await run_turn(graph, config, "second", history, checkpoint_id)
+        
+        messages, state, _ = asyncio.run(scenario())
+        
+        assert messages == [("human", "second")]
+        assert len(state["messages"]) == 4
+    
+    def test_stale_checkpoint_is_rejected(self, graph):
+        """Test that a cursor from an older turn returns a conflict."""
+        config = {"configurable": {"thread_id": "stale"}}
+        
+        async def scenario():
+            _, _, old_checkpoint = await run_turn(graph, config, "first")
+            await run_turn(graph, config, "second")
+            await turn_messages(graph, config, "third", None, old_checkpoint)
+        
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(scenario())
+        assert error.value.status_code == 409
+    
+    def test_mismatched_history_is_rejected(self, graph):
+        """Test that history from another conversation is not merged in."""
+        config = {"configurable": {"thread_id": "mismatch"}}
+        
+        async def scenario():
+            await run_turn(graph, config, "first")
+            await turn_messages(graph, config, "next", [{"role": "user", "content": "something else"}])
+        
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(scenario())
+        assert error.value.status_code == 409
+
+    
+    def test_messages_since_cursor(self, graph):
+        """Test that responses carry only messages after the client's cursor."""
+        config = {"configurable": {"thread_id": "since"}}
+        
+        async def scenario():
+            await run_turn(graph, config, "first")
+            _, state, _ = await run_turn(graph, config, "second")
+            return state["messages"]
+        
+        messages = asyncio.run(scenario())
+        
+        assert [msg.content for msg in messages_since(messages, messages[1].id)] == ["second", "echo: second"]
+        # Unknown cursors fall back to the latest turn
+        assert [msg.content for msg in messages_since(messages, "missing")] == ["second", "echo: second"]
+    
+    def test_history_pages_go_back_in_time(self, graph):
+        """Test that history pages walk from the newest messages to the oldest."""
+        config = {"configurable": {"thread_id": "pages"}}
+        extract = lambda msg: ("user" if msg.type == "human" else "assistant", msg.content)
+        
+        async def scenario():
+            for turn in range(3):
+                await run_turn(graph, config, f"turn {turn}")
+            first = await history_page(graph, "pages", None, 4, extract)
+            second = await history_page(graph, "pages", first["next_cursor"], 4, extract)
+            return first, second
+        
+        first, second = asyncio.run(scenario())
+        
+        assert [msg["content"] for msg in first["messages"]] == ["turn 1", "echo: turn 1", "turn 2", "echo: turn 2"]
+        assert first["has_more"]
+        assert [msg["content"] for msg in second["messages"]] == ["turn 0", "echo: turn 0"]
+        assert not second["has_more"]
+        assert second["next_cursor"] is None
+    
+    def test_history_page_unknown_thread(self, graph):
+        """Test that reading an unknown thread returns not found."""
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(history_page(graph, "nope", None, 10, lambda msg: ("user", msg.content)))
+        assert error.value.status_code == 404
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -10,30 +10,119 @@ const apiClient = axios.create({
   timeout: 30000
 });
 
+// Posts to a streaming endpoint and hands each server-sent event to onEvent(event, data)
+export const streamEvents = async (path, body, onEvent) => {
+  const response = await fetch(`${API_BASE_URL}${path}`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Accept: "text/event-stream",
+    },
+    body: JSON.stringify(body),
+  });
+
+  if (!response.ok) {
+    const error = await response.json().catch(() => ({}));
+    throw new Error(error.detail || `Request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of frame.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+};
+
+// Once a thread has a checkpoint the server holds its history, so only the new input and
+// the checkpoint cursor are sent. History is only sent to seed a thread or for stateless runs.
+// historyCursor asks the server to return only messages newer than the ones already shown.
+const turnBody = (conversationHistory, { threadId = null, checkpointId = null, historyCursor = null } = {}) => ({
+  thread_id: threadId,
+  history_cursor: historyCursor,
+  ...(checkpointId ? { checkpoint_id: checkpointId } : { conversation_history: conversationHistory })
+});
+
 export const coachingAPI = {
-  sendMessage(userInput, conversationHistory = [], threadId = null) {
+  sendMessage(userInput, conversationHistory = [], thread = {}) {
     return apiClient.post("/coaching/chat", {
       user_input: userInput,              
-      conversation_history: conversationHistory,
-      thread_id: threadId
+      ...turnBody(conversationHistory, thread)
     });
   },
 
+  streamMessage(userInput, conversationHistory = [], thread = {}, onEvent = () => {}) {
+    return streamEvents("/coaching/chat/stream", {
+      user_input: userInput,
+      ...turnBody(conversationHistory, thread)
+    }, onEvent);
+  },
+
+  // Older messages of a stored thread, newest page first
+  getThreadMessages(threadId, before = null, limit = 20) {
+    return apiClient.get(`/coaching/threads/${threadId}/messages`, { params: { before, limit } });
+  },
+
   createNewThread() {
     return apiClient.post("/coaching/threads/");
   }
 };
 
 export const refinerAPI = {
-  sendMessage(originalPrompt, conversationHistory = [], threadId = null, hasDocument = false) {
+  sendMessage(originalPrompt, conversationHistory = [], thread = {}, hasDocument = false) {
     return apiClient.post("/refiner/refine_chat", {
       original_prompt: originalPrompt,    
-      conversation_history: conversationHistory,
-      thread_id: threadId,
+      ...turnBody(conversationHistory, thread),
       has_document: hasDocument            
     });
   },
 
+  streamMessage(originalPrompt, conversationHistory = [], thread = {}, hasDocument = false, onEvent = () => {}) {
+    return streamEvents("/refiner/refine_chat/stream", {
+      original_prompt: originalPrompt,
+      ...turnBody(conversationHistory, thread),
+      has_document: hasDocument
+    }, onEvent);
+  },
+
+  // Older messages of a stored thread, newest page first
+  getThreadMessages(threadId, before = null, limit = 20) {
+    return apiClient.get(`/refiner/threads/${threadId}/messages`, { params: { before, limit } });
+  },
+
+  // Runs every framework of the category (or the chosen ones) at once and returns them ranked
+  compareFrameworks(originalPrompt, { category = null, frameworks = null, rank = true } = {}) {
+    return apiClient.post("/refiner/compare", {
+      original_prompt: originalPrompt,
+      category,
+      frameworks,
+      rank
+    }, { timeout: 60000 });
+  },
+
+  // Analysis narrative of a response sent with analysis_mode "deferred"
+  getAnalysis(analysisId, wait = false) {
+    return apiClient.get(`/refiner/analysis/${analysisId}`, { params: { wait } });
+  },
+
   createNewThread() {
     return apiClient.post("/refiner/threads/");
   }
@@ -52,6 +141,18 @@ export const getRefinedPrompt = (response) => {
   return response.data.refined_prompt || null;
 };
 
+export const getCheckpointId = (response) => {
+  return response.data.checkpoint_id || null;
+};
+
+export const getHistoryCursor = (response) => {
+  return response.data.history_cursor || null;
+};
+
+export const getThreadId = (response) => {
+  return response.data.thread_id || null;
+};
+
 // Refiner-specific response extractors from stores/refiner.js
 export const getPromptCategory = (response) => {
   return response.data.prompt_category || null;
@@ -1,5 +1,11 @@
 import { defineStore } from 'pinia';
-import { coachingAPI, extractMessages, getLatestMessage, getRefinedPrompt } from '@/service/api';
+import { coachingAPI, getLatestMessage, getRefinedPrompt, getCheckpointId, getThreadId, getHistoryCursor } from '@/service/api';
+
+// Store roles mapped to the roles the API expects
+const toConversationHistory = (messages) => messages.map(msg => ({
+  role: msg.role === 'human' ? 'user' : 'assistant',
+  content: msg.content
+}));
 
 export const useCoachingStore = defineStore('coaching', {
   state: () => ({
@@ -8,7 +14,12 @@ export const useCoachingStore = defineStore('coaching', {
     error: null,
     currentStep: 'start',
     refinedPrompt: null,
+    correctedInput: null,
     threadId: null,
+    checkpointId: null,
+    historyCursor: null,
+    olderCursor: null,
+    hasMoreHistory: false,
   }),
 
   getters: {
@@ -38,20 +49,58 @@ export const useCoachingStore = defineStore('coaching', {
       });
 
       try {
-        // Pass threadId to API
-        const response = await coachingAPI.sendMessage(
-          userInput, 
-          this.messages, 
-          this.threadId
+        // Streaming the turn so step changes and feedback show up while the coach works
+        let response = null;
+        let streamingIndex = null;
+        const appendToReply = (content) => {
+          if (streamingIndex === null) {
+            this.messages.push({
+              role: 'assistant',
+              content: '',
+              timestamp: new Date().toISOString()
+            });
+            streamingIndex = this.messages.length - 1;
+          }
+          this.messages[streamingIndex].content += content;
+        };
+
+        await coachingAPI.streamMessage(
+          userInput,
+          toConversationHistory(this.messages.slice(0, -1)),
+          { threadId: this.threadId, checkpointId: this.checkpointId, historyCursor: this.historyCursor },
+          (event, data) => {
+            if (event === 'step') {
+              this.updateStep(data.current_step);
+            } else if (event === 'corrected') {
+              this.correctedInput = data.text;
+            } else if (event === 'feedback' || event === 'token') {
+              appendToReply(data.content);
+            } else if (event === 'result') {
+              response = { data };
+            } else if (event === 'error') {
+              throw new Error(data.detail);
+            }
+          }
         );
+
+        if (!response) {
+          throw new Error('The coach stream ended without a result');
+        }
         
         // Extract data from response
         const latestMessage = getLatestMessage(response);
-        const conversationHistory = extractMessages(response);
         const refinedPrompt = getRefinedPrompt(response);
+
+        // The server keeps the thread, the next turn only needs its cursor
+        this.threadId = getThreadId(response) || this.threadId;
+        this.checkpointId = getCheckpointId(response);
+        this.historyCursor = getHistoryCursor(response);
         
-        // Add assistant message
-        if (latestMessage) {
+        // The final reply replaces the streamed preview, which may only hold the evaluation feedback
+        // and not the next-step instructions that are stored with the thread
+        if (latestMessage && streamingIndex !== null) {
+          this.messages[streamingIndex].content = latestMessage;
+        } else if (latestMessage) {
           this.messages.push({
             role: 'assistant',
             content: latestMessage,
@@ -59,15 +108,6 @@ export const useCoachingStore = defineStore('coaching', {
           });
         }
         
-        // Update conversation history if provided
-        if (conversationHistory.length > 0) {
-          this.messages = conversationHistory.map(msg => ({
-            role: msg.role === 'user' ? 'human' : 'assistant',
-            content: msg.content,
-            timestamp: msg.timestamp || new Date().toISOString()
-          }));
-        }
-        
         // Update refined prompt if available
         if (refinedPrompt) {
           this.refinedPrompt = refinedPrompt;
@@ -103,9 +143,46 @@ export const useCoachingStore = defineStore('coaching', {
       this.messages = [];
       this.refinedPrompt = null;
       this.currentStep = 'start';
+      this.correctedInput = null;
+      this.checkpointId = null;
+      this.historyCursor = null;
+      this.olderCursor = null;
+      this.hasMoreHistory = false;
       this.error = null;
     },
 
+    // Reopening a stored thread from its newest page of messages
+    async openThread(threadId) {
+      this.clearConversation();
+      this.threadId = threadId;
+      this.hasMoreHistory = true;
+      await this.loadOlderMessages();
+    },
+
+    // Prepending an older page of the stored thread, for lazily loading long sessions
+    async loadOlderMessages(limit = 20) {
+      if (!this.threadId || !this.hasMoreHistory) return;
+      try {
+        const response = await coachingAPI.getThreadMessages(this.threadId, this.olderCursor, limit);
+        const older = response.data.messages.map(msg => ({
+          id: msg.id,
+          role: msg.role === 'user' ? 'human' : 'assistant',
+          content: msg.content,
+          timestamp: new Date().toISOString()
+        }));
+        this.messages = [...older, ...this.messages];
+        this.olderCursor = response.data.next_cursor;
+        this.hasMoreHistory = response.data.has_more;
+        // The first page of a reopened thread also positions the turn cursors
+        if (!this.checkpointId) {
+          this.checkpointId = response.data.checkpoint_id;
+          this.historyCursor = older.length ? older[older.length - 1].id : null;
+        }
+      } catch (err) {
+        this.error = err.response?.data?.detail || err.message || 'Failed to load earlier messages';
+      }
+    },
+
     updateStep(step) {
       this.currentStep = step;
     },
@@ -1,5 +1,14 @@
 import { defineStore } from 'pinia';
-import { refinerAPI, extractMessages, getLatestMessage, getRefinedPrompt, getPromptCategory, getFrameworkUsed, getRefinementAnalysis } from '@/service/api';
+import { refinerAPI, getLatestMessage, getRefinedPrompt, getPromptCategory, getFrameworkUsed, getRefinementAnalysis, getCheckpointId, getHistoryCursor } from '@/service/api';
+
+// Graph nodes whose tokens make up the assistant reply
+const STREAMED_NODES = ['handle_conversation', 'generate_analysis'];
+
+// Store roles mapped to the roles the API expects
+const toConversationHistory = (messages) => messages.map(msg => ({
+  role: msg.role === 'human' ? 'user' : 'assistant',
+  content: msg.content
+}));
 
 export const useRefinerStore = defineStore('refiner', {
   state: () => ({
@@ -11,6 +20,10 @@ export const useRefinerStore = defineStore('refiner', {
     frameworkUsed: null,
     refinementAnalysis: null,
     threadId: null,
+    checkpointId: null,
+    historyCursor: null,
+    olderCursor: null,
+    hasMoreHistory: false,
     hasDocument: false,
   }),
 
@@ -63,22 +76,51 @@ export const useRefinerStore = defineStore('refiner', {
       });
 
       try {
-        const response = await refinerAPI.sendMessage(
+        // Streaming the reply so text shows up as soon as the first token arrives
+        let response = null;
+        let streamingIndex = null;
+        await refinerAPI.streamMessage(
           originalPrompt,
-          this.messages,
-          this.threadId,
-          this.hasDocument
+          toConversationHistory(this.messages.slice(0, -1)),
+          { threadId: this.threadId, checkpointId: this.checkpointId, historyCursor: this.historyCursor },
+          this.hasDocument,
+          (event, data) => {
+            if (event === 'token' && STREAMED_NODES.includes(data.node)) {
+              if (streamingIndex === null) {
+                this.messages.push({
+                  role: 'assistant',
+                  content: '',
+                  timestamp: new Date().toISOString()
+                });
+                streamingIndex = this.messages.length - 1;
+              }
+              this.messages[streamingIndex].content += data.content;
+            } else if (event === 'result') {
+              response = { data };
+            } else if (event === 'error') {
+              throw new Error(data.detail);
+            }
+          }
         );
 
+        if (!response) {
+          throw new Error('The refiner stream ended without a result');
+        }
+
         const latestMessage = getLatestMessage(response);
-        const conversationHistory = extractMessages(response);
         const refinedPrompt = getRefinedPrompt(response);
         const promptCategory = getPromptCategory(response);
         const frameworkUsed = getFrameworkUsed(response);
         const refinementAnalysis = getRefinementAnalysis(response); 
+
+        // The server keeps the thread, the next turn only needs its cursor
+        this.checkpointId = getCheckpointId(response);
+        this.historyCursor = getHistoryCursor(response);
         
-        // Add assistant message
-        if (latestMessage) {
+        // The final reply replaces the streamed preview so the bubble matches what the thread stores
+        if (latestMessage && streamingIndex !== null) {
+          this.messages[streamingIndex].content = latestMessage;
+        } else if (latestMessage) {
           this.messages.push({
             role: 'assistant',
             content: latestMessage,
@@ -86,15 +128,6 @@ export const useRefinerStore = defineStore('refiner', {
           });
         }
         
-        // Role mapping for conversation history
-        if (conversationHistory.length > 0) {
-          this.messages = conversationHistory.map(msg => ({
-            role: msg.role === 'user' ? 'human' : 'assistant',
-            content: msg.content,
-            timestamp: msg.timestamp || new Date().toISOString()
-          }));
-        }
-        
         this.refinedPrompt = refinedPrompt;
         this.promptCategory = promptCategory;
         this.frameworkUsed = frameworkUsed;
@@ -135,9 +168,45 @@ export const useRefinerStore = defineStore('refiner', {
       this.frameworkUsed = null;
       this.refinementAnalysis = null;
       this.hasDocument = false;
+      this.checkpointId = null;
+      this.historyCursor = null;
+      this.olderCursor = null;
+      this.hasMoreHistory = false;
       this.error = null;
     },
 
+    // Reopening a stored thread from its newest page of messages
+    async openThread(threadId) {
+      this.clearConversation();
+      this.threadId = threadId;
+      this.hasMoreHistory = true;
+      await this.loadOlderMessages();
+    },
+
+    // Prepending an older page of the stored thread, for lazily loading long sessions
+    async loadOlderMessages(limit = 20) {
+      if (!this.threadId || !this.hasMoreHistory) return;
+      try {
+        const response = await refinerAPI.getThreadMessages(this.threadId, this.olderCursor, limit);
+        const older = response.data.messages.map(msg => ({
+          id: msg.id,
+          role: msg.role === 'user' ? 'human' : 'assistant',
+          content: msg.content,
+          timestamp: new Date().toISOString()
+        }));
+        this.messages = [...older, ...this.messages];
+        this.olderCursor = response.data.next_cursor;
+        this.hasMoreHistory = response.data.has_more;
+        // The first page of a reopened thread also positions the turn cursors
+        if (!this.checkpointId) {
+          this.checkpointId = response.data.checkpoint_id;
+          this.historyCursor = older.length ? older[older.length - 1].id : null;
+        }
+      } catch (err) {
+        this.error = err.response?.data?.detail || err.message || 'Failed to load earlier messages';
+      }
+    },
+
     setHasDocument(hasDoc) {
       this.hasDocument = hasDoc;
     },